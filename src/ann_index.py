@@ -0,0 +1,86 @@
+"""
+Approximate-nearest-neighbour index options for serving large corpora.
+
+The build keeps an exact flat index (it supports the deletes and reconstructs incremental
+builds rely on); when the configured index spec is not flat, a serving index of that type is
+trained on a sample of the flat vectors and written next to it as index.serving.faiss, with
+rows in the same order so the chunk store offsets still line up.
+
+Index spec (Utils.index_spec):
+    {"type": "flat"}
+    {"type": "hnsw", "hnsw_m": 32}
+    {"type": "ivf", "nlist": 1024}
+    {"type": "ivfpq", "nlist": 1024, "pq_m": 16}
+    {"type": "sq8"}
+optional "train_sample_size" (default 50000) bounds the vectors used to train IVF / PQ / SQ.
+"""
+
+import os
+
+import faiss
+import numpy as np
+
+SERVING_INDEX_FILE = "index.serving.faiss"
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq", "sq8")
+
+def factory_string(spec: dict, ntotal: int) -> str:
+    """faiss.index_factory description for a spec; nlist is capped so small indexes still train"""
+    index_type = spec.get("type", "flat").lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+    # faiss wants roughly 39 training points per IVF list
+    nlist = max(1, min(spec.get("nlist", 1024), ntotal // 39))
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{spec.get('hnsw_m', 32)},Flat"
+    if index_type == "ivf":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivfpq":
+        # 8-bit codes need 256 centroids per sub-quantizer; small category indexes get fewer bits
+        nbits = max(1, min(8, int(np.log2(max(ntotal, 2)))))
+        return f"IVF{nlist},PQ{spec.get('pq_m', 16)}x{nbits}"
+    return "SQ8"
+
+def build_index(vectors: np.ndarray, spec: dict):
+    """Train (on a sample) and fill an index of the spec's type with the vectors, keeping row order"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    ntotal, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(spec, ntotal), faiss.METRIC_L2)
+    if not index.is_trained:
+        sample_size = min(ntotal, spec.get("train_sample_size", 50000))
+        sample_rows = np.random.default_rng(0).choice(ntotal, size=sample_size, replace=False)
+        index.train(vectors[np.sort(sample_rows)])
+    index.add(vectors)
+    return index
+
+def write_serving_index(store_dir: str, flat_index, spec: dict):
+    """Write index.serving.faiss for non-flat specs; a flat spec removes any stale serving index"""
+    serving_path = os.path.join(store_dir, SERVING_INDEX_FILE)
+    if spec.get("type", "flat").lower() == "flat" or flat_index.ntotal == 0:
+        if os.path.exists(serving_path):
+            os.remove(serving_path)
+        return None
+    try:
+        serving_index = build_index(flat_index.reconstruct_n(0, flat_index.ntotal), spec)
+    except RuntimeError as e:
+        # too few vectors to train this index type; the exact flat index keeps serving this store
+        print(f"Warning: Could not build {spec.get('type')} index for {store_dir}, using flat search: {e}")
+        if os.path.exists(serving_path):
+            os.remove(serving_path)
+        return None
+    faiss.write_index(serving_index, f"{serving_path}.tmp")
+    os.replace(f"{serving_path}.tmp", serving_path)
+    return serving_index
+
+def apply_search_params(index, params: dict):
+    """Set query-time parameters such as nprobe (IVF) or efSearch (HNSW); ones the index lacks are ignored"""
+    parameter_space = faiss.ParameterSpace()
+    for name, value in (params or {}).items():
+        if value is None:
+            continue
+        try:
+            parameter_space.set_index_parameter(index, name, value)
+        except RuntimeError:
+            # e.g. nprobe on an HNSW or flat index
+            pass
@@ -0,0 +1,155 @@
+"""
+Semantic answer cache that sits in front of the retrieval + LLM pipeline.
+Questions are embedded with the shared MiniLM embedder and kept in a small FAISS
+inner-product index; a new question whose cosine similarity to a stored one is at
+or above the threshold gets the stored final answer and tool list back.
+Answers depend on the conversation, so follow-up questions bypass the cache, entries are scoped to the
+session that produced them (unless Utils.answer_cache_scope is "shared") and fallback answers built on a
+failed tool call or LLM step are never stored.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import List
+
+import faiss
+import numpy as np
+
+import utils as car_utils
+
+# markers of answers that fell back after a failed critique, refinement or self-check
+FALLBACK_MARKERS = ("Critique failed:", "Refinement failed:", "Self-check failed:")
+
+def cache_namespace(mode: str, conversation_manager=None):
+    """
+    Namespace of the cached answers for a pipeline mode and session, or None when the cache must not be used
+    because the question follows earlier turns of the conversation
+    """
+    if conversation_manager is None:
+        return mode
+    if conversation_manager.has_context():
+        return None
+    if car_utils.getAnswerCacheAttributes()["scope"] == "shared":
+        return mode
+    return f"{mode}:{conversation_manager.session_id}"
+
+def is_cacheable(answer: str, tool_results: list, react_details: dict = None) -> bool:
+    """False for answers built on a failed tool call or a failed critique / refinement / self-check"""
+    if any(result.startswith("Error with") for result in tool_results):
+        return False
+    texts = [answer, (react_details or {}).get("critique") or ""]
+    return not any(marker in text for text in texts for marker in FALLBACK_MARKERS)
+
+class SemanticAnswerCache:
+    """
+    Bounded, TTL-based cache of final answers looked up by question similarity.
+
+    Usage:
+        cached = cache.lookup(question_embedding, namespace="react")
+        if cached is None:
+            ...
+            cache.add(question, question_embedding, answer, ["knowledge_tool"], namespace="react")
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 500):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.index = None
+        self.entries = OrderedDict()
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _normalize(self, embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _remove(self, entry_ids: List[int]):
+        if not entry_ids:
+            return
+        self.index.remove_ids(np.asarray(entry_ids, dtype="int64"))
+        for entry_id in entry_ids:
+            self.entries.pop(entry_id, None)
+
+    def _evict_expired(self):
+        now = time.time()
+        expired = [entry_id for entry_id, entry in self.entries.items() if now - entry["created_at"] > self.ttl_seconds]
+        self._remove(expired)
+
+    def lookup(self, question_embedding, namespace: str = "default"):
+        """Stored entry for the most similar question in the namespace, or None"""
+        with self._lock:
+            if self.index is None or not self.entries:
+                self.misses += 1
+                return None
+
+            self._evict_expired()
+            if not self.entries:
+                self.misses += 1
+                return None
+
+            vector = self._normalize(question_embedding)
+            # look past the nearest neighbour in case it belongs to another namespace
+            similarities, entry_ids = self.index.search(vector, min(len(self.entries), 8))
+            for similarity, entry_id in zip(similarities[0], entry_ids[0]):
+                if entry_id < 0 or similarity < self.threshold:
+                    break
+                entry = self.entries.get(int(entry_id))
+                if entry is not None and entry["namespace"] == namespace:
+                    self.entries.move_to_end(int(entry_id))
+                    self.hits += 1
+                    return dict(entry, similarity=float(similarity))
+
+            self.misses += 1
+            return None
+
+    def add(self, question: str, question_embedding, answer: str, tools_used: List[str], namespace: str = "default"):
+        """Store the final answer and tool names for a question"""
+        with self._lock:
+            vector = self._normalize(question_embedding)
+            if self.index is None:
+                self.index = faiss.IndexIDMap(faiss.IndexFlatIP(vector.shape[1]))
+
+            self._evict_expired()
+            if len(self.entries) >= self.max_entries:
+                # least recently used entries go first
+                overflow = len(self.entries) - self.max_entries + 1
+                self._remove(list(self.entries.keys())[:overflow])
+
+            entry_id = self.next_id
+            self.next_id += 1
+            self.index.add_with_ids(vector, np.asarray([entry_id], dtype="int64"))
+            self.entries[entry_id] = {
+                "question": question,
+                "answer": answer,
+                "tools_used": list(tools_used),
+                "namespace": namespace,
+                "created_at": time.time()
+            }
+
+    def clear(self):
+        with self._lock:
+            self.index = None
+            self.entries = OrderedDict()
+
+    def stats(self) -> dict:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+def getAnswerCache() -> SemanticAnswerCache:
+    """Process-wide answer cache configured from Utils, created on first use"""
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                cache_attributes = car_utils.getAnswerCacheAttributes()
+                _answer_cache = SemanticAnswerCache(cache_attributes["threshold"],
+                                                    cache_attributes["ttl_seconds"],
+                                                    cache_attributes["max_entries"])
+    return _answer_cache
@@ -2,89 +2,92 @@
 to the retriever tools. These tools would be used by the llm for answering the questions.
 """
 
-from tools import knowledge_tool, krithi_tool, raga_index_tool, multi_search
-from semantic_layer import Prompt
-from models import Models
+from tools import run_tools, MULTI_SEARCH_CATEGORIES, QueryEmbeddingContext
+from tool_router import route_tools, getToolRouter
+from answer_cache import getAnswerCache, is_cacheable
+from tracing import start_trace, span, export_trace
+from semantic_layer import Prompt, stream_llm
+from context_packer import pack_tool_results
+import models
 
-def select_tools(user_question):
-    """Intelligently select which tools to use based on the user's question"""
-    question_lower = user_question.lower()
-    selected_tools = []
-    
-    # Check for knowledge-related queries
-    if any(keyword in question_lower for keyword in ["what is", "explain", "theory", "literature", "raga", "scale", "prayoga"]):
-        selected_tools.append(("knowledge_tool", knowledge_tool))
-    
-    # Check for raga-specific queries
-    if any(keyword in question_lower for keyword in ["raga", "melakarta", "janya", "alias", "list", "number"]):
-        selected_tools.append(("raga_index_tool", raga_index_tool))
+def select_tools(user_question, question_embedding=None):
+    """Select the tools for the user's question with the embedding router (keyword rules as fallback)"""
+    return route_tools(user_question, question_embedding)
+
+def get_answer_stream(user_question):
+    """Yield the answer from the LLM as it is generated, using appropriate tools"""
+    streamed = False
+    try:
+        with start_trace("get_answer", question=user_question) as answer_trace:
+            for token in _answer_question(user_question):
+                streamed = True
+                yield token
+        export_trace(answer_trace)
+        
+    except Exception as e:
+        yield f"Error: {e}" if not streamed else f"\n\nError: {e}"
+
+def get_answer(user_question):
+    """Get answer from the LLM using appropriate tools"""
+    return "".join(get_answer_stream(user_question))
+
+def _answer_question(user_question):
+    """Retrieval and LLM pipeline behind get_answer; yields the answer text as it is generated"""
+    # Initialize models and semantic layer
+    semantic_layer_obj = Prompt(user_question)
+    llm_model = models.getLLM()
     
-    # Check for composition-related queries
-    if any(keyword in question_lower for keyword in ["krithi", "kriti", "composition", "lyrics", "composer", "tala", "song"]):
-        selected_tools.append(("krithi_tool", krithi_tool))
+    # Near-identical questions answered recently are served from the semantic cache
+    query_context = QueryEmbeddingContext()
+    question_embedding = query_context.get(user_question)
+    answer_cache = getAnswerCache()
+    with span("answer_cache_lookup") as cache_span:
+        cached = answer_cache.lookup(question_embedding, namespace="cli")
+        cache_span.set(hit=cached is not None)
+    if cached is not None:
+        print(f"⚡ Answer cache hit (similarity {cached['similarity']:.3f})")
+        yield cached["answer"]
+        return
     
-    # If multiple categories or general query, use multi_search
-    if len(selected_tools) > 1 or "carnatic music" in question_lower:
-        selected_tools.append(("multi_search", multi_search))
+    # Select appropriate tools based on user input
+    with span("tool_selection") as selection_span:
+        selected_tools = select_tools(user_question, question_embedding)
+        selection_span.set(tools=[tool_name for tool_name, _ in selected_tools])
     
-    # If no specific tools selected, default to knowledge_tool
-    if not selected_tools:
-        selected_tools.append(("knowledge_tool", knowledge_tool))
+    # Execute selected tools and collect results; candidates of all tools are re-ranked in one batch
+    with query_context, span("tool_execution"):
+        tool_results = run_tools(user_question, selected_tools, categories=MULTI_SEARCH_CATEGORIES, k_each=4)
     
-    return selected_tools
-
-def get_answer(user_question):
-    """Get answer from the LLM using appropriate tools"""
-    try:
-        # Initialize models and semantic layer
-        semantic_layer_obj = Prompt(user_question)
-        llm_model_obj = Models()
-        llm_model = llm_model_obj.getLLM()
-        
-        # Select appropriate tools based on user input
-        selected_tools = select_tools(user_question)
-        
-        # Execute selected tools and collect results
-        tool_results = []
-        for tool_name, tool_func in selected_tools:
-            try:
-                if tool_name == "multi_search":
-                    result = multi_search.invoke({
-                        "query": user_question,
-                        "categories": ["Literature", "Raga", "Krithis"],
-                        "k_each": 4
-                    })
-                else:
-                    result = tool_func.invoke(user_question)
-                
-                tool_results.append(f"Results from {tool_name}:\n{result}")
-                
-            except Exception as e:
-                tool_results.append(f"Error with {tool_name}: {e}")
-        
+    with span("prompt_assembly") as prompt_span:
         # Get the prompt string ONLY from semantic layer
         semantic_prompt = semantic_layer_obj.getPromptStr()
         
-        # Combine semantic prompt with tool results
+        # Combine semantic prompt with the de-duplicated, token-budgeted tool results
         final_prompt = f"""{semantic_prompt}
 
 Retrieved Information from Knowledge Base:
-{chr(10).join(tool_results)}
+{pack_tool_results(tool_results)}
 
 Please provide a comprehensive answer based on the information above."""
+        prompt_span.set(prompt_chars=len(final_prompt))
 
-        # Get response from the LLM
-        response = llm_model.invoke(final_prompt)
-        return response.content
-        
-    except Exception as e:
-        return f"Error: {e}"
+    # Stream the response from the LLM
+    answer = yield from stream_llm(llm_model, final_prompt, "llm:direct")
+    
+    if is_cacheable(answer, tool_results):
+        answer_cache.add(user_question, question_embedding, answer,
+                         [tool_name for tool_name, _ in selected_tools], namespace="cli")
 
 def main():
     """Main Q&A interface"""
     print("🎵 Carnatic Music Assistant 🎵")
     print("Ask me anything about Carnatic music theory, ragas, compositions, and more!")
     print("Type 'quit' or 'exit' to end the session.\n")
+
+    # Load the embedder, re-ranker, indexes and LLM client before the first question
+    print("⏳ Loading models and knowledge base...")
+    models.warmup()
+    getToolRouter().warmup()
     
     while True:
         try:
@@ -102,12 +105,12 @@ def main():
             
             print("\n🔍 Searching for information...")
             
-            # Get answer
-            answer = get_answer(user_input)
-            
             print("\n💡 Answer:")
             print("-" * 50)
-            print(answer)
+            # Print the answer as it is generated
+            for token in get_answer_stream(user_input):
+                print(token, end="", flush=True)
+            print()
             print("-" * 50)
             
         except KeyboardInterrupt:
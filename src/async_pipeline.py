@@ -0,0 +1,118 @@
+"""
+Async answer pipeline for serving many chat sessions from one process.
+Retrieval and re-ranking run on the shared tool thread pool and LLM calls are awaited through
+a pooled HTTP client of the event loop (at most Utils.llm_max_concurrency at a time), so a slow Groq call for one
+session no longer blocks the others. Each session keeps its own ConversationManager.
+
+Answer several questions concurrently from the repo root:
+    python src/async_pipeline.py "What is carnatic music?" "Which melakarta is Kalyani?"
+"""
+
+import asyncio
+import contextvars
+import sys
+
+import models
+from answer_cache import getAnswerCache, cache_namespace, is_cacheable
+from semantic_layer import Prompt, ConversationManager, ReactAgent, ainvoke_llm
+from tool_router import route_tools
+from tools import arun_tools, getToolExecutor, MULTI_SEARCH_CATEGORIES, QueryEmbeddingContext, TOOLS_BY_NAME
+from tracing import start_trace, span, export_trace
+
+async def run_blocking(function, *args):
+    """Run a CPU-bound step (embedding, routing) on the tool thread pool in the current trace context"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(getToolExecutor(), contextvars.copy_context().run, function, *args)
+
+async def aget_answer(user_question, conversation_manager=None, use_react_agent=True):
+    """
+    Async get_answer for one session.
+    Returns (answer, tools_used, react_details, trace_spans) like the Streamlit get_answer.
+    """
+    conversation_manager = conversation_manager or ConversationManager()
+    try:
+        with start_trace("get_answer", question=user_question, react_agent=use_react_agent, mode="async") as answer_trace:
+            final_answer, selected_tools, react_details = await _answer_question(user_question, conversation_manager, use_react_agent)
+        export_trace(answer_trace)
+        return final_answer, selected_tools, react_details, answer_trace.to_dicts()
+
+    except Exception as e:
+        return f"Error: {e}", [], None, None
+
+async def _answer_question(user_question, conversation_manager, use_react_agent):
+    semantic_layer_obj = Prompt(user_question)
+    llm_model = models.getAsyncLLM()
+
+    # Near-identical questions answered recently in this session are served from the semantic cache;
+    # follow-up questions depend on the conversation and always go through the pipeline
+    namespace = cache_namespace("react" if use_react_agent else "direct", conversation_manager)
+    query_context = QueryEmbeddingContext()
+    question_embedding = await run_blocking(query_context.get, user_question)
+    answer_cache = getAnswerCache()
+    cached = None
+    if namespace is not None:
+        with span("answer_cache_lookup") as cache_span:
+            cached = answer_cache.lookup(question_embedding, namespace=namespace)
+            cache_span.set(hit=cached is not None)
+    if cached is not None:
+        with span("memory_save"):
+            conversation_manager.save_to_memory(user_question, cached["answer"])
+        cached_tools = [(tool_name, TOOLS_BY_NAME[tool_name]) for tool_name in cached["tools_used"]]
+        return cached["answer"], cached_tools, None
+
+    with span("tool_selection") as selection_span:
+        selected_tools = await run_blocking(route_tools, user_question, question_embedding)
+        selection_span.set(tools=[tool_name for tool_name, _ in selected_tools])
+
+    with query_context, span("tool_execution"):
+        tool_results = await arun_tools(user_question, selected_tools, categories=MULTI_SEARCH_CATEGORIES, k_each=4)
+
+    with span("prompt_assembly") as prompt_span:
+        semantic_prompt = semantic_layer_obj.getPromptStr()
+        conversation_context = conversation_manager.get_conversation_context()
+        context_prompt = await run_blocking(conversation_manager.create_context_aware_prompt,
+                                            semantic_prompt, user_question, tool_results)
+        prompt_span.set(prompt_chars=len(context_prompt), context_chars=len(conversation_context))
+
+    if use_react_agent:
+        initial_response = await ainvoke_llm(llm_model, context_prompt, "llm:initial")
+        react_details = await ReactAgent(llm_model).aprocess_with_react(
+            user_question, initial_response.content, tool_results, conversation_context
+        )
+        final_answer = react_details["refined_response"]
+    else:
+        response = await ainvoke_llm(llm_model, context_prompt, "llm:direct")
+        final_answer = response.content
+        react_details = None
+
+    with span("memory_save"):
+        conversation_manager.save_to_memory(user_question, final_answer)
+
+    if namespace is not None and is_cacheable(final_answer, tool_results, react_details):
+        answer_cache.add(user_question, question_embedding, final_answer,
+                         [tool_name for tool_name, _ in selected_tools], namespace=namespace)
+
+    return final_answer, selected_tools, react_details
+
+async def answer_concurrently(questions, use_react_agent=True):
+    """Answer each question in its own session, all at once"""
+    try:
+        return await asyncio.gather(*(aget_answer(question, ConversationManager(), use_react_agent) for question in questions))
+    finally:
+        # asyncio.run closes the loop next, and the LLM client's connections are bound to it
+        await models.closeAsyncLLM()
+
+def main():
+    questions = sys.argv[1:] or ["What is carnatic music?", "Which melakarta is Kalyani?", "Who composed Endaro Mahanubhavulu?"]
+    print("⏳ Loading models and knowledge base...")
+    models.warmup()
+    results = asyncio.run(answer_concurrently(questions))
+    for question, (answer, tools_used, react_details, trace_spans) in zip(questions, results):
+        total_ms = trace_spans[0]["duration_ms"] if trace_spans else 0
+        print(f"\n❓ {question}  ({total_ms / 1000:.2f}s, tools: {', '.join(tool_name for tool_name, _ in tools_used)})")
+        print("-" * 50)
+        print(answer)
+        print("-" * 50)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Parity and latency report for the inference backends of the embedder and re-ranker.
+all-MiniLM-L6-v2 and ms-marco-MiniLM-L-6-v2 are loaded with PyTorch as the reference and with each
+ONNX Runtime / OpenVINO backend (the int8-quantized exports in Utils.backend_model_files). For the golden
+questions and the chunks retrieved for them, the report gives the cosine similarity of the embeddings to
+the reference, the re-ranking score differences, rank agreement (Spearman correlation and top-1 match
+per question) and p50/p95 latency, and checks parity against the given thresholds.
+
+Run from the repo root after building the vector store:
+    python src/backend_report.py [--backends onnx openvino] [--candidates 12] [--output src/data/backend_report.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import models
+import utils as car_utils
+from benchmark import GOLDEN_SET_PATH, elapsed_ms, load_golden_set, summarize
+
+def spearman(scores, reference_scores):
+    """Spearman rank correlation of two score lists (no ties expected from model scores)"""
+    if len(scores) < 2:
+        return 1.0
+    ranks = np.argsort(np.argsort(scores))
+    reference_ranks = np.argsort(np.argsort(reference_scores))
+    return float(np.corrcoef(ranks, reference_ranks)[0, 1])
+
+def time_models(embeddings_model, re_ranking_model, questions, passages):
+    """Query embeddings, re-ranking scores and per-question latencies of one backend"""
+    # the first calls pay for session / graph initialization, which is not part of the comparison
+    embeddings_model.embed_query(questions[0])
+    re_ranking_model.predict([(questions[0], passages[0][0])])
+
+    query_vectors, scores = [], []
+    latencies = {"embed_query": [], "embed_passages": [], "rerank": []}
+    for question, question_passages in zip(questions, passages):
+        start = time.perf_counter()
+        query_vectors.append(embeddings_model.embed_query(question))
+        latencies["embed_query"].append(elapsed_ms(start))
+
+        start = time.perf_counter()
+        embeddings_model.embed_documents(question_passages)
+        latencies["embed_passages"].append(elapsed_ms(start))
+
+        start = time.perf_counter()
+        scores.append(np.asarray(re_ranking_model.predict([(question, passage) for passage in question_passages]), dtype=np.float32))
+        latencies["rerank"].append(elapsed_ms(start))
+    return np.asarray(query_vectors, dtype=np.float32), scores, latencies
+
+def parity(query_vectors, scores, reference_vectors, reference_scores):
+    vector_norms = np.linalg.norm(query_vectors, axis=1) * np.linalg.norm(reference_vectors, axis=1)
+    cosines = np.sum(query_vectors * reference_vectors, axis=1) / vector_norms
+    score_differences = np.concatenate([np.abs(candidate - reference) for candidate, reference in zip(scores, reference_scores)])
+    return {
+        "embedding_cosine_min": round(float(np.min(cosines)), 5),
+        "embedding_cosine_mean": round(float(np.mean(cosines)), 5),
+        "rerank_score_diff_max": round(float(np.max(score_differences)), 4),
+        "rerank_score_diff_mean": round(float(np.mean(score_differences)), 4),
+        "rerank_spearman_mean": round(float(np.mean([spearman(candidate, reference) for candidate, reference in zip(scores, reference_scores)])), 4),
+        "rerank_top1_agreement": round(float(np.mean([np.argmax(candidate) == np.argmax(reference) for candidate, reference in zip(scores, reference_scores)])), 4),
+    }
+
+def run_report(backends, candidates=12, golden_set_path=GOLDEN_SET_PATH):
+    questions = list(dict.fromkeys(item["question"] for item in load_golden_set(golden_set_path)))
+    model_files = car_utils.getInferenceBackendAttributes()["model_files"]
+
+    reference_embeddings = models.loadEmbeddingsModel()
+    reference_re_ranking = models.loadReRankingModel()
+
+    # the passages a question is re-ranked against in the app: its nearest chunks in the shared store
+    vector_store = models.getVectorStore()
+    passages = [[doc.page_content for doc in vector_store.similarity_search_by_vector(reference_embeddings.embed_query(question), k=candidates)]
+                for question in questions]
+
+    reference_vectors, reference_scores, reference_latencies = time_models(reference_embeddings, reference_re_ranking, questions, passages)
+    results = [{"backend": "torch", "file_name": None,
+                "latency_ms": {stage: summarize(values) for stage, values in reference_latencies.items()}}]
+
+    for backend in backends:
+        file_name = model_files.get(backend)
+        try:
+            embeddings_model = models.loadEmbeddingsModel(backend, file_name)
+            re_ranking_model = models.loadReRankingModel(backend, file_name)
+        except Exception as e:
+            print(f"Skipping {backend}: {e}")
+            continue
+        query_vectors, scores, latencies = time_models(embeddings_model, re_ranking_model, questions, passages)
+        latency_report = {stage: summarize(values) for stage, values in latencies.items()}
+        results.append({
+            "backend": backend,
+            "file_name": file_name,
+            "parity": parity(query_vectors, scores, reference_vectors, reference_scores),
+            "latency_ms": latency_report,
+            "speedup_p50": {stage: round(results[0]["latency_ms"][stage]["p50"] / latency_report[stage]["p50"], 2) if latency_report[stage]["p50"] else 0.0
+                            for stage in latency_report},
+        })
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "embeddings_model": car_utils.getEmbeddingsmodelName(),
+        "re_ranking_model": car_utils.getReRankingModelName(),
+        "questions": len(questions),
+        "candidates": candidates,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ONNX Runtime / OpenVINO backends of the embedder and re-ranker with PyTorch")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "openvino"])
+    parser.add_argument("--candidates", type=int, default=12, help="chunks re-ranked per question")
+    parser.add_argument("--golden-set", default=GOLDEN_SET_PATH)
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="lowest accepted query embedding cosine similarity")
+    parser.add_argument("--min-spearman", type=float, default=0.95, help="lowest accepted mean rank correlation of re-ranking scores")
+    parser.add_argument("--output", default=os.path.join("src", "data", "backend_report.json"))
+    args = parser.parse_args()
+
+    report = run_report(args.backends, args.candidates, args.golden_set)
+    print(f"{'backend':<10} {'embed p50':>10} {'rerank p50':>11} {'speedup':>13} {'cos min':>8} {'score diff':>11} {'spearman':>9} {'top-1':>6}  parity")
+    failed = False
+    for result in report["results"]:
+        latency = result["latency_ms"]
+        if "parity" not in result:
+            print(f"{result['backend']:<10} {latency['embed_query']['p50']:>10.2f} {latency['rerank']['p50']:>11.2f} {'reference':>13}")
+            continue
+        result_parity, speedup = result["parity"], result["speedup_p50"]
+        passed = result_parity["embedding_cosine_min"] >= args.min_cosine and result_parity["rerank_spearman_mean"] >= args.min_spearman
+        failed = failed or not passed
+        print(f"{result['backend']:<10} {latency['embed_query']['p50']:>10.2f} {latency['rerank']['p50']:>11.2f} "
+              f"{speedup['embed_query']:>5.2f}x/{speedup['rerank']:>5.2f}x {result_parity['embedding_cosine_min']:>8.4f} "
+              f"{result_parity['rerank_score_diff_max']:>11.4f} {result_parity['rerank_spearman_mean']:>9.4f} "
+              f"{result_parity['rerank_top1_agreement']:>6.2f}  {'ok' if passed else 'FAILED'}")
+
+    with open(args.output, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"Report written to {args.output}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
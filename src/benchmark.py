@@ -0,0 +1,226 @@
+"""
+Offline retrieval benchmark over a golden set of Carnatic questions.
+Runs knowledge_tool, raga_index_tool, krithi_tool and multi_search without the LLM and reports
+per-stage latency (embed, lookup, search, rerank, format) as p50/p95/p99, throughput, and recall@k / MRR
+against the labelled relevant chunks. Results are written to JSON so runs can be compared.
+
+Run from the repo root after building the vector store:
+    python src/benchmark.py [--repeat 3] [--k 6] [--output bench.json] [--baseline previous.json]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+import models
+import utils as car_utils
+from reranker import RerankScheduler, RerankScoreCache, chunk_id
+from tools import (QueryEmbeddingContext, collect_candidates, exact_lookup, tool_result,
+                   MULTI_SEARCH_CATEGORIES, TOOL_SEARCH_SPECS)
+
+BENCHMARK_TOOLS = ["knowledge_tool", "raga_index_tool", "krithi_tool", "multi_search"]
+STAGES = ["embed", "lookup", "search", "rerank", "format"]
+GOLDEN_SET_PATH = os.path.join("src", "data", "benchmark", "golden_questions.json")
+
+def load_golden_set(path=GOLDEN_SET_PATH):
+    with open(path, "r", encoding="utf-8") as golden_file:
+        return json.load(golden_file)["questions"]
+
+def term_groups(item):
+    """Lower-cased relevant_terms as groups of alternative spellings; a plain string is a group of one"""
+    return [[term.lower() for term in ([group] if isinstance(group, str) else group)]
+            for group in item.get("relevant_terms", [])]
+
+def matches_group(text, group):
+    return any(term in text for term in group)
+
+def is_relevant(doc, item):
+    if chunk_id(doc) in item.get("relevant_chunk_ids", []):
+        return True
+    text = doc.page_content.lower()
+    return any(matches_group(text, group) for group in term_groups(item))
+
+def recall_at_k(docs, item, k):
+    """Share of labelled chunk ids (or, for term labels, of term groups) found in the top k"""
+    top_docs = docs[:k]
+    if item.get("relevant_chunk_ids"):
+        found = {chunk_id(doc) for doc in top_docs} & set(item["relevant_chunk_ids"])
+        return len(found) / len(item["relevant_chunk_ids"])
+    groups = term_groups(item)
+    if not groups:
+        return 0.0
+    texts = [doc.page_content.lower() for doc in top_docs]
+    found = [group for group in groups if any(matches_group(text, group) for text in texts)]
+    return len(found) / len(groups)
+
+def reciprocal_rank(docs, item):
+    for rank, doc in enumerate(docs, start=1):
+        if is_relevant(doc, item):
+            return 1.0 / rank
+    return 0.0
+
+def summarize(latencies):
+    if not latencies:
+        return {}
+    return {
+        "count": len(latencies),
+        "mean": round(float(np.mean(latencies)), 3),
+        "p50": round(float(np.percentile(latencies, 50)), 3),
+        "p95": round(float(np.percentile(latencies, 95)), 3),
+        "p99": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+def elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
+
+def run_tool_once(tool_name, question, query_context, use_score_cache):
+    """
+    One tool run, as run_tools does it, with each stage timed separately; returns (stage timings in ms, final docs).
+    Lookup table rows lead the final docs, so questions answered from the raga table are scored on those rows.
+    """
+    timings = {stage: 0.0 for stage in STAGES}
+    # a private, empty score cache keeps the rerank timing honest across repeats
+    scheduler = RerankScheduler() if use_score_cache else RerankScheduler(score_cache=RerankScoreCache(max_entries=0))
+
+    start = time.perf_counter()
+    lookup = exact_lookup(tool_name, question)
+    timings["lookup"] = elapsed_ms(start)
+    lookup_text, answers_question = lookup if lookup is not None else (None, False)
+    lookup_docs = [Document(page_content=lookup_text, metadata={"tool": tool_name})] if lookup_text else []
+    if answers_question:
+        return timings, lookup_docs
+
+    start = time.perf_counter()
+    with query_context:
+        for submission in collect_candidates(tool_name, question, MULTI_SEARCH_CATEGORIES, 4):
+            scheduler.submit(*submission)
+    timings["search"] = elapsed_ms(start)
+
+    start = time.perf_counter()
+    ranked = scheduler.run()
+    timings["rerank"] = elapsed_ms(start)
+
+    start = time.perf_counter()
+    result = tool_result(tool_name, question, scheduler, ranked, MULTI_SEARCH_CATEGORIES, lookup_text)
+    timings["format"] = elapsed_ms(start)
+    return timings, lookup_docs + result.docs
+
+def run_benchmark(golden_set, repeat=1, k=6, use_score_cache=False):
+    # load everything retrieval needs up front (the LLM client is not used offline)
+    embeddings_model = models.getEmbeddingsModel()
+    models.getReRankingModel()
+    models.getRagaTable()
+    models.getVectorStore()
+    for category in car_utils.getVectoreStoreAttributes()["meta_data"]:
+        models.getVectorStore(category)
+
+    stage_latencies = {tool_name: {stage: [] for stage in STAGES} for tool_name in BENCHMARK_TOOLS}
+    total_latencies = {tool_name: [] for tool_name in BENCHMARK_TOOLS}
+    quality = {tool_name: {"recall": [], "rr": []} for tool_name in BENCHMARK_TOOLS}
+
+    wall_start = time.perf_counter()
+    tool_runs = 0
+    for iteration in range(repeat):
+        for item in golden_set:
+            question = item["question"]
+
+            # embedding happens once per question and is shared by every tool, as in get_answer
+            start = time.perf_counter()
+            query_context = QueryEmbeddingContext(embeddings_model)
+            query_context.get(question)
+            embed_ms = elapsed_ms(start)
+
+            for tool_name in item.get("tools", BENCHMARK_TOOLS):
+                timings, docs = run_tool_once(tool_name, question, query_context, use_score_cache)
+                timings["embed"] = embed_ms
+                for stage in STAGES:
+                    stage_latencies[tool_name][stage].append(timings[stage])
+                total_latencies[tool_name].append(sum(timings.values()))
+                tool_runs += 1
+
+                # quality does not change between repeats
+                if iteration == 0:
+                    quality[tool_name]["recall"].append(recall_at_k(docs, item, k))
+                    quality[tool_name]["rr"].append(reciprocal_rank(docs, item))
+    wall_seconds = time.perf_counter() - wall_start
+
+    tools_report = {}
+    for tool_name in BENCHMARK_TOOLS:
+        if not total_latencies[tool_name]:
+            continue
+        tools_report[tool_name] = {
+            "latency_ms": {stage: summarize(stage_latencies[tool_name][stage]) for stage in STAGES},
+            "total_latency_ms": summarize(total_latencies[tool_name]),
+            "throughput_qps": round(len(total_latencies[tool_name]) / (sum(total_latencies[tool_name]) / 1000), 3),
+            f"recall_at_{k}": round(float(np.mean(quality[tool_name]["recall"])), 4),
+            "mrr": round(float(np.mean(quality[tool_name]["rr"])), 4),
+        }
+
+    text_splitter = car_utils.getTextSplitter()
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "k": k,
+            "repeat": repeat,
+            "questions": len(golden_set),
+            "use_score_cache": use_score_cache,
+            "chunk_size": text_splitter._chunk_size,
+            "chunk_overlap": text_splitter._chunk_overlap,
+            "tool_search_specs": TOOL_SEARCH_SPECS,
+            "index_spec": car_utils.getIndexSpec(),
+            "embeddings_model": car_utils.getEmbeddingsmodelName(),
+            "re_ranking_model": car_utils.getReRankingModelName(),
+        },
+        "overall": {"tool_runs": tool_runs, "wall_seconds": round(wall_seconds, 3),
+                    "throughput_tool_runs_per_second": round(tool_runs / wall_seconds, 3) if wall_seconds else 0.0},
+        "tools": tools_report,
+    }
+
+def compare(report, baseline):
+    """Print p95 latency and quality deltas against an earlier report"""
+    k = report["config"]["k"]
+    print(f"\nComparison with baseline from {baseline.get('timestamp', '?')}:")
+    for tool_name, tool_report in report["tools"].items():
+        base = baseline.get("tools", {}).get(tool_name)
+        if base is None:
+            continue
+        p95 = tool_report["total_latency_ms"]["p95"]
+        base_p95 = base["total_latency_ms"]["p95"]
+        recall_key = f"recall_at_{k}"
+        print(f"  {tool_name:<16} p95 {base_p95:>9.2f} -> {p95:>9.2f} ms ({(p95 - base_p95) / base_p95 * 100 if base_p95 else 0:+.1f}%)"
+              f"  {recall_key} {base.get(recall_key, float('nan')):.3f} -> {tool_report[recall_key]:.3f}"
+              f"  mrr {base['mrr']:.3f} -> {tool_report['mrr']:.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark for the Carnatic music tools")
+    parser.add_argument("--golden-set", default=GOLDEN_SET_PATH)
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the golden set for latency statistics")
+    parser.add_argument("--k", type=int, default=6, help="cut-off for recall@k")
+    parser.add_argument("--use-score-cache", action="store_true", help="let repeats hit the shared re-ranking score cache")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="earlier benchmark JSON to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmark(load_golden_set(args.golden_set), args.repeat, args.k, args.use_score_cache)
+
+    print(f"{'tool':<16} {'embed p50':>10} {'lookup p50':>11} {'search p50':>11} {'rerank p50':>11} {'format p50':>11} {'total p95':>10} {'recall@' + str(args.k):>10} {'mrr':>6}")
+    for tool_name, tool_report in report["tools"].items():
+        latency = tool_report["latency_ms"]
+        print(f"{tool_name:<16} {latency['embed']['p50']:>10.2f} {latency['lookup']['p50']:>11.2f} {latency['search']['p50']:>11.2f} {latency['rerank']['p50']:>11.2f} "
+              f"{latency['format']['p50']:>11.2f} {tool_report['total_latency_ms']['p95']:>10.2f} "
+              f"{tool_report[f'recall_at_{args.k}']:>10.3f} {tool_report['mrr']:>6.3f}")
+
+    with open(args.output, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            compare(report, json.load(baseline_file))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Memory-mapped chunk store used in place of the pickled LangChain docstore at query time.
+
+Layout inside a vector store directory (next to index.faiss):
+    chunks.bin           UTF-8 JSON records {"id", "page_content", "metadata"}, one per FAISS row
+    chunks_offsets.npy   int64 offsets; row i is chunks.bin[offsets[i]:offsets[i + 1]]
+
+Both files are opened with mmap, so worker processes share the pages through the OS cache and
+Documents are only materialized for the hits a search returns.
+"""
+
+import json
+import mmap
+import os
+import threading
+from typing import List
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from ann_index import SERVING_INDEX_FILE, apply_search_params
+
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks_offsets.npy"
+INDEX_FILE = "index.faiss"
+
+def has_chunk_store(store_dir) -> bool:
+    return os.path.exists(os.path.join(store_dir, CHUNKS_FILE)) and os.path.exists(os.path.join(store_dir, OFFSETS_FILE))
+
+def write_chunk_store(store_dir, vector_store):
+    """Export the docstore of a LangChain FAISS store in FAISS row order"""
+    chunks_path = os.path.join(store_dir, CHUNKS_FILE)
+    offsets_path = os.path.join(store_dir, OFFSETS_FILE)
+    offsets = [0]
+    with open(f"{chunks_path}.tmp", "wb") as chunks_file:
+        for row in range(vector_store.index.ntotal):
+            doc_id = vector_store.index_to_docstore_id[row]
+            doc = vector_store.docstore.search(doc_id)
+            record = json.dumps({"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata},
+                                ensure_ascii=False).encode("utf-8")
+            chunks_file.write(record)
+            offsets.append(offsets[-1] + len(record))
+    with open(f"{offsets_path}.tmp", "wb") as offsets_file:
+        np.save(offsets_file, np.asarray(offsets, dtype=np.int64))
+    os.replace(f"{chunks_path}.tmp", chunks_path)
+    os.replace(f"{offsets_path}.tmp", offsets_path)
+
+class MappedVectorStore:
+    """
+    Read-only vector store over a raw FAISS index and a memory-mapped chunk store.
+    Supports the search calls the tools make on LangChain's FAISS store.
+    """
+
+    def __init__(self, store_dir, embeddings_model=None, search_params: dict = None):
+        self.store_dir = store_dir
+        self.embeddings_model = embeddings_model
+        # the approximate serving index when one was built, otherwise the exact flat index
+        serving_path = os.path.join(store_dir, SERVING_INDEX_FILE)
+        self.index = faiss.read_index(serving_path if os.path.exists(serving_path) else os.path.join(store_dir, INDEX_FILE))
+        self.set_search_params(**(search_params or {}))
+        # FAISS row of every Document handed out, so the stored vectors of search hits can be reconstructed
+        self._rows_by_id = {}
+        self._direct_map_lock = threading.Lock()
+        self.offsets = np.load(os.path.join(store_dir, OFFSETS_FILE), mmap_mode="r")
+        self._chunks_file = open(os.path.join(store_dir, CHUNKS_FILE), "rb")
+        if self.offsets[-1] > 0:
+            self._chunks = mmap.mmap(self._chunks_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._chunks = b""
+
+    def set_search_params(self, **params):
+        """Query-time accuracy/speed settings, e.g. nprobe for IVF indexes or efSearch for HNSW"""
+        apply_search_params(self.index, params)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _record(self, row: int) -> dict:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._chunks[start:end].decode("utf-8"))
+
+    def get_document(self, row: int) -> Document:
+        """Materialize the Document stored at a FAISS row"""
+        record = self._record(row)
+        self._rows_by_id[record["id"]] = row
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def get_vectors(self, docs: List[Document]):
+        """
+        Stored vectors (float32 array, one row per doc) of documents returned by this store, or None
+        if one of them did not come from it. Compressed serving indexes (PQ, SQ8) give approximate vectors.
+        """
+        rows = [self._rows_by_id.get(doc.id) for doc in docs]
+        if any(row is None for row in rows):
+            return None
+        rows = np.asarray(rows, dtype=np.int64)
+        try:
+            return self.index.reconstruct_batch(rows)
+        except RuntimeError:
+            # IVF indexes need a direct map from rows to inverted list entries, built once on first use
+            with self._direct_map_lock:
+                faiss.extract_index_ivf(self.index).make_direct_map()
+            return self.index.reconstruct_batch(rows)
+
+    def get_metadata(self, row: int) -> dict:
+        return self._record(row)["metadata"]
+
+    def _matches(self, row: int, filter: dict) -> bool:
+        metadata = self.get_metadata(row)
+        return all(metadata.get(key) in value if isinstance(value, list) else metadata.get(key) == value
+                   for key, value in filter.items())
+
+    def search_rows(self, embedding, k: int = 4, filter: dict = None, fetch_k: int = 20):
+        """(row, distance) pairs of the nearest chunks, optionally restricted by a metadata filter"""
+        if self.index.ntotal == 0:
+            return []
+        vector = np.asarray([embedding], dtype=np.float32)
+        search_k = k if filter is None else max(fetch_k, k)
+        distances, rows = self.index.search(vector, min(search_k, self.index.ntotal))
+        hits = []
+        for distance, row in zip(distances[0], rows[0]):
+            if row < 0:
+                continue
+            if filter is not None and not self._matches(int(row), filter):
+                continue
+            hits.append((int(row), float(distance)))
+            if len(hits) == k:
+                break
+        return hits
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, filter: dict = None, fetch_k: int = 20, **kwargs):
+        return [(self.get_document(row), distance) for row, distance in self.search_rows(embedding, k, filter, fetch_k)]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: dict = None, fetch_k: int = 20, **kwargs) -> List[Document]:
+        return [doc for doc, distance in self.similarity_search_with_score_by_vector(embedding, k, filter, fetch_k)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict = None, fetch_k: int = 20, **kwargs) -> List[Document]:
+        embedding = self.embeddings_model.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k, filter, fetch_k)
+
+    def close(self):
+        if isinstance(self._chunks, mmap.mmap):
+            self._chunks.close()
+        self._chunks_file.close()
@@ -0,0 +1,146 @@
+"""
+Token-budgeted packing of tool results into the retrieved-information block of a prompt.
+Chunks returned by several tools are kept once, ordered by their re-ranking score and added
+until the configured token budget is used up. Tokens are counted with the tokenizer configured in
+Utils (context_tokenizer) when it loads; otherwise the count is an estimate of four characters per
+token raised by a fixed safety margin, since the Llama 3 tokenizer of the LLM is not available offline.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import List
+
+import utils as car_utils
+from reranker import chunk_id
+from tracing import span
+
+# the answer prompt, critique and refinement pack the same tool results, so recent packings are reused
+_recent_packings = OrderedDict()
+_recent_packings_lock = threading.Lock()
+RECENT_PACKINGS = 8
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+def get_tokenizer():
+    """The configured tokenizer, loaded on first use; None when none is configured or it failed to load (not retried)"""
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        with _tokenizer_lock:
+            if not _tokenizer_loaded:
+                tokenizer_name = car_utils.getContextPackerAttributes()["tokenizer"]
+                if tokenizer_name:
+                    try:
+                        from tokenizers import Tokenizer
+                        _tokenizer = Tokenizer.from_pretrained(tokenizer_name)
+                    except Exception as e:
+                        print(f"Warning: Could not load tokenizer {tokenizer_name}, estimating token counts instead: {e}")
+                _tokenizer_loaded = True
+    return _tokenizer
+
+def count_tokens(text: str, token_margin: float = 0.25) -> int:
+    """Tokens in text according to the configured tokenizer, or four characters per token plus token_margin without one"""
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return max(1, math.ceil(len(text) / 4 * (1 + token_margin)))
+
+def format_chunk(doc, tool_names: List[str], max_chars: int) -> str:
+    md = doc.metadata or {}
+    src = md.get("source_file", md.get("source", "?"))
+    cat = md.get("category", "?")
+    return f"({cat} | {src} | {', '.join(tool_names)}) {doc.page_content.strip()[:max_chars]}"
+
+class ContextPacker:
+    """
+    Builds the retrieved-information text for a list of tool results.
+
+    Usage:
+        packer = ContextPacker()
+        retrieved_information = packer.pack(tool_results)
+    """
+
+    def __init__(self, token_budget: int = None, max_chunk_chars: int = None):
+        packer_attributes = car_utils.getContextPackerAttributes()
+        self.token_budget = token_budget or packer_attributes["token_budget"]
+        self.max_chunk_chars = max_chunk_chars or packer_attributes["max_chunk_chars"]
+        self.token_margin = packer_attributes["token_margin"]
+
+    def count_tokens(self, text: str) -> int:
+        return count_tokens(text, self.token_margin)
+
+    def pack(self, tool_results: List[str]) -> str:
+        """De-duplicated chunks of all tool results, best first, within the token budget"""
+        cache_key = (self.token_budget, self.max_chunk_chars, tuple(tool_results))
+        with _recent_packings_lock:
+            if cache_key in _recent_packings:
+                _recent_packings.move_to_end(cache_key)
+                return _recent_packings[cache_key]
+
+        with span("context_packing", token_budget=self.token_budget) as packing_span:
+            packed, stats = self._pack(tool_results)
+            packing_span.set(**stats)
+
+        with _recent_packings_lock:
+            _recent_packings[cache_key] = packed
+            while len(_recent_packings) > RECENT_PACKINGS:
+                _recent_packings.popitem(last=False)
+        return packed
+
+    def _pack(self, tool_results: List[str]):
+        notes = []
+        chunks = OrderedDict()
+        chunks_in = 0
+        for position, result in enumerate(tool_results):
+            docs = getattr(result, "docs", None)
+            if getattr(result, "lookup", None) and docs:
+                # lookup table rows merged with retrieved documents lead the packed context
+                notes.append(f"Results from {result.tool_name}:\n{result.lookup}")
+            if not docs:
+                # errors and plain-text results are kept as they are
+                notes.append(str(result))
+                continue
+            for rank, (doc, score) in enumerate(zip(docs, result.scores)):
+                chunks_in += 1
+                doc_id = chunk_id(doc)
+                if doc_id not in chunks:
+                    chunks[doc_id] = {"doc": doc, "score": score, "order": (position, rank), "tools": []}
+                chunk = chunks[doc_id]
+                if score is not None and (chunk["score"] is None or score > chunk["score"]):
+                    chunk["score"] = score
+                if result.tool_name not in chunk["tools"]:
+                    chunk["tools"].append(result.tool_name)
+
+        # highest re-ranking score first; unscored chunks keep their retrieval order after the scored ones
+        ranked = sorted(chunks.values(), key=lambda chunk: (chunk["score"] is None, -(chunk["score"] or 0.0), chunk["order"]))
+
+        sections = []
+        used_tokens = 0
+        for note in notes:
+            note_tokens = self.count_tokens(note)
+            if used_tokens + note_tokens > self.token_budget and sections:
+                break
+            sections.append(note)
+            used_tokens += note_tokens
+
+        kept = 0
+        for chunk in ranked:
+            entry = f"[{kept + 1}] " + format_chunk(chunk["doc"], chunk["tools"], self.max_chunk_chars)
+            entry_tokens = self.count_tokens(entry)
+            if used_tokens + entry_tokens > self.token_budget:
+                # a smaller chunk further down may still fit
+                continue
+            sections.append(entry)
+            used_tokens += entry_tokens
+            kept += 1
+
+        if not sections:
+            sections.append("No results.")
+        stats = {"chunks_in": chunks_in, "duplicates": chunks_in - len(chunks), "chunks_kept": kept, "tokens": used_tokens}
+        return "\n\n".join(sections), stats
+
+def pack_tool_results(tool_results: List[str]) -> str:
+    """Pack tool results with a ContextPacker configured from Utils"""
+    return ContextPacker().pack(tool_results)
@@ -0,0 +1,96 @@
+"""
+Near-duplicate chunk detection for index builds.
+Repeated headers, footers and boilerplate pages of the PDFs, and the overlap between splitter passes,
+produce chunks that are nearly identical. Each chunk gets a MinHash signature of its word 3-shingles;
+locality-sensitive hashing over bands of the signature finds earlier chunks that may be similar, and a
+chunk whose estimated Jaccard similarity to one of them reaches the threshold is a near-duplicate.
+vector_store_generator.py drops those before embedding.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+def shingles(text: str, size: int = 3) -> set:
+    """Lower-case word n-grams of a text; texts shorter than size words give one shingle"""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[start:start + size]) for start in range(len(words) - size + 1)}
+
+class MinHasher:
+    """MinHash signatures from num_perm universal hash functions over crc32 shingle hashes"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        random_state = np.random.RandomState(seed)
+        self.a = random_state.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self.b = random_state.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)), dtype=np.uint64)
+        permuted = (hashes[:, None] * self.a[None, :] + self.b[None, :]) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+
+class NearDuplicateIndex:
+    """
+    Signatures of the chunks kept so far, bucketed by LSH band.
+
+    Usage:
+        duplicate_index = NearDuplicateIndex(threshold=0.85)
+        duplicate_index.add(chunk_id, text)                          # chunk already in the store
+        duplicate_of = duplicate_index.check_and_add(chunk_id, text) # None when the chunk is new
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _insert(self, key, signature, band_keys):
+        self.signatures[key] = signature
+        for bucket, band_key in zip(self.buckets, band_keys):
+            bucket.setdefault(band_key, []).append(key)
+
+    def add(self, key, text: str):
+        signature = self.hasher.signature(text)
+        self._insert(key, signature, self._band_keys(signature))
+
+    def find(self, signature: np.ndarray, band_keys=None):
+        """Key of the most similar indexed chunk at or above the threshold, or None"""
+        band_keys = band_keys or self._band_keys(signature)
+        best_key, best_similarity = None, self.threshold
+        seen = set()
+        for bucket, band_key in zip(self.buckets, band_keys):
+            for candidate in bucket.get(band_key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                # the share of equal MinHash values estimates the Jaccard similarity of the shingle sets
+                similarity = float(np.mean(self.signatures[candidate] == signature))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = candidate, similarity
+        return best_key
+
+    def check_and_add(self, key, text: str):
+        """Key of the chunk this one nearly duplicates, or None after indexing it as a new chunk"""
+        signature = self.hasher.signature(text)
+        band_keys = self._band_keys(signature)
+        duplicate_of = self.find(signature, band_keys)
+        if duplicate_of is None:
+            self._insert(key, signature, band_keys)
+        return duplicate_of
@@ -0,0 +1,112 @@
+"""
+Recall versus latency report for the approximate index types in ann_index.py.
+Every index type is built from the vectors of the exact flat index of the shared vector store and
+queried with a set of sample questions; recall@k is measured against the flat search results.
+
+Run from the repo root after building the vector store:
+    python src/index_report.py [--k 10] [--output src/data/index_report.json]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+
+import models
+import utils as car_utils
+from ann_index import apply_search_params, build_index
+
+SAMPLE_QUESTIONS = [
+    "What is carnatic music?",
+    "Tell me about raga Mayamalavagowla",
+    "Explain melakarta",
+    "Raga Bhairavi characteristics",
+    "What is the arohanam and avarohanam of Shankarabharanam?",
+    "Which melakarta is Kalyani?",
+    "What are the janya ragas of Kharaharapriya?",
+    "Who composed Endaro Mahanubhavulu?",
+    "What is a prayoga?",
+    "Explain gamakas in Carnatic music",
+    "What is the tala of a varnam?",
+    "Difference between sampurna and vakra ragas",
+]
+
+# index specs and the query-time settings swept for each
+REPORT_SPECS = [
+    ({"type": "flat"}, [{}]),
+    ({"type": "hnsw", "hnsw_m": 32}, [{"efSearch": ef} for ef in (16, 32, 64, 128)]),
+    ({"type": "ivf", "nlist": 1024}, [{"nprobe": nprobe} for nprobe in (1, 4, 16, 64)]),
+    ({"type": "ivfpq", "nlist": 1024, "pq_m": 16}, [{"nprobe": nprobe} for nprobe in (1, 4, 16, 64)]),
+    ({"type": "sq8"}, [{}]),
+]
+
+def recall_at_k(approx_rows, exact_rows, k):
+    hits = [len(set(approx[:k]) & set(exact[:k])) / max(1, min(k, len(exact))) for approx, exact in zip(approx_rows, exact_rows)]
+    return float(np.mean(hits))
+
+def time_queries(index, queries, k):
+    """Rows returned for each query and the per-query latency in milliseconds"""
+    rows, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        distances, result_rows = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        rows.append([int(row) for row in result_rows[0] if row >= 0])
+    return rows, latencies
+
+def run_report(k=10):
+    vector_store_attributes = car_utils.getVectoreStoreAttributes()
+    persist_path = os.path.join(vector_store_attributes["dir_name"], vector_store_attributes["file_name"])
+    flat_index = faiss.read_index(os.path.join(persist_path, "index.faiss"))
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+
+    queries = np.asarray(models.getEmbeddingsModel().embed_documents(SAMPLE_QUESTIONS), dtype=np.float32)
+    k = min(k, flat_index.ntotal)
+    exact_rows, _ = time_queries(flat_index, queries, k)
+
+    results = []
+    for spec, search_settings in REPORT_SPECS:
+        start = time.perf_counter()
+        try:
+            index = build_index(vectors, spec)
+        except RuntimeError as e:
+            print(f"Skipping {spec['type']}: {e}")
+            continue
+        build_seconds = time.perf_counter() - start
+
+        for params in search_settings:
+            apply_search_params(index, params)
+            rows, latencies = time_queries(index, queries, k)
+            results.append({
+                "index_type": spec["type"],
+                "spec": spec,
+                "search_params": params,
+                "build_seconds": round(build_seconds, 3),
+                "recall_at_k": round(recall_at_k(rows, exact_rows, k), 4),
+                "latency_ms_p50": round(float(np.percentile(latencies, 50)), 4),
+                "latency_ms_p95": round(float(np.percentile(latencies, 95)), 4),
+            })
+
+    return {"k": k, "vectors": int(flat_index.ntotal), "queries": len(SAMPLE_QUESTIONS), "results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall and latency of approximate index types against flat search")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default=os.path.join("src", "data", "index_report.json"))
+    args = parser.parse_args()
+
+    report = run_report(args.k)
+    print(f"{'index':<8} {'params':<18} {'recall@' + str(report['k']):<10} {'p50 ms':<9} {'p95 ms':<9}")
+    for result in report["results"]:
+        params = ",".join(f"{name}={value}" for name, value in result["search_params"].items()) or "-"
+        print(f"{result['index_type']:<8} {params:<18} {result['recall_at_k']:<10} {result['latency_ms_p50']:<9} {result['latency_ms_p95']:<9}")
+
+    with open(args.output, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Parallel parsing and chunking of the source files used to build the vector store.
+Large PDFs are cut into page ranges; every (file, page range) task is parsed and split
+in a worker process and the results are merged back in file and page order, so chunk
+order and page_num metadata are the same as with a single-process build.
+extract_page_texts reads whole pages the same way for parsers that need the page layout.
+Page documents carry the same text and metadata as PyPDFLoader's (PDF info, source, total_pages,
+page and page_label).
+"""
+
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+import utils as car_utils
+
+def count_pages(file_path):
+    """Number of pages of a PDF, or None for files that are parsed as a whole"""
+    if not file_path.lower().endswith(".pdf"):
+        return None
+    return len(PdfReader(file_path).pages)
+
+def page_ranges(total_pages, pages_per_task):
+    """[start, end) page ranges covering the document"""
+    if not total_pages:
+        return [(0, total_pages)]
+    return [(start, min(start + pages_per_task, total_pages)) for start in range(0, total_pages, pages_per_task)]
+
+def pdf_metadata(reader, file_path):
+    """File-level metadata the way PyPDFLoader records it: PDF info keys without "/" in lower case, dates in ISO form"""
+    metadata = {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+    for key, value in dict(reader.metadata or {}).items():
+        key = key.lstrip("/").lower()
+        value = value if type(value) in (str, int) else str(value)
+        if key in ("creationdate", "moddate"):
+            try:
+                value = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                pass
+        elif isinstance(value, str):
+            value = value.strip()
+        metadata[key] = value
+    metadata.update({"source": file_path, "total_pages": len(reader.pages)})
+    return metadata
+
+def parse_and_split(file_path, start_page=None, end_page=None):
+    """
+    Worker task: load pages [start_page, end_page) of a file and split them into chunks.
+    Mirrors PyPDFLoader.load_and_split followed by the configured text splitter.
+    """
+    if start_page is None:
+        doc_to_load = car_utils.loadDocuments(file_path)
+    else:
+        reader = PdfReader(file_path)
+        file_metadata = pdf_metadata(reader, file_path)
+        pages = [Document(page_content=reader.pages[page].extract_text().strip(),
+                          metadata={**file_metadata, "page": page, "page_label": reader.page_labels[page]})
+                 for page in range(start_page, end_page)]
+        # load_and_split applies the default splitter page by page
+        doc_to_load = RecursiveCharacterTextSplitter().split_documents(pages)
+
+    return car_utils.getTextSplitter().split_documents(doc_to_load)
+
+def extract_text(file_path, start_page, end_page):
+    """Worker task: raw text of pages [start_page, end_page) of a PDF"""
+    reader = PdfReader(file_path)
+    return [reader.pages[page].extract_text() for page in range(start_page, end_page)]
+
+def extract_page_texts(file_path, max_workers=None, pages_per_task=None):
+    """Text of every page of a PDF, extracted in page ranges by a process pool"""
+    ingest_attributes = car_utils.getIngestAttributes()
+    max_workers = max_workers or ingest_attributes["max_workers"]
+    pages_per_task = pages_per_task or ingest_attributes["pages_per_task"]
+    ranges = page_ranges(count_pages(file_path), pages_per_task)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(extract_text, file_path, start_page, end_page) for start_page, end_page in ranges]
+        return [text for future in futures for text in future.result()]
+
+def iter_parsed_files(source_files, max_workers=None, pages_per_task=None):
+    """
+    Parse and chunk files in a process pool, yielding (source file, chunks, error) in input order.
+
+    Args:
+        source_files: List of tuples whose last element is the absolute file path
+        max_workers: Worker processes (defaults to Utils)
+        pages_per_task: Pages of a PDF handled by one task (defaults to Utils)
+
+    Only a bounded number of tasks is in flight, so at most a few files' chunks are held at once.
+    """
+    ingest_attributes = car_utils.getIngestAttributes()
+    max_workers = max_workers or ingest_attributes["max_workers"]
+    pages_per_task = pages_per_task or ingest_attributes["pages_per_task"]
+
+    def tasks():
+        for file_index, source_file in enumerate(source_files):
+            file_path = source_file[-1]
+            try:
+                total_pages = count_pages(file_path)
+            except Exception as e:
+                yield file_index, None, e
+                continue
+            ranges = [(None, None)] if total_pages is None else page_ranges(total_pages, pages_per_task)
+            for start_page, end_page in ranges:
+                yield file_index, (file_path, start_page, end_page), None
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        current_index, current_chunks, current_error = 0, [], None
+
+        def drain(target_size):
+            nonlocal current_index, current_chunks, current_error
+            while len(in_flight) > target_size:
+                file_index, future, error = in_flight.popleft()
+                # ranges arrive in order, so a new file index means the previous file is complete
+                while file_index > current_index:
+                    yield source_files[current_index], current_chunks, current_error
+                    current_index, current_chunks, current_error = current_index + 1, [], None
+                if error is None:
+                    try:
+                        chunks = future.result()
+                    except Exception as e:
+                        error = e
+                if error is not None:
+                    current_error = current_error or error
+                elif current_error is None:
+                    current_chunks.extend(chunks)
+
+        for file_index, task, error in tasks():
+            future = executor.submit(parse_and_split, *task) if task is not None else None
+            in_flight.append((file_index, future, error))
+            yield from drain(max_workers * 2)
+        yield from drain(0)
+
+        while current_index < len(source_files):
+            yield source_files[current_index], current_chunks, current_error
+            current_index, current_chunks, current_error = current_index + 1, [], None
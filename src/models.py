@@ -2,9 +2,175 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_groq import ChatGroq
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.chains import RetrievalQA
+from langchain_community.vectorstores import FAISS
 from sentence_transformers import CrossEncoder
+import asyncio
+import httpx
+import os
+import threading
+import weakref
 
 import utils as car_utils
+from chunk_store import MappedVectorStore, has_chunk_store
+from sparse_index import load_sparse_index
+from raga_table import load_raga_table
+
+def backend_kwargs(backend: str = None, file_name: str = None) -> dict:
+    """sentence-transformers arguments selecting an ONNX Runtime / OpenVINO model file (none for torch)"""
+    if backend in (None, "torch"):
+        return {}
+    kwargs = {"backend": backend}
+    if file_name:
+        kwargs["model_kwargs"] = {"file_name": file_name}
+    return kwargs
+
+def loadEmbeddingsModel(backend: str = None, file_name: str = None):
+    return HuggingFaceEmbeddings(
+        model_name=car_utils.getEmbeddingsmodelName(),
+        model_kwargs=backend_kwargs(backend, file_name)
+    )
+
+def loadReRankingModel(backend: str = None, file_name: str = None):
+    return CrossEncoder(car_utils.getReRankingModelName(), **backend_kwargs(backend, file_name))
+
+def _load_with_backend(loader, backend_attributes, model_label):
+    """Load a model on the configured backend, falling back to torch when that backend is unavailable"""
+    backend = backend_attributes["backend"]
+    if backend in (None, "torch"):
+        return loader()
+    try:
+        return loader(backend, backend_attributes["file_name"])
+    except Exception as e:
+        print(f"Warning: Could not load the {model_label} with the {backend} backend (needs sentence-transformers>=4.1 "
+              f"with its {backend} extra), using torch: {e}")
+        return loader()
+
+class ResourceRegistry:
+    """
+    Process-wide registry of the embedder, re-ranker, vector stores and LLM client.
+    Each resource is loaded on first use and shared by every caller afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._resources = {}
+        # an httpx.AsyncClient is bound to the event loop it first ran on, so async callers get an LLM client per loop
+        self._async_llms = weakref.WeakKeyDictionary()
+
+    def _get_or_load(self, key, loader):
+        if key in self._resources:
+            return self._resources[key]
+        with self._lock:
+            if key not in self._resources:
+                self._resources[key] = loader()
+            return self._resources[key]
+
+    def _load_embeddings_model(self):
+        backend_attributes = car_utils.getInferenceBackendAttributes()["embeddings"]
+        return _load_with_backend(loadEmbeddingsModel, backend_attributes, "embeddings model")
+
+    def _load_re_ranking_model(self):
+        backend_attributes = car_utils.getInferenceBackendAttributes()["re_ranking"]
+        return _load_with_backend(loadReRankingModel, backend_attributes, "re-ranking model")
+
+    def _http_client_settings(self):
+        """Connection pool limits and timeout of the HTTP clients for the LLM API"""
+        connection_attributes = car_utils.getLLMConnectionAttributes()
+        limits = httpx.Limits(max_connections=connection_attributes["max_connections"],
+                              max_keepalive_connections=connection_attributes["max_keepalive_connections"])
+        return {"limits": limits, "timeout": httpx.Timeout(connection_attributes["timeout_seconds"])}
+
+    def _load_http_clients(self):
+        """Pooled HTTP client for the LLM API, shared by sync calls from every session"""
+        return {"sync": httpx.Client(**self._http_client_settings())}
+
+    def _load_llm(self, http_async_client=None):
+        return ChatGroq(
+            model=car_utils.getLLMmodelName(),
+            api_key=car_utils.getAPIkey(),
+            http_client=self.getHTTPClients()["sync"],
+            http_async_client=http_async_client
+        )
+
+    def _store_path(self, category=None):
+        vector_store_attributes = car_utils.getVectoreStoreAttributes()
+        if category is None:
+            file_name = vector_store_attributes["file_name"]
+        else:
+            file_name = vector_store_attributes["category_file_names"][category]
+        return os.path.join(vector_store_attributes["dir_name"], file_name)
+
+    def _load_vector_store(self, category=None):
+        persist_path = self._store_path(category)
+        if category is not None and not os.path.isdir(persist_path):
+            # stores built before per-category indexes existed only have the shared index
+            return None
+        if has_chunk_store(persist_path):
+            # memory-mapped chunks: no unpickling, documents are built only for search hits
+            return MappedVectorStore(persist_path, self.getEmbeddingsModel(), car_utils.getIndexSearchParams())
+        return FAISS.load_local(persist_path, self.getEmbeddingsModel(), allow_dangerous_deserialization=True)
+
+    def getEmbeddingsModel(self):
+        return self._get_or_load("embeddings_model", self._load_embeddings_model)
+
+    def getSparseIndex(self, category=None):
+        """BM25 index of the shared store or of a category sub-index (None when it was never built)"""
+        return self._get_or_load(("sparse_index", category), lambda: load_sparse_index(self._store_path(category)))
+
+    def getRagaTable(self):
+        """Raga lookup table built at ingest (None when it was never built or is disabled)"""
+        def load():
+            table_attributes = car_utils.getRagaTableAttributes()
+            return load_raga_table(table_attributes["path"], fuzzy_cutoff=table_attributes["fuzzy_cutoff"],
+                                   max_matches=table_attributes["max_matches"])
+        return self._get_or_load("raga_table", load)
+
+    def getReRankingModel(self):
+        return self._get_or_load("re_ranking_model", self._load_re_ranking_model)
+
+    def getHTTPClients(self):
+        return self._get_or_load("http_clients", self._load_http_clients)
+
+    def getLLM(self):
+        return self._get_or_load("llm_model", self._load_llm)
+
+    def getAsyncLLM(self):
+        """LLM client for async calls on the running event loop, with a pooled httpx.AsyncClient of its own"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_llms:
+                self._async_llms[loop] = self._load_llm(httpx.AsyncClient(**self._http_client_settings()))
+            return self._async_llms[loop]
+
+    async def closeAsyncLLM(self):
+        """Close the running event loop's async LLM client; call it before the loop is closed"""
+        with self._lock:
+            llm_model = self._async_llms.pop(asyncio.get_running_loop(), None)
+        if llm_model is not None and llm_model.http_async_client is not None:
+            await llm_model.http_async_client.aclose()
+
+    def getVectorStore(self, category=None):
+        """Shared vector store, or the category's sub-index (None when it was never built)"""
+        return self._get_or_load(("vector_store", category), lambda: self._load_vector_store(category))
+
+    def warmup(self):
+        """Load every resource up front so the first question does not pay the start-up cost"""
+        self.getEmbeddingsModel()
+        self.getReRankingModel()
+        self.getVectorStore()
+        for category in car_utils.getVectoreStoreAttributes()["meta_data"]:
+            self.getVectorStore(category)
+            if car_utils.getHybridSearchAttributes()["enabled"]:
+                self.getSparseIndex(category)
+        self.getRagaTable()
+        self.getLLM()
+
+    def clear(self):
+        with self._lock:
+            self._resources = {}
+            self._async_llms = weakref.WeakKeyDictionary()
+
+registry = ResourceRegistry()
 
 @staticmethod
 class Models:
@@ -25,14 +191,9 @@ class Models:
 
 
     def setEmbeddingsModel(self):
-        self.embeddings_model = HuggingFaceEmbeddings(
-            model_name=self.embeddings_model_name
-        )
+        self.embeddings_model = registry.getEmbeddingsModel()
     def setLLM(self):
-        self.llm_model =  ChatGroq(
-            model=self.llm_model_name,
-            api_key=self.api_key
-       )
+        self.llm_model = registry.getLLM()
 
     def getEmbeddingsModel(self):
         return self.embeddings_model
@@ -42,23 +203,29 @@ class Models:
     def getLLM(self):
         return self.llm_model
 
-# Test
-# obj = Models()
-# def getLLM():
-#     return obj.getLLM()
+def getEmbeddingsModel():
+    return registry.getEmbeddingsModel()
+
+def getReRankingModel():
+    return registry.getReRankingModel()
+
+def getLLM():
+    return registry.getLLM()
+
+def getAsyncLLM():
+    return registry.getAsyncLLM()
 
-# def getEmbeddingsModel():
-#     return obj.getEmbeddingsModel()
+async def closeAsyncLLM():
+    await registry.closeAsyncLLM()
 
-# def getVectoreStorePath():
-#     return obj.getVectoreStorePath()
+def getVectorStore(category=None):
+    return registry.getVectorStore(category)
 
-# def getReRankingModel():
-#     re_ranking_model = CrossEncoder(obj.getReRankingModelName())
-#     return re_ranking_model
+def getSparseIndex(category=None):
+    return registry.getSparseIndex(category)
 
+def getRagaTable():
+    return registry.getRagaTable()
 
-#print(obj.getEmbeddingsModel())
-# llm_model = obj.getLLM()
-# response_str = llm_model.invoke("What is the capital of france")
-# print(response_str.content)
\ No newline at end of file
+def warmup():
+    registry.warmup()
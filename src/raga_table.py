@@ -0,0 +1,366 @@
+"""
+Exact-match raga lookup table built from the Raga PDFs (Raga Pravagam, an index to Carnatic ragas).
+At ingest vector_store_generator.py parses the alphabetical index (raga name -> melakarta numbers),
+the 72 melakarta sections (their janya ragas with arohanam, avarohanam and alternative names) and
+the appendix list into one record per raga, stored under src/data as raga_table.json:
+    {"files": {"Raga/....pdf": file hash}, "sources": ["Raga/....pdf"],
+     "ragas": [{"name", "aliases", "mela", "melakarta", "arohanam", "avarohanam", "source", "page"}, ...],
+     "keys": {"normalized name": row, ...}, "melas": {"15": row, ...}}
+where "mela" is set on the 72 melakarta ragas, "melakarta" lists the parent melas of a janya raga and
+"source" is a position in "sources".
+
+Names are normalized so common transliteration variants (Shankarabharanam / Sankarabaranam,
+Mayamalavagowla / Maya Malava Gaula, Thodi / Todi) share one key. raga_index_tool answers from
+the table with a dictionary lookup, or a close fuzzy match, when the named ragas are the whole
+subject of the question; when the question asks about more than that (e.g. "Difference between
+sampurna and vakra ragas" also matches a raga called Sampurna) the table rows are added to the
+vector search results instead.
+"""
+
+import difflib
+import json
+import os
+import re
+from typing import List
+
+RAGA_TABLE_VERSION = 1
+
+# spelling variants of the same sound, applied in order to a lower-case name without spaces
+TRANSLITERATIONS = [
+    (r"([bcdgjkpt])h", r"\1"),  # aspirates: bh, dh, th, kh ... -> b, d, t, k
+    (r"sh", "s"),
+    (r"zh", "l"),
+    (r"ee", "i"),
+    (r"oo", "u"),
+    (r"[ao]w", "au"),
+    (r"ou", "au"),
+    (r"w", "v"),
+    (r"(.)\1+", r"\1"),         # doubled letters: aa, kk, ll ...
+    (r"am$", "a"),              # Mohanam / Mohana
+]
+
+# words of a question that are never part of a raga name
+QUESTION_WORDS = {
+    "a", "about", "alias", "aliases", "an", "and", "any", "are", "arohana", "arohanam", "avarohana",
+    "avarohanam", "belong", "belongs", "carnatic", "called", "characteristics", "derived", "describe",
+    "details", "do", "does", "explain", "for", "from", "give", "how", "in", "info", "information", "is",
+    "it", "its", "janya", "janyas", "known", "list", "me", "mela", "melakarta", "melakartha", "music",
+    "name", "names", "number", "of", "other", "parent", "rag", "raga", "ragam", "ragas", "scale", "show",
+    "swara", "swaras", "tell", "the", "to", "what", "which", "who", "with",
+}
+
+# "mela 15", "melakarta number 15", "15th mela"
+MELA_NUMBER = re.compile(r"\bmela(?:kart?h?a)?\s*(?:number|no\.?)?\s*#?\s*(\d{1,2})\b|\b(\d{1,2})(?:st|nd|rd|th)?\s+mela", re.IGNORECASE)
+
+# swarasthanas of the 72 melakartas: six (R, G) pairs per half, six (D, N) pairs per chakra
+RG_PAIRS = [("R1", "G1"), ("R1", "G2"), ("R1", "G3"), ("R2", "G2"), ("R2", "G3"), ("R3", "G3")]
+DN_PAIRS = [("D1", "N1"), ("D1", "N2"), ("D1", "N3"), ("D2", "N2"), ("D2", "N3"), ("D3", "N3")]
+
+# "5. BANA CHAKRA - BHU\n29. DHEERA SANKARABHARANAM": chakra, position in it, melakarta number and name
+MELA_HEADER = re.compile(r"-\s*\(?(?:PA|SRI|GO|BHU|MA|SHA)\)?\s*\n\s*(\d{1,2})\s*\.\s*([A-Za-z][A-Za-z ]*[A-Za-z])")
+JANYA_ENTRY = re.compile(r"^(\d{1,3})\s*\.?\s+([A-Za-z(][A-Za-z.'() ]*?[a-z)])\s+([SRGMPDN](?:\s*[SRGMPDN])+)\b")
+INDEX_ENTRY = re.compile(r"(?<!\d)\d{1,4}\s*\.\s+([A-Z][A-Za-z'.\- ]*?[a-z])\s+(\d{1,2}(?:\s*,\s*\d{1,2})*)(?![\d.])")
+APPENDIX_ENTRY = re.compile(r"([A-Z][a-z][A-Za-z]*(?: [A-Z][a-z][A-Za-z]*)*) (\d{1,2})(?![\d.])")
+ALIAS = re.compile(r"\(([^)]+)\)")
+
+def normalize_name(name: str) -> str:
+    """Lookup key of a raga name: lower case letters only, with transliteration variants folded"""
+    key = re.sub(r"[^a-z]", "", name.lower())
+    for pattern, replacement in TRANSLITERATIONS:
+        key = re.sub(pattern, replacement, key)
+    return key
+
+def display_name(name: str) -> str:
+    """Title-case a name printed in capitals, e.g. "MAYA MALAVA GAULA" -> "Maya Malava Gaula" """
+    name = " ".join(name.split())
+    return name.title() if name.isupper() else name
+
+def mela_swaras(number: int) -> str:
+    """Arohanam of a melakarta with its swarasthanas, e.g. 15 -> "S R1 G3 M1 P D1 N3 S" """
+    position = (number - 1) % 36
+    rishabham, gandharam = RG_PAIRS[position // 6]
+    dhaivatam, nishadam = DN_PAIRS[position % 6]
+    madhyamam = "M1" if number <= 36 else "M2"
+    return " ".join(["S", rishabham, gandharam, madhyamam, "P", dhaivatam, nishadam, "S"])
+
+def split_scale(swaras: List[str]):
+    """
+    (arohanam, avarohanam) from the swara letters of a table row such as "S R G M P S S P M G R S AE".
+    The arohanam ends at the upper S that is immediately followed by the S starting the avarohanam;
+    the avarohanam ends at its next S (source codes like "S", "P" or "R" may follow it).
+    """
+    for turn in range(3, len(swaras) - 1):
+        if swaras[turn] == "S" and swaras[turn + 1] == "S":
+            break
+    else:
+        return None
+    arohanam, rest = swaras[:turn + 1], swaras[turn + 1:]
+    for end in range(3, len(rest)):
+        if rest[end] == "S":
+            return " ".join(arohanam), " ".join(rest[:end + 1])
+    return None
+
+class RagaTableBuilder:
+    """Merges the rows parsed from the Raga PDF pages into one record per normalized name"""
+
+    def __init__(self):
+        self.records = []
+        self.keys = {}
+        self.melas = {}
+        self.sources = []
+
+    def record(self, name: str, source: str, page: int) -> int:
+        """Row of the record for a raga name, created on first sight"""
+        key = normalize_name(name)
+        if key not in self.keys:
+            self.keys[key] = len(self.records)
+            self.records.append({"name": display_name(name), "aliases": [], "mela": None, "melakarta": [],
+                                 "arohanam": None, "avarohanam": None, "source": source, "page": page})
+        return self.keys[key]
+
+    def add_alias(self, row: int, alias: str):
+        record = self.records[row]
+        alias = display_name(alias)
+        key = normalize_name(alias)
+        if len(key) < 3:
+            return
+        if alias != record["name"] and alias not in record["aliases"]:
+            record["aliases"].append(alias)
+        # an alias that is already a raga of its own keeps pointing to that raga
+        self.keys.setdefault(key, row)
+
+    def add_melakarta(self, row: int, numbers):
+        record = self.records[row]
+        for number in numbers:
+            if 1 <= number <= 72 and number not in record["melakarta"]:
+                record["melakarta"].append(number)
+
+    def add_index_page(self, text: str, source: str, page: int):
+        for match in INDEX_ENTRY.finditer(text):
+            numbers = [int(number) for number in re.split(r"\s*,\s*", match.group(2))]
+            self.add_melakarta(self.record(match.group(1), source, page), numbers)
+
+    def add_appendix_page(self, text: str, source: str, page: int):
+        for match in APPENDIX_ENTRY.finditer(text):
+            self.add_melakarta(self.record(match.group(1), source, page), [int(match.group(2))])
+
+    def add_mela(self, number: int, name: str, source: str, page: int):
+        row = self.record(name, source, page)
+        self.add_alias(row, name.replace(" ", ""))
+        self.add_melakarta(row, [number])
+        record = self.records[row]
+        record["mela"] = number
+        record["arohanam"] = mela_swaras(number)
+        record["avarohanam"] = " ".join(reversed(record["arohanam"].split()))
+        record["page"] = page
+        self.melas[number] = row
+
+    def add_mela_page(self, text: str, mela: int, source: str, page: int):
+        """Janya rows of a melakarta section page; only the first version of each scale is kept"""
+        last_row = None
+        for line in text.splitlines():
+            line = line.strip()
+            alias_line = re.fullmatch(r"\(([^)]+)\)", line)
+            if alias_line and last_row is not None:
+                self.add_alias(last_row, alias_line.group(1))
+                continue
+            match = JANYA_ENTRY.match(line)
+            if match is None:
+                continue
+            aliases = ALIAS.findall(match.group(2))
+            name = ALIAS.sub(" ", match.group(2)).strip()
+            if not name or mela is None:
+                continue
+            last_row = self.record(name, source, page)
+            for alias in aliases:
+                self.add_alias(last_row, alias)
+            self.add_melakarta(last_row, [mela])
+            record = self.records[last_row]
+            scale = split_scale(re.findall(r"[SRGMPDN]", match.group(3)))
+            if scale is not None and record["arohanam"] is None:
+                record["arohanam"], record["avarohanam"] = scale
+                record["page"] = page
+
+    def add_pages(self, page_texts: List[str], source_file: str):
+        """
+        Parse the pages of one Raga Pravagam PDF. The book runs: alphabetical index, melakarta
+        sections (each opening with a "... CHAKRA - XX  n. NAME" header), Hindustani equivalents,
+        appendix list; pages are assigned to a part by these headings.
+        """
+        self.sources.append(source_file)
+        source = len(self.sources) - 1
+        part, mela = None, None
+        for page, text in enumerate(page_texts):
+            if "ALPHABETICAL INDEX" in text and "KARNATAKA" in text:
+                part = "index"
+            header = MELA_HEADER.search(text)
+            if header is not None and 1 <= int(header.group(1)) <= 72:
+                if part == "melas":
+                    # the previous section may end on the page where the next one starts
+                    self.add_mela_page(text[:header.start()], mela, source, page)
+                part, mela = "melas", int(header.group(1))
+                self.add_mela(mela, header.group(2), source, page)
+                text = text[header.end():]
+            elif "HINDUSTHANI RAGAS" in text:
+                part = None
+            elif "ALPHABETICAL LIST" in text:
+                part = "appendix"
+
+            if part == "index":
+                self.add_index_page(text, source, page)
+            elif part == "melas":
+                self.add_mela_page(text, mela, source, page)
+            elif part == "appendix":
+                self.add_appendix_page(text, source, page)
+
+    def to_dict(self, files: dict = None) -> dict:
+        return {"version": RAGA_TABLE_VERSION, "files": files or {}, "sources": self.sources, "ragas": self.records,
+                "keys": self.keys, "melas": {str(number): row for number, row in sorted(self.melas.items())}}
+
+class RagaTable:
+    """
+    Raga records with an index from normalized names and melakarta numbers.
+
+    Usage:
+        table = RagaTable.load(path)
+        matches = table.lookup("What is the arohanam of Shankarabharanam?")   # [(record, matched text), ...]
+        matches, is_subject = table.lookup_question("Difference between sampurna and vakra ragas")
+        text = table.format(matches)
+    """
+
+    def __init__(self, ragas: List[dict], keys: dict, melas: dict, sources: List[str],
+                 fuzzy_cutoff: float = 0.9, max_matches: int = 3):
+        self.ragas = ragas
+        self.sources = sources
+        self.keys = keys
+        self.melas = {int(number): row for number, row in melas.items()}
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.max_matches = max_matches
+        # fuzzy candidates are only compared with keys sharing their first letter
+        self.keys_by_initial = {}
+        for key in keys:
+            self.keys_by_initial.setdefault(key[:1], []).append(key)
+
+    @classmethod
+    def load(cls, path: str, **kwargs):
+        with open(path, "r", encoding="utf-8") as table_file:
+            stored = json.load(table_file)
+        return cls(stored["ragas"], stored["keys"], stored["melas"], stored["sources"], **kwargs)
+
+    def __len__(self):
+        return len(self.ragas)
+
+    def find(self, name: str):
+        """Row of a raga name: exact normalized match first, then the closest key above the cutoff"""
+        key = normalize_name(name)
+        if key in self.keys:
+            return self.keys[key]
+        if len(key) < 5:
+            return None
+        close = difflib.get_close_matches(key, self.keys_by_initial.get(key[:1], []), n=1, cutoff=self.fuzzy_cutoff)
+        return self.keys[close[0]] if close else None
+
+    def lookup(self, question: str) -> List:
+        """(record, matched text) for the ragas and melakarta numbers named in a question, best first"""
+        return self.lookup_question(question)[0]
+
+    def lookup_question(self, question: str):
+        """
+        (matches, is_subject) for a question: the lookup matches, and whether they cover every word of the
+        question that is not a question word, i.e. the named ragas are all the question asks about
+        """
+        matches = []
+        rows = set()
+
+        def add(row, matched):
+            if row is not None and row not in rows and len(matches) < self.max_matches:
+                rows.add(row)
+                matches.append((self.ragas[row], matched))
+
+        for number_match in MELA_NUMBER.finditer(question):
+            number = number_match.group(1) or number_match.group(2)
+            add(self.melas.get(int(number)), number)
+        # the words of a melakarta number reference are part of the match
+        question_words = MELA_NUMBER.sub(" ", question)
+
+        # runs of words that are not question words, tried as candidate names longest first
+        runs, run = [], []
+        for word in re.findall(r"[A-Za-z]+", question_words):
+            if word.lower() in QUESTION_WORDS:
+                if run:
+                    runs.append(run)
+                run = []
+            else:
+                run.append(word)
+        if run:
+            runs.append(run)
+        matched_words = [[False] * len(run) for run in runs]
+        for exact in (True, False):
+            for run, run_matched in zip(runs, matched_words):
+                start = 0
+                while start < len(run):
+                    for length in range(min(4, len(run) - start), 0, -1):
+                        if any(run_matched[start:start + length]):
+                            continue
+                        phrase = " ".join(run[start:start + length])
+                        row = self.keys.get(normalize_name(phrase)) if exact else self.find(phrase)
+                        if row is not None:
+                            add(row, phrase)
+                            run_matched[start:start + length] = [True] * length
+                            start += length
+                            break
+                    else:
+                        start += 1
+        covered = all(all(run_matched) for run_matched in matched_words)
+        return matches, bool(matches) and covered
+
+    def mela_label(self, number: int) -> str:
+        row = self.melas.get(number)
+        return f"{number} {self.ragas[row]['name']}" if row is not None else str(number)
+
+    def format(self, matches: List) -> str:
+        entries = []
+        for record, matched in matches:
+            lines = [f"Raga: {record['name']}"]
+            if record["aliases"]:
+                lines.append(f"Also known as: {', '.join(record['aliases'])}")
+            if record["mela"]:
+                lines.append(f"Melakarta raga number {record['mela']} ({mela_swaras(record['mela'])})")
+            elif record["melakarta"]:
+                lines.append(f"Janya of melakarta: {', '.join(self.mela_label(number) for number in record['melakarta'])}")
+            if record["arohanam"]:
+                lines.append(f"Arohanam: {record['arohanam']}")
+                lines.append(f"Avarohanam: {record['avarohanam']}")
+            lines.append(f"Source: {os.path.basename(self.sources[record['source']])}, page {record['page'] + 1}")
+            entries.append("\n".join(lines))
+        return "\n\n".join(entries)
+
+def build_raga_table(pdf_pages, table_path: str, files: dict = None) -> int:
+    """
+    Write raga_table.json from (source file, page texts) pairs of the Raga PDFs.
+    files maps each source file to its hash so later builds can tell whether the table is current.
+    Returns the number of raga records.
+    """
+    builder = RagaTableBuilder()
+    for source_file, page_texts in pdf_pages:
+        builder.add_pages(page_texts, source_file)
+    tmp_path = f"{table_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as table_file:
+        json.dump(builder.to_dict(files), table_file, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, table_path)
+    return len(builder.records)
+
+def raga_table_files(table_path: str) -> dict:
+    """Source file hashes the stored table was built from ({} when there is no usable table)"""
+    try:
+        with open(table_path, "r", encoding="utf-8") as table_file:
+            stored = json.load(table_file)
+    except (OSError, ValueError):
+        return {}
+    return stored.get("files", {}) if stored.get("version") == RAGA_TABLE_VERSION else {}
+
+def load_raga_table(table_path: str, **kwargs):
+    """The raga table, or None when it has not been built"""
+    if not table_path or not os.path.exists(table_path):
+        return None
+    return RagaTable.load(table_path, **kwargs)
@@ -3,7 +3,7 @@ Demo script for the React Agent system
 Shows how the agent critiques and refines LLM responses
 """
 from semantic_layer import ReactAgent
-from models import Models
+import models
 
 def demo_react_agent():
     """Demonstrate the React Agent workflow"""
@@ -12,8 +12,7 @@ def demo_react_agent():
     print("=" * 60)
     
     # Initialize models
-    llm_model_obj = Models()
-    llm_model = llm_model_obj.getLLM()
+    llm_model = models.getLLM()
     
     # Initialize React Agent
     react_agent = ReactAgent(llm_model)
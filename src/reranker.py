@@ -0,0 +1,220 @@
+"""
+Cross-encoder re-ranking shared by the retrieval tools.
+The scheduler collects candidates from every selected tool, scores each unique
+(query, chunk) pair once in a single batched predict call and hands the ranked
+results back per tool. Scores are also kept in a bounded LRU cache so popular
+questions are not re-scored.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List
+
+import models
+import utils as car_utils
+from tracing import span
+
+def chunk_id(doc) -> str:
+    """Stable id for a chunk based on its source and text, identical across tools and index loads"""
+    md = doc.metadata or {}
+    src = md.get("source_file", md.get("source", ""))
+    return hashlib.sha1(f"{src}\n{doc.page_content}".encode("utf-8")).hexdigest()
+
+def normalize_query(query: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation so trivially different questions match"""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+def query_hash(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+
+class RerankScoreCache:
+    """
+    Bounded LRU cache of CrossEncoder scores keyed by (normalized query hash, chunk id).
+    When persist_path is set the cache is loaded from and saved to a JSON file.
+    """
+
+    def __init__(self, max_entries: int = 50000, persist_path: str = None, save_every: int = 256):
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.save_every = save_every
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def get(self, query_key: str, doc_id: str):
+        """Cached score or None, counting hits and misses"""
+        key = f"{query_key}:{doc_id}"
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, query_key: str, doc_id: str, score: float):
+        key = f"{query_key}:{doc_id}"
+        with self._lock:
+            self.entries[key] = score
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.persist_path and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def load(self):
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as cache_file:
+                stored = json.load(cache_file)
+            with self._lock:
+                # the file is written oldest first, so the LRU order survives a restart
+                for key, score in list(stored.items())[-self.max_entries:]:
+                    self.entries[key] = score
+        except Exception as e:
+            print(f"Warning: Could not load re-ranking cache from {self.persist_path}: {e}")
+
+    def save(self):
+        if not self.persist_path:
+            return
+        with self._lock:
+            snapshot = dict(self.entries)
+            self._unsaved = 0
+        try:
+            tmp_path = f"{self.persist_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as cache_file:
+                json.dump(snapshot, cache_file)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            print(f"Warning: Could not save re-ranking cache to {self.persist_path}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self.entries = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+_score_cache = None
+_score_cache_lock = threading.Lock()
+
+def getScoreCache() -> RerankScoreCache:
+    """Process-wide score cache configured from Utils, created on first use"""
+    global _score_cache
+    if _score_cache is None:
+        with _score_cache_lock:
+            if _score_cache is None:
+                cache_attributes = car_utils.getRerankCacheAttributes()
+                _score_cache = RerankScoreCache(cache_attributes["max_entries"], cache_attributes["persist_path"])
+                atexit.register(_score_cache.save)
+    return _score_cache
+
+class RerankScheduler:
+    """
+    Batches re-ranking for one question.
+
+    Usage:
+        scheduler = RerankScheduler()
+        scheduler.submit("knowledge_tool", query, docs, top_k=6)
+        scheduler.submit("raga_index_tool", query, other_docs, top_k=6)
+        ranked = scheduler.run()   # {"knowledge_tool": [...], "raga_index_tool": [...]}
+    """
+
+    def __init__(self, re_ranking_model=None, score_cache: RerankScoreCache = None):
+        self.re_ranking_model = re_ranking_model
+        self.score_cache = score_cache or getScoreCache()
+        self.requests = []
+        self.scores = {}
+        self.predict_calls = 0
+        self.pairs_scored = 0
+        # exception of a failed predict call; later calls in this request re-raise it instead of predicting again
+        self.error = None
+
+    def submit(self, key, query: str, docs: List, top_k: int):
+        """Queue the candidates of one tool (or one category of a tool) for re-ranking"""
+        self.requests.append((key, query, docs, top_k))
+
+    def score(self, pairs: List):
+        """Score the (query, doc) pairs that have not been scored yet in one batched predict call"""
+        pending = {}
+        for query, doc in pairs:
+            pair_key = (query_hash(query), chunk_id(doc))
+            if pair_key in self.scores or pair_key in pending:
+                continue
+            cached_score = self.score_cache.get(*pair_key)
+            if cached_score is not None:
+                self.scores[pair_key] = cached_score
+            else:
+                pending[pair_key] = [query, doc.page_content]
+        if not pending:
+            return
+        if self.error is not None:
+            raise self.error
+
+        re_ranking_model = self.re_ranking_model or models.getReRankingModel()
+        try:
+            with span("rerank", pairs=len(pending), candidate_pairs=len(pairs)):
+                pair_scores = re_ranking_model.predict(list(pending.values()))
+        except Exception as e:
+            self.error = e
+            raise
+        self.predict_calls += 1
+        self.pairs_scored += len(pending)
+        for pair_key, pair_score in zip(pending.keys(), pair_scores):
+            self.scores[pair_key] = float(pair_score)
+            self.score_cache.put(*pair_key, float(pair_score))
+
+    def score_of(self, query: str, doc):
+        """Score computed for the pair in this request, or None if it was not scored"""
+        return self.scores.get((query_hash(query), chunk_id(doc)))
+
+    def rank(self, query: str, docs: List, top_k: int) -> List:
+        """Re-rank docs for the query, reusing scores computed earlier in this request"""
+        if not docs:
+            return []
+
+        try:
+            self.score([(query, doc) for doc in docs])
+
+            # Sort by score in descending order (higher score = more relevant)
+            query_key = query_hash(query)
+            scored_docs = [(self.scores[(query_key, chunk_id(doc))], doc) for doc in docs]
+            scored_docs.sort(key=lambda x: x[0], reverse=True)
+            return [doc for score, doc in scored_docs[:top_k]]
+
+        except Exception as e:
+            print(f"Warning: Re-ranking failed, returning original documents: {e}")
+            return docs[:top_k]
+
+    def run(self) -> dict:
+        """Score every submitted candidate in one batch and return the ranked docs per key"""
+        try:
+            self.score([(query, doc) for key, query, docs, top_k in self.requests for doc in docs])
+        except Exception as e:
+            # every key keeps its retrieval order; the failed batch is not retried key by key
+            print(f"Warning: Batched re-ranking failed, returning original documents: {e}")
+            ranked = {key: docs[:top_k] for key, query, docs, top_k in self.requests}
+        else:
+            ranked = {key: self.rank(query, docs, top_k) for key, query, docs, top_k in self.requests}
+        self.requests = []
+        return ranked
@@ -3,7 +3,60 @@
 from langchain.prompts import PromptTemplate, ChatPromptTemplate
 from langchain.schema import SystemMessage
 from langchain.memory import ConversationBufferMemory
+import asyncio
+import json
+import os
+import re
+import threading
 import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import models
+import utils as car_utils
+from context_packer import ContextPacker
+from tracing import span, record_llm_usage
+
+REACT_MODES = ("critique_refine", "self_check")
+
+def stream_llm(llm_model, prompt: str, span_name: str):
+    """
+    Stream an LLM response, yielding text chunks as they arrive and returning the full text.
+    The call is recorded as a trace span with time-to-first-token and token usage.
+    """
+    with span(span_name) as llm_span:
+        start = time.perf_counter()
+        aggregated = None
+        for chunk in llm_model.stream(prompt):
+            if aggregated is None:
+                llm_span.set(first_token_ms=round((time.perf_counter() - start) * 1000, 3))
+                aggregated = chunk
+            else:
+                aggregated = aggregated + chunk
+            if chunk.content:
+                yield chunk.content
+        if aggregated is not None:
+            record_llm_usage(llm_span, aggregated, prompt)
+    return aggregated.content if aggregated is not None else ""
+
+_llm_semaphores = weakref.WeakKeyDictionary()
+_llm_semaphores_lock = threading.Lock()
+
+def getLLMSemaphore() -> asyncio.Semaphore:
+    """Semaphore limiting concurrent async LLM calls on the running event loop (Utils.llm_max_concurrency)"""
+    loop = asyncio.get_running_loop()
+    with _llm_semaphores_lock:
+        if loop not in _llm_semaphores:
+            _llm_semaphores[loop] = asyncio.Semaphore(car_utils.getLLMConnectionAttributes()["max_concurrency"])
+        return _llm_semaphores[loop]
+
+async def ainvoke_llm(llm_model, prompt: str, span_name: str):
+    """Await an LLM response within the concurrency limit, recorded as a trace span"""
+    async with getLLMSemaphore():
+        with span(span_name) as llm_span:
+            response = await llm_model.ainvoke(prompt)
+            record_llm_usage(llm_span, response, prompt)
+    return response
 
 class Prompt:
     def __init__(self, user_question):
@@ -55,13 +108,30 @@ Current question: {user_query}"""
         final_prompt = prompt_str.format(user_query=self.user_query)
         return final_prompt
 
+def parse_critique_score(critique: str):
+    """The number after SCORE: in a critique (e.g. "SCORE: 8/10" or "**SCORE:** [7]"), or None if there is none"""
+    match = re.search(r"SCORE\W*?(\d+(?:\.\d+)?)", critique or "", re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
 class ReactAgent:
-    """React Agent that critiques and refines LLM outputs for better quality"""
+    """
+    React Agent that critiques and refines LLM outputs for better quality.
+    In "critique_refine" mode the initial response is returned unchanged when the critique scores it at or
+    above skip_threshold; in "self_check" mode one call reviews the response and rewrites it only if needed.
+    """
     
-    def __init__(self, llm_model):
+    def __init__(self, llm_model, mode: str = None, skip_threshold: float = None):
+        react_attributes = car_utils.getReactAgentAttributes()
         self.llm_model = llm_model
+        self.mode = mode or react_attributes["mode"]
+        if self.mode not in REACT_MODES:
+            raise ValueError(f"Unknown React Agent mode {self.mode!r}, expected one of {REACT_MODES}")
+        self.skip_threshold = react_attributes["skip_threshold"] if skip_threshold is None else skip_threshold
         self.critic_prompt = self._create_critic_prompt()
         self.refiner_prompt = self._create_refiner_prompt()
+        self.self_check_prompt = self._create_self_check_prompt()
+        # retrieved information is packed once per answer and reused by every stage
+        self.context_packer = ContextPacker()
     
     def _create_critic_prompt(self):
         """Create the prompt for the critic LLM"""
@@ -102,9 +172,20 @@ REFINEMENT GUIDELINES:
 
 Create a refined response that is significantly better than the original while maintaining the core information and addressing all feedback points."""
 
-    def critique_response(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
-        """Critique the initial LLM response"""
-        critique_prompt = f"""{self.critic_prompt}
+    def _create_self_check_prompt(self):
+        """Create the prompt for the single-pass self-check"""
+        return """You are an expert reviewer of answers about Carnatic music. Check the response below against the retrieved information for accuracy, completeness, relevance and clarity.
+
+If the response is accurate and complete, reply with exactly:
+VERDICT: PASS
+
+Otherwise reply with:
+VERDICT: REVISED
+followed on the next lines by the corrected, improved response only (no commentary)."""
+
+    def _create_critique_request(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
+        """Build the critique request for the initial response"""
+        return f"""{self.critic_prompt}
 
 USER QUESTION: {user_question}
 
@@ -112,22 +193,28 @@ CONVERSATION CONTEXT:
 {conversation_context}
 
 RETRIEVED INFORMATION:
-{chr(10).join(tool_results)}
+{self.context_packer.pack(tool_results)}
 
 INITIAL RESPONSE TO EVALUATE:
 {initial_response}
 
 Please provide your critical evaluation of this response."""
 
+    def critique_response(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
+        """Critique the initial LLM response"""
+        critique_prompt = self._create_critique_request(user_question, initial_response, tool_results, conversation_context)
+
         try:
-            critique = self.llm_model.invoke(critique_prompt)
+            with span("llm:critique") as llm_span:
+                critique = self.llm_model.invoke(critique_prompt)
+                record_llm_usage(llm_span, critique, critique_prompt)
             return critique.content
         except Exception as e:
             return f"Critique failed: {e}"
 
-    def refine_response(self, user_question: str, initial_response: str, critique: str, tool_results: list, conversation_context: str):
-        """Refine the response based on the critique"""
-        refinement_prompt = f"""{self.refiner_prompt}
+    def _create_refinement_prompt(self, user_question: str, initial_response: str, critique: str, tool_results: list, conversation_context: str):
+        """Build the refinement request from the original response and the critique"""
+        return f"""{self.refiner_prompt}
 
 USER QUESTION: {user_question}
 
@@ -135,7 +222,7 @@ CONVERSATION CONTEXT:
 {conversation_context}
 
 RETRIEVED INFORMATION:
-{chr(10).join(tool_results)}
+{self.context_packer.pack(tool_results)}
 
 ORIGINAL RESPONSE:
 {initial_response}
@@ -145,63 +232,351 @@ CRITIC'S FEEDBACK:
 
 Please create a refined, improved response based on the feedback."""
 
+    def refine_response(self, user_question: str, initial_response: str, critique: str, tool_results: list, conversation_context: str):
+        """Refine the response based on the critique"""
+        refinement_prompt = self._create_refinement_prompt(user_question, initial_response, critique, tool_results, conversation_context)
+
         try:
-            refined_response = self.llm_model.invoke(refinement_prompt)
+            with span("llm:refine") as llm_span:
+                refined_response = self.llm_model.invoke(refinement_prompt)
+                record_llm_usage(llm_span, refined_response, refinement_prompt)
             return refined_response.content
         except Exception as e:
             return f"Refinement failed: {e}. Using original response: {initial_response}"
 
+    def stream_refine_response(self, user_question: str, initial_response: str, critique: str, tool_results: list, conversation_context: str):
+        """Refine the response based on the critique, yielding the refined text as it is generated"""
+        refinement_prompt = self._create_refinement_prompt(user_question, initial_response, critique, tool_results, conversation_context)
+
+        streamed = []
+        try:
+            for token in stream_llm(self.llm_model, refinement_prompt, "llm:refine"):
+                streamed.append(token)
+                yield token
+            return "".join(streamed)
+        except Exception as e:
+            fallback = f"Refinement failed: {e}. Using original response: {initial_response}"
+            # text already streamed stays on screen, so the fallback is appended after it
+            yield fallback if not streamed else f"\n\n{fallback}"
+            return "".join(streamed) + ("\n\n" if streamed else "") + fallback
+
+    def _create_self_check_request(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
+        """Build the single-pass review request for the initial response"""
+        return f"""{self.self_check_prompt}
+
+USER QUESTION: {user_question}
+
+CONVERSATION CONTEXT:
+{conversation_context}
+
+RETRIEVED INFORMATION:
+{self.context_packer.pack(tool_results)}
+
+RESPONSE TO CHECK:
+{initial_response}"""
+
+    def self_check_response(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
+        """Review the response in one call; returns (verdict text, revised response or None if it passed)"""
+        self_check_prompt = self._create_self_check_request(user_question, initial_response, tool_results, conversation_context)
+
+        try:
+            with span("llm:self_check") as llm_span:
+                verdict = self.llm_model.invoke(self_check_prompt)
+                record_llm_usage(llm_span, verdict, self_check_prompt)
+        except Exception as e:
+            return f"Self-check failed: {e}", None
+        return self._parse_self_check(verdict.content)
+
+    def _parse_self_check(self, verdict_text: str):
+        """(verdict text, revised response or None if the response passed)"""
+        verdict_text = verdict_text.strip()
+        match = re.match(r"\W*VERDICT\W*(PASS|REVISED)[ \t*:]*", verdict_text, re.IGNORECASE)
+        if match is None or match.group(1).upper() == "PASS":
+            return verdict_text, None
+        revised_response = verdict_text[match.end():].strip()
+        return verdict_text, revised_response or None
+
+    def _react_result(self, path: str, initial_response: str, critique: str, refined_response: str, score=None):
+        """react_details for one answer; path records which route the agent took"""
+        return {
+            "original_response": initial_response,
+            "critique": critique,
+            "refined_response": refined_response,
+            "improvement_applied": refined_response != initial_response,
+            "mode": self.mode,
+            "path": path,
+            "score": score,
+            "skip_threshold": self.skip_threshold if self.mode == "critique_refine" else None
+        }
+
+    def _skip_refinement(self, critique: str):
+        """(critique score, whether it is high enough to keep the initial response)"""
+        score = parse_critique_score(critique)
+        return score, score is not None and score >= self.skip_threshold
+
+    def stream_with_react(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
+        """React Agent workflow that streams the refined response; returns the same details as process_with_react"""
+        
+        if self.mode == "self_check":
+            result = self._process_self_check(user_question, initial_response, tool_results, conversation_context)
+            yield result["refined_response"]
+            return result
+        
+        # Stage 1: Critique the initial response
+        print("🎭 Stage 1: Critiquing initial response...")
+        critique = self.critique_response(user_question, initial_response, tool_results, conversation_context)
+        score, skip = self._skip_refinement(critique)
+        if skip:
+            print(f"✅ Critique score {score:g} >= {self.skip_threshold:g}, keeping the initial response")
+            yield initial_response
+            return self._react_result("accepted", initial_response, critique, initial_response, score)
+        
+        # Stage 2: Refine based on critique, streaming as soon as refinement starts
+        print("✨ Stage 2: Refining response based on critique...")
+        refined_response = yield from self.stream_refine_response(user_question, initial_response, critique, tool_results, conversation_context)
+        
+        return self._react_result("refined", initial_response, critique, refined_response, score)
+
+    def _process_self_check(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
+        print("🔎 Self-checking initial response...")
+        verdict, revised_response = self.self_check_response(user_question, initial_response, tool_results, conversation_context)
+        if revised_response is None:
+            return self._react_result("self_check_pass", initial_response, verdict, initial_response)
+        return self._react_result("self_check_revised", initial_response, verdict, revised_response)
+
     def process_with_react(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
-        """Complete React Agent workflow: critique -> refine -> return improved response"""
+        """Complete React Agent workflow: critique -> refine (unless the score is high enough) -> return the final response"""
+        
+        if self.mode == "self_check":
+            return self._process_self_check(user_question, initial_response, tool_results, conversation_context)
         
         # Stage 1: Critique the initial response
         print("🎭 Stage 1: Critiquing initial response...")
         critique = self.critique_response(user_question, initial_response, tool_results, conversation_context)
+        score, skip = self._skip_refinement(critique)
+        if skip:
+            print(f"✅ Critique score {score:g} >= {self.skip_threshold:g}, keeping the initial response")
+            return self._react_result("accepted", initial_response, critique, initial_response, score)
         
         # Stage 2: Refine based on critique
         print("✨ Stage 2: Refining response based on critique...")
         refined_response = self.refine_response(user_question, initial_response, critique, tool_results, conversation_context)
         
-        return {
-            "original_response": initial_response,
-            "critique": critique,
-            "refined_response": refined_response,
-            "improvement_applied": True
-        }
+        return self._react_result("refined", initial_response, critique, refined_response, score)
+
+    async def acritique_response(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
+        """Async critique_response"""
+        critique_prompt = self._create_critique_request(user_question, initial_response, tool_results, conversation_context)
+        try:
+            critique = await ainvoke_llm(self.llm_model, critique_prompt, "llm:critique")
+            return critique.content
+        except Exception as e:
+            return f"Critique failed: {e}"
+
+    async def arefine_response(self, user_question: str, initial_response: str, critique: str, tool_results: list, conversation_context: str):
+        """Async refine_response"""
+        refinement_prompt = self._create_refinement_prompt(user_question, initial_response, critique, tool_results, conversation_context)
+        try:
+            refined_response = await ainvoke_llm(self.llm_model, refinement_prompt, "llm:refine")
+            return refined_response.content
+        except Exception as e:
+            return f"Refinement failed: {e}. Using original response: {initial_response}"
+
+    async def aself_check_response(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
+        """Async self_check_response"""
+        self_check_prompt = self._create_self_check_request(user_question, initial_response, tool_results, conversation_context)
+        try:
+            verdict = await ainvoke_llm(self.llm_model, self_check_prompt, "llm:self_check")
+        except Exception as e:
+            return f"Self-check failed: {e}", None
+        return self._parse_self_check(verdict.content)
+
+    async def aprocess_with_react(self, user_question: str, initial_response: str, tool_results: list, conversation_context: str):
+        """Async process_with_react; the event loop serves other sessions while the LLM calls are in flight"""
+        
+        if self.mode == "self_check":
+            verdict, revised_response = await self.aself_check_response(user_question, initial_response, tool_results, conversation_context)
+            if revised_response is None:
+                return self._react_result("self_check_pass", initial_response, verdict, initial_response)
+            return self._react_result("self_check_revised", initial_response, verdict, revised_response)
+        
+        critique = await self.acritique_response(user_question, initial_response, tool_results, conversation_context)
+        score, skip = self._skip_refinement(critique)
+        if skip:
+            return self._react_result("accepted", initial_response, critique, initial_response, score)
+        
+        refined_response = await self.arefine_response(user_question, initial_response, critique, tool_results, conversation_context)
+        return self._react_result("refined", initial_response, critique, refined_response, score)
+
+class ReactDetailsLog:
+    """
+    JSONL log of React Agent details (original response, critique, refined response).
+    Messages keep only a small reference; the full record is read back by offset when it is shown.
+    Offsets live in memory, so the log starts empty in each process; once the file would grow past
+    max_bytes it is rotated to <path>.1, and records of the previous rotation are dropped.
+    """
+
+    def __init__(self, path: str, max_bytes: int = None):
+        self.path = path
+        self.rotated_path = path + ".1"
+        self.max_bytes = max_bytes
+        # log_id -> (file, offset)
+        self.offsets = {}
+        self._lock = threading.Lock()
+        # records of an earlier run can no longer be referenced
+        for stale_path in (self.path, self.rotated_path):
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+
+    def append(self, react_details: dict) -> str:
+        log_id = uuid.uuid4().hex
+        record = json.dumps({"id": log_id, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "react_details": react_details},
+                            ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) + len(record) > self.max_bytes:
+                self.rotate()
+            with open(self.path, "ab") as log_file:
+                log_file.seek(0, os.SEEK_END)
+                self.offsets[log_id] = (self.path, log_file.tell())
+                log_file.write(record)
+        return log_id
+
+    def rotate(self):
+        """Move the log to <path>.1, replacing the previous rotation and forgetting its records"""
+        os.replace(self.path, self.rotated_path)
+        self.offsets = {log_id: (self.rotated_path, offset)
+                        for log_id, (file_path, offset) in self.offsets.items() if file_path == self.path}
+
+    def get(self, log_id: str):
+        """The logged React Agent details, or None if they are not in the log"""
+        with self._lock:
+            location = self.offsets.get(log_id)
+            if location is None:
+                return None
+            file_path, offset = location
+            with open(file_path, "rb") as log_file:
+                log_file.seek(offset)
+                return json.loads(log_file.readline().decode("utf-8"))["react_details"]
+
+_react_logs = {}
+_react_logs_lock = threading.Lock()
+
+def getReactDetailsLog(path: str, max_bytes: int = None) -> ReactDetailsLog:
+    """One ReactDetailsLog per path, shared by every conversation of this process"""
+    with _react_logs_lock:
+        if path not in _react_logs:
+            _react_logs[path] = ReactDetailsLog(path, max_bytes)
+        return _react_logs[path]
+
+def truncate_summary(summary: str, max_chars: int) -> str:
+    """Cut a summary to max_chars, dropping its tail at the last sentence (or word) end that fits"""
+    if len(summary) <= max_chars:
+        return summary
+    cut = summary[:max_chars]
+    sentence_end = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end > max_chars // 2:
+        return cut[:sentence_end + 1]
+    return cut.rsplit(" ", 1)[0] if " " in cut else cut
+
+_summary_executor = None
+_summary_executor_lock = threading.Lock()
+
+def getSummaryExecutor() -> ThreadPoolExecutor:
+    """Single background thread that rolls evicted turns into conversation summaries"""
+    global _summary_executor
+    if _summary_executor is None:
+        with _summary_executor_lock:
+            if _summary_executor is None:
+                _summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="car-memory")
+    return _summary_executor
 
 class ConversationManager:
-    """Manages conversation memory and context for the Carnatic Music Assistant"""
+    """
+    Manages conversation memory and context for the Carnatic Music Assistant.
+    In "bounded" memory mode only the most recent turns are kept verbatim (capped by turns and bytes);
+    older turns are folded into a running summary by a background thread, the chat history shown in
+    the UI is capped, and React Agent details are written to an on-disk log instead of session memory.
+    """
     
-    def __init__(self):
+    def __init__(self, llm_model=None, mode: str = None, max_turns: int = None, max_bytes: int = None):
+        memory_attributes = car_utils.getConversationMemoryAttributes()
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
             return_messages=True
         )
         self.messages = []
+        self.llm_model = llm_model
+        # scopes the semantic answer cache to this conversation
+        self.session_id = uuid.uuid4().hex
+        self.mode = mode or memory_attributes["mode"]
+        self.max_turns = max_turns or memory_attributes["max_turns"]
+        self.max_bytes = max_bytes or memory_attributes["max_bytes"]
+        self.summary_max_chars = memory_attributes["summary_max_chars"]
+        self.max_messages = memory_attributes["max_messages"]
+        react_log_path = memory_attributes["react_log_path"]
+        self.react_log = (getReactDetailsLog(react_log_path, memory_attributes["react_log_max_bytes"])
+                          if self.mode == "bounded" and react_log_path else None)
+        self.summary = ""
+        self.summarized_turns = 0
+        self.pending_summaries = 0
+        # bumped by clear_conversation so summaries still running for the old conversation are dropped
+        self._generation = 0
+        self._lock = threading.RLock()
     
-    def add_message(self, role: str, content: str, tools_used=None, react_details=None):
-        """Add a message to the conversation with optional React Agent details"""
+    def add_message(self, role: str, content: str, tools_used=None, react_details=None, trace=None):
+        """Add a message to the conversation with optional React Agent details and per-stage trace spans"""
         timestamp = time.strftime("%H:%M")
+        if react_details and self.react_log is not None:
+            try:
+                # only a reference stays in session memory; get_react_details reads the full record back
+                log_id = self.react_log.append(react_details)
+                react_details = {"log_id": log_id,
+                                 **{key: react_details.get(key) for key in ("mode", "path", "score", "improvement_applied")}}
+            except Exception as e:
+                print(f"Warning: Could not log React Agent details: {e}")
         message = {
             "role": role,
             "content": content,
             "timestamp": timestamp,
             "tools_used": tools_used,
-            "react_details": react_details  # Store React Agent details
+            "react_details": react_details,  # Store React Agent details (a log reference in bounded mode)
+            "trace": trace
         }
-        self.messages.append(message)
+        with self._lock:
+            self.messages.append(message)
+            if self.mode == "bounded" and len(self.messages) > self.max_messages:
+                del self.messages[:len(self.messages) - self.max_messages]
         return message
     
+    def get_react_details(self, message: dict):
+        """Full React Agent details of a message, loading them from the log when only a reference is stored"""
+        react_details = message.get("react_details")
+        if react_details and "log_id" in react_details and self.react_log is not None:
+            return self.react_log.get(react_details["log_id"])
+        return react_details
+    
+    def has_context(self):
+        """Whether earlier turns (or their summary) would be part of the prompt"""
+        with self._lock:
+            return bool(self.memory.chat_memory.messages or self.summary)
+    
     def get_conversation_context(self, max_messages: int = 4):
-        """Get conversation context for the LLM"""
-        chat_history = self.memory.chat_memory.messages
+        """Get conversation context for the LLM, starting with the summary of older turns if there is one"""
+        with self._lock:
+            chat_history = list(self.memory.chat_memory.messages)
+            summary = self.summary
         
-        if not chat_history:
+        if not chat_history and not summary:
             return "No previous conversation."
         
         # Get the last N messages for context
         recent_messages = chat_history[-max_messages:]
         context_lines = []
+        if summary:
+            context_lines.append(f"Summary of earlier conversation: {summary}")
         
         for msg in recent_messages:
             role = "User" if msg.type == "human" else "Assistant"
@@ -210,8 +585,9 @@ class ConversationManager:
         return chr(10).join(context_lines)
     
     def create_context_aware_prompt(self, base_prompt: str, user_question: str, tool_results: list):
-        """Create a context-aware prompt with conversation history"""
+        """Create a context-aware prompt with conversation history; tool results are packed to the token budget"""
         conversation_context = self.get_conversation_context()
+        retrieved_information = ContextPacker().pack(tool_results)
         
         context_prompt = f"""{base_prompt}
 
@@ -221,28 +597,93 @@ Previous Conversation Context:
 Current Question: {user_question}
 
 Retrieved Information from Knowledge Base:
-{chr(10).join(tool_results)}
+{retrieved_information}
 
 Please provide a comprehensive answer based on the information above. Consider the conversation context to provide more relevant and contextual responses."""
         
         return context_prompt
     
     def save_to_memory(self, user_question: str, ai_response: str):
-        """Save the conversation to LangChain memory"""
-        self.memory.chat_memory.add_user_message(user_question)
-        self.memory.chat_memory.add_ai_message(ai_response)
+        """Save the conversation to LangChain memory, rolling the oldest turns into the summary when over the caps"""
+        with self._lock:
+            self.memory.chat_memory.add_user_message(user_question)
+            self.memory.chat_memory.add_ai_message(ai_response)
+            if self.mode != "bounded":
+                return
+            evicted_turns = self._evict_turns()
+            if not evicted_turns:
+                return
+            self.pending_summaries += 1
+            generation = self._generation
+        getSummaryExecutor().submit(self._summarize, evicted_turns, generation)
+    
+    def _memory_bytes(self):
+        return sum(len(msg.content.encode("utf-8")) for msg in self.memory.chat_memory.messages)
+    
+    def _evict_turns(self):
+        """Remove the oldest (question, answer) turns until the caps hold, always keeping the latest turn"""
+        chat_messages = self.memory.chat_memory.messages
+        evicted_turns = []
+        while len(chat_messages) > 2 and (len(chat_messages) > 2 * self.max_turns or self._memory_bytes() > self.max_bytes):
+            user_message, ai_message = chat_messages[0], chat_messages[1]
+            del chat_messages[:2]
+            evicted_turns.append((user_message.content, ai_message.content))
+        return evicted_turns
+    
+    def _summarize(self, evicted_turns: list, generation: int):
+        """Fold evicted turns into the running summary (runs on the summary thread)"""
+        with self._lock:
+            previous_summary = self.summary
+        try:
+            summary = self._llm_summary(previous_summary, evicted_turns)
+        except Exception as e:
+            print(f"Warning: Could not summarize conversation, keeping an extract instead: {e}")
+            summary = self._extractive_summary(previous_summary, evicted_turns)
+        with self._lock:
+            self.pending_summaries -= 1
+            if generation != self._generation:
+                return
+            self.summary = truncate_summary(summary, self.summary_max_chars)
+            self.summarized_turns += len(evicted_turns)
+    
+    def _llm_summary(self, previous_summary: str, evicted_turns: list):
+        llm_model = self.llm_model or models.getLLM()
+        turns_text = chr(10).join(f"User: {question}{chr(10)}Assistant: {answer}" for question, answer in evicted_turns)
+        summary_prompt = f"""Update the running summary of a conversation about Carnatic music with the turns below.
+Keep the facts, ragas, compositions and preferences that later questions may refer to. Reply with the summary only, in at most {self.summary_max_chars // 6} words.
+
+CURRENT SUMMARY:
+{previous_summary or "None"}
+
+NEW TURNS:
+{turns_text}"""
+        return llm_model.invoke(summary_prompt).content.strip()
+    
+    def _extractive_summary(self, previous_summary: str, evicted_turns: list):
+        lines = [previous_summary] if previous_summary else []
+        for question, answer in evicted_turns:
+            lines.append(f"User asked: {question[:150]} Assistant: {answer[:200]}")
+        return " ".join(lines)
     
     def clear_conversation(self):
         """Clear both conversation memory and chat messages"""
-        self.memory.clear()
-        self.messages = []
+        with self._lock:
+            self.memory.clear()
+            self.messages = []
+            self.summary = ""
+            self.summarized_turns = 0
+            self._generation += 1
     
     def get_memory_stats(self):
         """Get statistics about the conversation memory"""
-        return {
-            "total_messages": len(self.messages),
-            "memory_messages": len(self.memory.chat_memory.messages)
-        }
+        with self._lock:
+            return {
+                "total_messages": len(self.messages),
+                "memory_messages": len(self.memory.chat_memory.messages),
+                "memory_bytes": self._memory_bytes(),
+                "summarized_turns": self.summarized_turns,
+                "pending_summaries": self.pending_summaries
+            }
 # # Example usage
 # user_input = "Explain the difference between supervised and unsupervised learning."
 
@@ -0,0 +1,114 @@
+"""
+BM25 inverted index over the chunks of a vector store, used next to the dense FAISS search so
+exact tokens such as raga names, melakarta numbers and composer names are matched literally.
+
+Written by vector_store_generator.py into each store directory as bm25.json, with rows in the
+same order as the FAISS index (and the chunk store), so a hit row maps straight to its Document:
+    {"k1": 1.5, "b": 0.75, "doc_lengths": [...], "postings": {"term": [row, tf, row, tf, ...]}}
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import List
+
+SPARSE_INDEX_FILE = "bm25.json"
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it", "me",
+    "of", "on", "or", "tell", "that", "the", "this", "to", "was", "what", "which", "who", "with",
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word and number tokens; ordinals like "15th" become "15" so they match melakarta numbers"""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        ordinal = re.fullmatch(r"(\d+)(st|nd|rd|th)", token)
+        if ordinal:
+            token = ordinal.group(1)
+        if token not in STOP_WORDS:
+            tokens.append(token)
+    return tokens
+
+def has_sparse_index(store_dir) -> bool:
+    return os.path.exists(os.path.join(store_dir, SPARSE_INDEX_FILE))
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of texts; rows are the positions of the texts"""
+
+    def __init__(self, postings: dict, doc_lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        n_docs = len(doc_lengths)
+        self.idf = {term: math.log(1 + (n_docs - len(row_tfs) / 2 + 0.5) / (len(row_tfs) / 2 + 0.5))
+                    for term, row_tfs in postings.items()}
+
+    @classmethod
+    def build(cls, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        postings = {}
+        doc_lengths = []
+        for row, text in enumerate(texts):
+            term_counts = Counter(tokenize(text))
+            doc_lengths.append(sum(term_counts.values()))
+            for term, term_frequency in term_counts.items():
+                postings.setdefault(term, []).extend((row, term_frequency))
+        return cls(postings, doc_lengths, k1, b)
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def search(self, query: str, k: int = 10):
+        """(row, score) pairs of the k best matching texts, best first"""
+        scores = {}
+        for term in set(tokenize(query)):
+            row_tfs = self.postings.get(term)
+            if not row_tfs:
+                continue
+            idf = self.idf[term]
+            for position in range(0, len(row_tfs), 2):
+                row, term_frequency = row_tfs[position], row_tfs[position + 1]
+                length_norm = 1 - self.b + self.b * self.doc_lengths[row] / (self.avg_doc_length or 1.0)
+                scores[row] = scores.get(row, 0.0) + idf * term_frequency * (self.k1 + 1) / (term_frequency + self.k1 * length_norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            json.dump({"k1": self.k1, "b": self.b, "doc_lengths": self.doc_lengths, "postings": self.postings},
+                      index_file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as index_file:
+            stored = json.load(index_file)
+        return cls(stored["postings"], stored["doc_lengths"], stored["k1"], stored["b"])
+
+def write_sparse_index(store_dir, vector_store):
+    """Build bm25.json from a LangChain FAISS store's docstore, in FAISS row order"""
+    texts = [vector_store.docstore.search(vector_store.index_to_docstore_id[row]).page_content
+             for row in range(vector_store.index.ntotal)]
+    BM25Index.build(texts).save(os.path.join(store_dir, SPARSE_INDEX_FILE))
+
+def load_sparse_index(store_dir):
+    """The store's BM25 index, or None when it has not been built"""
+    if not has_sparse_index(store_dir):
+        return None
+    return BM25Index.load(os.path.join(store_dir, SPARSE_INDEX_FILE))
+
+def reciprocal_rank_fusion(ranked_lists: List[List], key, rrf_k: int = 60) -> List:
+    """Merge ranked lists by summed 1 / (rrf_k + rank); items are identified by key(item)"""
+    fused_scores = {}
+    items = {}
+    for ranked in ranked_lists:
+        for rank, item in enumerate(ranked, start=1):
+            item_key = key(item)
+            items.setdefault(item_key, item)
+            fused_scores[item_key] = fused_scores.get(item_key, 0.0) + 1.0 / (rrf_k + rank)
+    return [items[item_key] for item_key in sorted(fused_scores, key=fused_scores.get, reverse=True)]
@@ -3,9 +3,13 @@ Streamlit App for Carnatic Music Assistant
 A beautiful chat-style interface for asking questions about Carnatic music
 """
 import streamlit as st
-from tools import knowledge_tool, krithi_tool, raga_index_tool, multi_search
-from semantic_layer import Prompt, ConversationManager, ReactAgent
-from models import Models
+from tools import run_tools, MULTI_SEARCH_CATEGORIES, QueryEmbeddingContext, TOOLS_BY_NAME
+from tool_router import route_tools, getToolRouter
+from answer_cache import getAnswerCache, cache_namespace, is_cacheable
+from tracing import start_trace, span, record_llm_usage, export_trace
+from semantic_layer import Prompt, ConversationManager, ReactAgent, stream_llm
+from reranker import getScoreCache
+import models
 import time
 
 # Page configuration
@@ -163,107 +167,155 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def select_tools(user_question):
-    """Intelligently select which tools to use based on the user's question"""
-    question_lower = user_question.lower()
-    selected_tools = []
-    
-    # Check for knowledge-related queries
-    if any(keyword in question_lower for keyword in ["what is", "explain", "theory", "literature", "raga", "scale", "prayoga"]):
-        selected_tools.append(("knowledge_tool", knowledge_tool))
-    
-    # Check for raga-specific queries
-    if any(keyword in question_lower for keyword in ["raga", "melakarta", "janya", "alias", "list", "number"]):
-        selected_tools.append(("raga_index_tool", raga_index_tool))
+def select_tools(user_question, question_embedding=None):
+    """Select the tools for the user's question with the embedding router (keyword rules as fallback)"""
+    return route_tools(user_question, question_embedding)
+
+class AnswerStream:
+    """
+    Iterable over the answer text as it is generated, for st.write_stream.
+    Once iteration finishes, result holds (answer, tools_used, react_details, trace_spans).
+    """
+
+    def __init__(self, user_question, use_react_agent=True):
+        self.user_question = user_question
+        self.use_react_agent = use_react_agent
+        self.result = None
+
+    def __iter__(self):
+        streamed = []
+        try:
+            with start_trace("get_answer", question=self.user_question, react_agent=self.use_react_agent) as answer_trace:
+                answer_tokens = _answer_question(self.user_question, self.use_react_agent)
+                while True:
+                    try:
+                        token = next(answer_tokens)
+                    except StopIteration as finished:
+                        final_answer, selected_tools, react_details = finished.value
+                        break
+                    streamed.append(token)
+                    yield token
+            export_trace(answer_trace)
+            self.result = (final_answer, selected_tools, react_details, answer_trace.to_dicts())
+        except Exception as e:
+            error = f"Error: {e}"
+            yield error if not streamed else f"\n\n{error}"
+            self.result = (error, [], None, None)
+
+def get_answer_stream(user_question, use_react_agent=True):
+    """Stream the answer from the LLM using appropriate tools, conversation memory, and optional React Agent refinement"""
+    return AnswerStream(user_question, use_react_agent)
+
+def get_answer(user_question, use_react_agent=True):
+    """Get answer from the LLM using appropriate tools, conversation memory, and optional React Agent refinement"""
+    answer_stream = get_answer_stream(user_question, use_react_agent)
+    for _ in answer_stream:
+        pass
+    return answer_stream.result
+
+def _answer_question(user_question, use_react_agent):
+    """
+    Retrieval and LLM pipeline behind get_answer; every stage is recorded as a trace span.
+    Yields the final answer text as it is generated and returns (answer, tools_used, react_details).
+    """
+    # Initialize models and semantic layer
+    semantic_layer_obj = Prompt(user_question)
+    llm_model = models.getLLM()
+    conversation_manager = st.session_state.conversation_manager
     
-    # Check for composition-related queries
-    if any(keyword in question_lower for keyword in ["krithi", "kriti", "composition", "lyrics", "composer", "tala", "song"]):
-        selected_tools.append(("krithi_tool", krithi_tool))
+    # Near-identical questions answered recently in this session are served from the semantic cache;
+    # follow-up questions depend on the conversation and always go through the pipeline
+    namespace = cache_namespace("react" if use_react_agent else "direct", conversation_manager)
+    query_context = QueryEmbeddingContext()
+    question_embedding = query_context.get(user_question)
+    answer_cache = getAnswerCache()
+    cached = None
+    if namespace is not None:
+        with span("answer_cache_lookup") as cache_span:
+            cached = answer_cache.lookup(question_embedding, namespace=namespace)
+            cache_span.set(hit=cached is not None)
+    if cached is not None:
+        print(f"⚡ Answer cache hit (similarity {cached['similarity']:.3f})")
+        yield cached["answer"]
+        with span("memory_save"):
+            conversation_manager.save_to_memory(user_question, cached["answer"])
+        cached_tools = [(tool_name, TOOLS_BY_NAME[tool_name]) for tool_name in cached["tools_used"]]
+        return cached["answer"], cached_tools, None
     
-    # If multiple categories or general query, use multi_search
-    if len(selected_tools) > 1 or "carnatic music" in question_lower:
-        selected_tools.append(("multi_search", multi_search))
+    # Select appropriate tools based on user input
+    with span("tool_selection") as selection_span:
+        selected_tools = select_tools(user_question, question_embedding)
+        selection_span.set(tools=[tool_name for tool_name, _ in selected_tools])
     
-    # If no specific tools selected, default to knowledge_tool
-    if not selected_tools:
-        selected_tools.append(("knowledge_tool", knowledge_tool))
+    # Execute selected tools and collect results; candidates of all tools are re-ranked in one batch
+    with query_context, span("tool_execution"):
+        tool_results = run_tools(user_question, selected_tools, categories=MULTI_SEARCH_CATEGORIES, k_each=4)
     
-    return selected_tools
-
-def get_answer(user_question, use_react_agent=True):
-    """Get answer from the LLM using appropriate tools, conversation memory, and optional React Agent refinement"""
-    try:
-        # Initialize models and semantic layer
-        semantic_layer_obj = Prompt(user_question)
-        llm_model_obj = Models()
-        llm_model = llm_model_obj.getLLM()
-        
-        # Select appropriate tools based on user input
-        selected_tools = select_tools(user_question)
-        
-        # Execute selected tools and collect results
-        tool_results = []
-        for tool_name, tool_func in selected_tools:
-            try:
-                if tool_name == "multi_search":
-                    result = multi_search.invoke({
-                        "query": user_question,
-                        "categories": ["Literature", "Raga", "Krithis"],
-                        "k_each": 4
-                    })
-                else:
-                    result = tool_func.invoke(user_question)
-                
-                tool_results.append(f"Results from {tool_name}:\n{result}")
-                
-            except Exception as e:
-                tool_results.append(f"Error with {tool_name}: {e}")
-        
+    with span("prompt_assembly") as prompt_span:
         # Get the prompt string ONLY from semantic layer
         semantic_prompt = semantic_layer_obj.getPromptStr()
         
         # Use conversation manager to create context-aware prompt
-        conversation_manager = st.session_state.conversation_manager
         conversation_context = conversation_manager.get_conversation_context()
         context_prompt = conversation_manager.create_context_aware_prompt(
             semantic_prompt, user_question, tool_results
         )
+        prompt_span.set(prompt_chars=len(context_prompt), context_chars=len(conversation_context))
 
-        if use_react_agent:
-            # Initialize React Agent
-            react_agent = ReactAgent(llm_model)
-            
-            # Stage 1: Get initial response from LLM
-            print("🚀 Stage 1: Generating initial response...")
+    if use_react_agent:
+        # Initialize React Agent
+        react_agent = ReactAgent(llm_model)
+        
+        # Stage 1: Get initial response from LLM
+        print("🚀 Stage 1: Generating initial response...")
+        with span("llm:initial") as llm_span:
             initial_response = llm_model.invoke(context_prompt)
-            initial_content = initial_response.content
-            
-            # Stage 2: Use React Agent to critique and refine
-            print("🎭 Stage 2: React Agent processing...")
-            react_result = react_agent.process_with_react(
-                user_question, 
-                initial_content, 
-                tool_results, 
-                conversation_context
-            )
-            
-            final_answer = react_result["refined_response"]
-            react_details = react_result
-            
-        else:
-            # Direct response without React Agent
-            print("🚀 Generating direct response...")
-            response = llm_model.invoke(context_prompt)
-            final_answer = response.content
-            react_details = None
+            record_llm_usage(llm_span, initial_response, context_prompt)
+        initial_content = initial_response.content
         
-        # Save conversation to memory using conversation manager
-        conversation_manager.save_to_memory(user_question, final_answer)
+        # Stage 2: Use React Agent to critique and refine; the refined response streams as it is written
+        print("🎭 Stage 2: React Agent processing...")
+        react_result = yield from react_agent.stream_with_react(
+            user_question, 
+            initial_content, 
+            tool_results, 
+            conversation_context
+        )
         
-        return final_answer, selected_tools, react_details
+        final_answer = react_result["refined_response"]
+        react_details = react_result
         
-    except Exception as e:
-        return f"Error: {e}", [], None
+    else:
+        # Direct response without React Agent
+        print("🚀 Generating direct response...")
+        final_answer = yield from stream_llm(llm_model, context_prompt, "llm:direct")
+        react_details = None
+    
+    # Save conversation to memory using conversation manager
+    with span("memory_save"):
+        conversation_manager.save_to_memory(user_question, final_answer)
+    
+    if namespace is not None and is_cacheable(final_answer, tool_results, react_details):
+        answer_cache.add(user_question, question_embedding, final_answer,
+                         [tool_name for tool_name, _ in selected_tools], namespace=namespace)
+    
+    return final_answer, selected_tools, react_details
+
+def render_trace(trace_spans):
+    """Collapsible per-stage timing panel for one answer"""
+    depth_of = {}
+    rows = []
+    for trace_span in trace_spans:
+        depth = depth_of.get(trace_span["parent_id"], -1) + 1
+        depth_of[trace_span["span_id"]] = depth
+        rows.append({
+            "stage": "\u00a0\u00a0" * depth + trace_span["name"],
+            "ms": trace_span["duration_ms"],
+            "details": ", ".join(f"{key}={value}" for key, value in trace_span["attributes"].items() if key != "question"),
+        })
+    total_ms = trace_spans[0]["duration_ms"] if trace_spans else 0
+    with st.expander(f"⏱️ Timing ({total_ms / 1000:.2f}s)"):
+        st.dataframe(rows, use_container_width=True, hide_index=True)
 
 def clear_conversation():
     """Clear the conversation using the conversation manager"""
@@ -289,6 +341,11 @@ def clear_conversation():
 def main():
     """Main Streamlit chat interface"""
 
+    # Models are shared process-wide, so this only does work on the first run
+    with st.spinner("⏳ Loading models and knowledge base..."):
+        models.warmup()
+        getToolRouter().warmup()
+
     # Header
     st.markdown('<h1 class="main-header">🎵 Carnatic Music Assistant</h1>', unsafe_allow_html=True)
     st.markdown('<p class="sub-header">Chat with me about Carnatic music theory, ragas, compositions, and more!</p>', unsafe_allow_html=True)
@@ -353,6 +410,12 @@ def main():
         memory_stats = conversation_manager.get_memory_stats()
         st.markdown(f"**Total Messages**: {memory_stats['total_messages']}")
         st.markdown(f"**Memory Messages**: {memory_stats['memory_messages']}")
+        if memory_stats["summarized_turns"]:
+            st.markdown(f"**Summarized Turns**: {memory_stats['summarized_turns']}")
+
+        # Re-ranking score cache counters
+        cache_stats = getScoreCache().stats()
+        st.markdown(f"**Re-rank Cache**: {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['entries']} scores)")
 
     # Main chat area
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -387,6 +450,9 @@ def main():
                     for tool_name, _ in message["tools_used"]:
                         st.markdown(f'<div class="tool-info">✅ {tool_name}</div>', unsafe_allow_html=True)
 
+                if message.get("trace"):
+                    render_trace(message["trace"])
+
         st.markdown('</div>', unsafe_allow_html=True)
 
         # Input container (no big box on top)
@@ -411,11 +477,13 @@ def main():
             st.session_state.last_input = user_input
             if user_input.strip():
                 conversation_manager.add_message("user", user_input.strip())
-                with st.spinner(""):
-                    st.markdown('<div class="typing-indicator">🎵 Assistant is thinking <div class="dot"></div><div class="dot"></div><div class="dot"></div></div>', unsafe_allow_html=True)
+                st.markdown('<div class="typing-indicator">🎵 Assistant is thinking <div class="dot"></div><div class="dot"></div><div class="dot"></div></div>', unsafe_allow_html=True)
 
-                answer, tools_used, react_result = get_answer(user_input.strip(), use_react_agent=use_react_agent)
-                conversation_manager.add_message("assistant", answer, tools_used, react_result)
+                # Tokens are shown as they arrive; the full answer is kept in the history on rerun
+                answer_stream = get_answer_stream(user_input.strip(), use_react_agent=use_react_agent)
+                st.write_stream(answer_stream)
+                answer, tools_used, react_result, trace_spans = answer_stream.result
+                conversation_manager.add_message("assistant", answer, tools_used, react_result, trace_spans)
                 st.rerun()
 
         # Example chips
@@ -432,8 +500,10 @@ def main():
         for example in examples:
             if st.button(example, key=f"ex_{example}"):
                 conversation_manager.add_message("user", example)
-                answer, tools_used, react_result = get_answer(example, use_react_agent=use_react_agent)
-                conversation_manager.add_message("assistant", answer, tools_used)
+                answer_stream = get_answer_stream(example, use_react_agent=use_react_agent)
+                st.write_stream(answer_stream)
+                answer, tools_used, react_result, trace_spans = answer_stream.result
+                conversation_manager.add_message("assistant", answer, tools_used, trace=trace_spans)
                 st.rerun()
 
         st.markdown('</div>', unsafe_allow_html=True)
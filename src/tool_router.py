@@ -0,0 +1,179 @@
+"""
+Embedding-based tool selection.
+Each tool has a few prototype questions; their embeddings (from the shared MiniLM model) are
+computed once. A question is routed to the tools whose closest prototype is similar enough,
+keeping only those near the best score so most questions use a single tool; questions close to
+several tools go to multi_search, alongside raga_index_tool when it is one of them. When no tool
+is confident enough, the keyword rules the apps used before decide instead.
+"""
+
+import threading
+from typing import List
+
+import numpy as np
+
+import models
+import utils as car_utils
+from tools import TOOLS_BY_NAME
+from tracing import span
+
+# tools that answer from a lookup table (see tools.exact_lookup) rather than only from the vector store
+LOOKUP_TOOLS = ("raga_index_tool",)
+
+# example questions (and descriptions) each tool is good at answering
+TOOL_PROTOTYPES = {
+    "knowledge_tool": [
+        "Carnatic music theory, literature, ragas, scales and prayogas",
+        "Explain gamakas in Carnatic music",
+        "What is a prayoga?",
+        "What are the characteristics of raga Bhairavi?",
+        "Explain the concept of shruti and swara",
+        "How is a raga developed in alapana?",
+    ],
+    "raga_index_tool": [
+        "Raga canonical info, aliases and melakarta mapping",
+        "Which melakarta is Kalyani?",
+        "What is the melakarta number of Mayamalavagowla?",
+        "What is the arohanam and avarohanam of Shankarabharanam?",
+        "List the janya ragas of Kharaharapriya",
+        "What are the other names of raga Hindolam?",
+    ],
+    "krithi_tool": [
+        "Compositions: lyrics, composer, tala and explanations",
+        "Who composed Endaro Mahanubhavulu?",
+        "What are the lyrics of a Thyagaraja krithi?",
+        "Which tala is this composition set in?",
+        "Krithis composed by Muthuswami Dikshitar",
+        "What is the meaning of this song?",
+    ],
+    "multi_search": [
+        "What is carnatic music?",
+        "Give me an overview of Carnatic music",
+        "Tell me everything about raga Todi, its theory and famous compositions",
+        "Compare ragas and compositions across Carnatic music",
+    ],
+}
+
+def keyword_select_tools(user_question: str) -> List[str]:
+    """Keyword rules used when the router is not confident; returns tool names"""
+    question_lower = user_question.lower()
+    selected_tools = []
+
+    # Check for knowledge-related queries
+    if any(keyword in question_lower for keyword in ["what is", "explain", "theory", "literature", "raga", "scale", "prayoga"]):
+        selected_tools.append("knowledge_tool")
+
+    # Check for raga-specific queries
+    if any(keyword in question_lower for keyword in ["raga", "melakarta", "janya", "alias", "list", "number"]):
+        selected_tools.append("raga_index_tool")
+
+    # Check for composition-related queries
+    if any(keyword in question_lower for keyword in ["krithi", "kriti", "composition", "lyrics", "composer", "tala", "song"]):
+        selected_tools.append("krithi_tool")
+
+    # If multiple categories or general query, use multi_search
+    if len(selected_tools) > 1 or "carnatic music" in question_lower:
+        selected_tools.append("multi_search")
+
+    # If no specific tools selected, default to knowledge_tool
+    if not selected_tools:
+        selected_tools.append("knowledge_tool")
+
+    return selected_tools
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class ToolRouter:
+    """
+    Picks the smallest set of tools for a question from its embedding.
+
+    Usage:
+        router = ToolRouter()
+        tool_names = router.route(question)                    # e.g. ["raga_index_tool"]
+        tool_names = router.route(question, question_vector)   # reuse an embedding already computed
+    """
+
+    def __init__(self, embeddings_model=None, threshold: float = None, margin: float = None, max_tools: int = None):
+        router_attributes = car_utils.getToolRouterAttributes()
+        self.embeddings_model = embeddings_model
+        self.threshold = router_attributes["threshold"] if threshold is None else threshold
+        self.margin = router_attributes["margin"] if margin is None else margin
+        self.max_tools = max_tools or router_attributes["max_tools"]
+        self.tool_names = list(TOOL_PROTOTYPES)
+        self._prototype_vectors = None
+        self._prototype_tools = None
+        self._lock = threading.Lock()
+
+    def _prototypes(self):
+        """Normalized prototype embeddings and the tool each one belongs to, computed on first use"""
+        if self._prototype_vectors is None:
+            with self._lock:
+                if self._prototype_vectors is None:
+                    embeddings_model = self.embeddings_model or models.getEmbeddingsModel()
+                    texts = [text for tool_name in self.tool_names for text in TOOL_PROTOTYPES[tool_name]]
+                    self._prototype_tools = np.asarray([tool_name for tool_name in self.tool_names for text in TOOL_PROTOTYPES[tool_name]])
+                    self._prototype_vectors = _normalize(np.asarray(embeddings_model.embed_documents(texts), dtype=np.float32))
+        return self._prototype_vectors, self._prototype_tools
+
+    def warmup(self):
+        """Embed the prototypes ahead of the first question"""
+        self._prototypes()
+
+    def scores(self, question_embedding) -> dict:
+        """Cosine similarity of the question to the closest prototype of each tool"""
+        prototype_vectors, prototype_tools = self._prototypes()
+        similarities = prototype_vectors @ _normalize(np.asarray(question_embedding, dtype=np.float32))
+        return {tool_name: float(similarities[prototype_tools == tool_name].max()) for tool_name in self.tool_names}
+
+    def route(self, user_question: str, question_embedding=None) -> List[str]:
+        """Names of the tools to run for the question"""
+        with span("tool_routing") as routing_span:
+            if question_embedding is None:
+                embeddings_model = self.embeddings_model or models.getEmbeddingsModel()
+                question_embedding = embeddings_model.embed_query(user_question)
+            tool_scores = self.scores(question_embedding)
+            ranked = sorted(tool_scores.items(), key=lambda item: item[1], reverse=True)
+            best_score = ranked[0][1]
+
+            if best_score < self.threshold:
+                selected_tools = keyword_select_tools(user_question)
+                decision = "keyword_fallback"
+            else:
+                # single-category tools close to the best score; more than one means a cross-category question
+                # that multi_search covers, as it does when it is the best match itself. multi_search does not
+                # consult the raga table, so raga_index_tool is kept next to it when it is within the margin
+                single_tools = [tool_name for tool_name, score in ranked
+                                if tool_name != "multi_search" and score >= self.threshold and best_score - score <= self.margin]
+                if ranked[0][0] == "multi_search" or len(single_tools) > self.max_tools:
+                    selected_tools = [tool_name for tool_name in single_tools if tool_name in LOOKUP_TOOLS] + ["multi_search"]
+                else:
+                    selected_tools = single_tools
+                decision = "embedding"
+
+            rounded_scores = {tool_name: round(score, 3) for tool_name, score in ranked}
+            routing_span.set(decision=decision, scores=str(rounded_scores), tools=selected_tools)
+        print(f"🧭 Tool router ({decision}): {', '.join(selected_tools)} | scores {rounded_scores}")
+        return selected_tools
+
+_tool_router = None
+_tool_router_lock = threading.Lock()
+
+def getToolRouter() -> ToolRouter:
+    """Process-wide router configured from Utils, created on first use"""
+    global _tool_router
+    if _tool_router is None:
+        with _tool_router_lock:
+            if _tool_router is None:
+                _tool_router = ToolRouter()
+    return _tool_router
+
+def route_tools(user_question: str, question_embedding=None) -> List:
+    """(tool_name, tool) pairs chosen by the router; keyword rules are used if routing fails"""
+    try:
+        tool_names = getToolRouter().route(user_question, question_embedding)
+    except Exception as e:
+        print(f"Warning: Tool routing failed, using keyword selection: {e}")
+        tool_names = keyword_select_tools(user_question)
+    return [(tool_name, TOOLS_BY_NAME[tool_name]) for tool_name in tool_names]
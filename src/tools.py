@@ -4,31 +4,167 @@ retrieve relevant content from the vector store to answer the user question
 """
 
 from langchain.tools import tool
-from langchain_community.vectorstores import FAISS
-from models import Models
+import models
 import utils as car_utils
-import os
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from typing import List
-from sentence_transformers import CrossEncoder
 import numpy as np
+from reranker import RerankScheduler, chunk_id
+from sparse_index import reciprocal_rank_fusion
+from tracing import span
 
-# load vectorstore once
+# models and indexes are loaded lazily through the shared registry in models.py
 vector_store_attributes = car_utils.getVectoreStoreAttributes()
-persist_dir = vector_store_attributes["dir_name"]
-persist_db = vector_store_attributes["file_name"]
-persist_path = os.path.join(persist_dir, persist_db)
-models_obj = Models()
-embeddings_model = models_obj.getEmbeddingsModel()
+categories_mapper = vector_store_attributes['meta_data']
+# retrieval settings are read once here; each Utils() call lists the project and reloads .env
+hybrid_search_attributes = car_utils.getHybridSearchAttributes()
+mmr_attributes = car_utils.getMMRAttributes()
+tool_execution_attributes = car_utils.getToolExecutionAttributes()
 
-# Initialize re-ranking model
-re_ranking_model_name = models_obj.getReRankingModelName()
-re_ranking_model = CrossEncoder(re_ranking_model_name)
+# query embedding shared by every tool call made while answering one question
+_active_query_context = contextvars.ContextVar("active_query_context", default=None)
 
-vector_store_db = FAISS.load_local(persist_path, embeddings_model, allow_dangerous_deserialization=True)
+class QueryEmbeddingContext:
+    """
+    Embeds each query text once per request and hands the cached vector to every tool.
 
-categories_mapper = vector_store_attributes['meta_data']
+    Usage:
+        with QueryEmbeddingContext():
+            knowledge_tool.invoke(question)
+            raga_index_tool.invoke(question)
+    """
+
+    def __init__(self, embeddings=None):
+        self.embeddings_model = embeddings or models.getEmbeddingsModel()
+        self.query_vectors = {}
+        self._lock = threading.Lock()
+        self._token = None
+
+    def get(self, query: str) -> List[float]:
+        """Return the embedding for the query, computing it only on first use"""
+        with self._lock:
+            if query not in self.query_vectors:
+                with span("embedding", query_chars=len(query)):
+                    self.query_vectors[query] = self.embeddings_model.embed_query(query)
+            return self.query_vectors[query]
 
-def re_rank_documents(query: str, docs: List, top_k: int = 6) -> List:
+    def __enter__(self):
+        parent_context = _active_query_context.get()
+        if parent_context is not None and parent_context is not self:
+            # nested contexts share the vectors of the outer request
+            self.query_vectors = parent_context.query_vectors
+            self._lock = parent_context._lock
+        self._token = _active_query_context.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active_query_context.reset(self._token)
+        self._token = None
+        return False
+
+def get_query_embedding(query: str) -> List[float]:
+    """Embedding for the query, reused from the active QueryEmbeddingContext when there is one"""
+    query_context = _active_query_context.get()
+    if query_context is not None:
+        return query_context.get(query)
+    with span("embedding", query_chars=len(query)):
+        return models.getEmbeddingsModel().embed_query(query)
+
+def document_at_row(store, row: int):
+    """Document stored at a FAISS row of a MappedVectorStore or a LangChain FAISS store"""
+    if hasattr(store, "get_document"):
+        return store.get_document(row)
+    return store.docstore.search(store.index_to_docstore_id[row])
+
+def search_category(query: str, category: str, k: int, fused_k: int = None) -> List:
+    """
+    Similarity search restricted to one category using the shared query embedding.
+    When the category has a BM25 index, its k best keyword hits are fused with the k dense hits
+    by reciprocal rank fusion and the best fused_k (default k) are returned.
+    """
+    query_embedding = get_query_embedding(query)
+    with span("faiss_search", category=category, k=k) as search_span:
+        category_store = models.getVectorStore(category)
+        if category_store is not None:
+            docs = category_store.similarity_search_by_vector(query_embedding, k=k)
+        else:
+            docs = models.getVectorStore().similarity_search_by_vector(query_embedding, k=k, filter={"category": category})
+        search_span.set(hits=len(docs), sub_index=category_store is not None)
+
+    sparse_index = models.getSparseIndex(category) if hybrid_search_attributes["enabled"] and category_store is not None else None
+    if sparse_index is None:
+        return docs
+
+    with span("bm25_search", category=category, k=k) as sparse_span:
+        sparse_docs = [document_at_row(category_store, row) for row, score in sparse_index.search(query, k)]
+        fused = reciprocal_rank_fusion([docs, sparse_docs], key=chunk_id, rrf_k=hybrid_search_attributes["rrf_k"])
+        sparse_span.set(hits=len(sparse_docs), fused=len(fused))
+    return fused[:fused_k or k]
+
+def mmr_select(query_vector, doc_vectors, k: int, lambda_mult: float) -> List[int]:
+    """
+    Positions of k documents chosen by maximal marginal relevance: each pick maximizes
+    lambda_mult * similarity to the query - (1 - lambda_mult) * similarity to the documents already picked
+    """
+    doc_vectors = np.asarray(doc_vectors, dtype=np.float32)
+    doc_vectors = doc_vectors / np.maximum(np.linalg.norm(doc_vectors, axis=1, keepdims=True), 1e-12)
+    query_vector = np.asarray(query_vector, dtype=np.float32)
+    query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+    relevance = doc_vectors @ query_vector
+    similarity = doc_vectors @ doc_vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    while len(selected) < min(k, len(doc_vectors)):
+        redundancy = similarity[:, selected].max(axis=1)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
+def mmr_sizes(tool_name: str, top_k: int):
+    """
+    (candidates retrieved, candidates kept) of a tool's MMR stage, or None when MMR is off for the tool.
+    MMR keeps a multiple of top_k, so the CrossEncoder still picks the final documents.
+    """
+    settings = mmr_attributes["tools"].get(tool_name)
+    if not mmr_attributes["enabled"] or settings is None:
+        return None
+    kept = settings["factor"] * top_k
+    return 2 * kept, kept
+
+def diversify(query: str, category: str, docs: List, tool_name: str, kept: int) -> List:
+    """
+    Keep kept candidates by MMR over their stored vectors, so overlapping chunks (e.g. of the same
+    PDF page) do not all reach the CrossEncoder. When their vectors cannot be reconstructed (stores
+    without a chunk store) the first kept docs are returned in retrieval order.
+    """
+    settings = mmr_attributes["tools"][tool_name]
+    if len(docs) <= kept:
+        return docs
+    store = models.getVectorStore(category) or models.getVectorStore()
+    vectors = store.get_vectors(docs) if hasattr(store, "get_vectors") else None
+    if vectors is None:
+        return docs[:kept]
+    with span("mmr", tool=tool_name, category=category, candidates=len(docs), lambda_mult=settings["lambda"]) as mmr_span:
+        selected = mmr_select(get_query_embedding(query), vectors, kept, settings["lambda"])
+        mmr_span.set(kept=len(selected))
+    return [docs[position] for position in selected]
+
+def set_index_search_params(**params):
+    """
+    Set query-time index parameters on the shared and per-category stores, e.g.
+    set_index_search_params(nprobe=32) for IVF indexes or set_index_search_params(efSearch=128) for HNSW
+    """
+    for category in [None] + list(categories_mapper.keys()):
+        store = models.getVectorStore(category)
+        if store is not None and hasattr(store, "set_search_params"):
+            store.set_search_params(**params)
+
+def re_rank_documents(query: str, docs: List, top_k: int = 6, scheduler: RerankScheduler = None) -> List:
     """
     Re-rank documents using the CrossEncoder model for better relevance
     
@@ -36,34 +172,13 @@ def re_rank_documents(query: str, docs: List, top_k: int = 6) -> List:
         query: User's question
         docs: List of retrieved documents
         top_k: Number of top documents to return
+        scheduler: Optional RerankScheduler whose scores are shared with other calls
     
     Returns:
         Re-ranked list of documents
     """
-    if not docs:
-        return []
-    
-    try:
-        # Prepare query-document pairs for re-ranking
-        query_doc_pairs = [[query, doc.page_content] for doc in docs]
-        
-        # Get relevance scores from the re-ranking model
-        scores = re_ranking_model.predict(query_doc_pairs)
-        
-        # Create list of (score, document) tuples
-        scored_docs = list(zip(scores, docs))
-        
-        # Sort by score in descending order (higher score = more relevant)
-        scored_docs.sort(key=lambda x: x[0], reverse=True)
-        
-        # Return top_k documents
-        re_ranked_docs = [doc for score, doc in scored_docs[:top_k]]
-        
-        return re_ranked_docs
-        
-    except Exception as e:
-        print(f"Warning: Re-ranking failed, returning original documents: {e}")
-        return docs[:top_k]
+    scheduler = scheduler or RerankScheduler()
+    return scheduler.rank(query, docs, top_k)
 
 def format_docs(docs) -> str:
     lines = []
@@ -74,50 +189,281 @@ def format_docs(docs) -> str:
         lines.append(f"[{i}] ({cat} | {src}) {d.page_content.strip()[:800]}")
     return "\n\n".join(lines) or "No results."
 
+# retrieval settings of the single-category tools: category searched, candidates fetched, docs kept
+TOOL_SEARCH_SPECS = {
+    "knowledge_tool": {"category": list(categories_mapper.keys())[0], "k": 12, "top_k": 6},
+    "raga_index_tool": {"category": list(categories_mapper.keys())[1], "k": 12, "top_k": 6},
+    "krithi_tool": {"category": list(categories_mapper.keys())[2], "k": 12, "top_k": 6},
+}
+
+# categories searched by multi_search when it is selected by the app
+MULTI_SEARCH_CATEGORIES = ["Literature", "Raga", "Krithis"]
+
+def check_deadline(tool_name: str, deadline: float = None):
+    """Raise TimeoutError once time.monotonic() has passed the tool's deadline"""
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError(f"{tool_name} passed its deadline")
+
+def collect_candidates(tool_name: str, query: str, categories: List[str] = None, k_each: int = 4, deadline: float = None) -> List:
+    """
+    Retrieve a tool's candidates as (key, query, docs, top_k) submissions for a RerankScheduler.
+    With a deadline (a time.monotonic() value) the remaining searches and MMR steps are skipped
+    once it has passed; a search already running is not interrupted.
+    """
+    submissions = []
+    if tool_name == "multi_search":
+        mmr = mmr_sizes(tool_name, k_each)
+        for cat in categories or MULTI_SEARCH_CATEGORIES:
+            check_deadline(tool_name, deadline)
+            # Retrieve more documents per category for better re-ranking
+            docs = search_category(query, cat, k=mmr[0] if mmr else k_each * 2)
+            if mmr:
+                check_deadline(tool_name, deadline)
+                docs = diversify(query, cat, docs, tool_name, mmr[1])
+            submissions.append(((tool_name, cat), query, docs, k_each))
+    else:
+        # Retrieve more documents initially for better re-ranking; with hybrid search the fused
+        # candidates have better recall, so fewer of them are sent to the CrossEncoder
+        spec = TOOL_SEARCH_SPECS[tool_name]
+        mmr = mmr_sizes(tool_name, spec["top_k"])
+        check_deadline(tool_name, deadline)
+        if mmr:
+            docs = search_category(query, spec["category"], k=max(spec["k"], mmr[0]), fused_k=mmr[0])
+            check_deadline(tool_name, deadline)
+            docs = diversify(query, spec["category"], docs, tool_name, mmr[1])
+        else:
+            fused_k = max(spec["top_k"], hybrid_search_attributes["candidates"])
+            docs = search_category(query, spec["category"], k=spec["k"], fused_k=fused_k)
+        submissions.append((tool_name, query, docs, spec["top_k"]))
+    return submissions
+
+def final_docs(tool_name: str, query: str, scheduler: RerankScheduler, ranked: dict, categories: List[str] = None) -> List:
+    """A tool's final documents, in order, from the scheduler's ranked candidates"""
+    if tool_name == "multi_search":
+        all_results = []
+        for cat in categories or MULTI_SEARCH_CATEGORIES:
+            all_results.extend(ranked.get((tool_name, cat), []))
+
+        # Final re-ranking across all categories reuses the scores computed per category
+        return scheduler.rank(query, all_results, top_k=min(len(all_results), 8))
+
+    return ranked.get(tool_name, [])
+
+class ToolResult(str):
+    """
+    A tool's "Results from <tool>" / "Error with <tool>" text as returned by run_tools, also carrying
+    the documents behind it and their re-ranking scores so prompts can be packed from the chunks
+    """
+
+    def __new__(cls, text: str, tool_name: str, docs: List = None, scores: List = None, error=None, lookup: str = None):
+        result = super().__new__(cls, text)
+        result.tool_name = tool_name
+        result.docs = docs or []
+        result.scores = scores or [None] * len(result.docs)
+        result.error = error
+        # lookup table rows shown before the documents
+        result.lookup = lookup
+        return result
+
+def exact_lookup(tool_name: str, query: str):
+    """
+    A tool's rows from a lookup table as (text, answers question), or None when it has none.
+    raga_index_tool looks up the ragas and melakartas named in the question in the raga table; when they
+    are the whole subject of the question the rows are its answer and the vector store is not searched,
+    otherwise they are shown together with the retrieved documents.
+    """
+    if tool_name != "raga_index_tool":
+        return None
+    raga_table = models.getRagaTable()
+    if raga_table is None:
+        return None
+    with span("raga_lookup") as lookup_span:
+        matches, is_subject = raga_table.lookup_question(query)
+        lookup_span.set(matches=[record["name"] for record, matched in matches], subject=is_subject)
+    return (raga_table.format(matches), is_subject) if matches else None
+
+def exact_lookups(query: str, selected_tools: List) -> dict:
+    """(text, answers question) lookup table rows of the selected tools that have them"""
+    lookups = {}
+    for tool_name, _ in selected_tools:
+        lookup = exact_lookup(tool_name, query)
+        if lookup is not None:
+            lookups[tool_name] = lookup
+    return lookups
+
+def answered_tools(lookups: dict) -> set:
+    """Tools whose lookup rows answer the question, so they skip retrieval"""
+    return {tool_name for tool_name, (text, answers_question) in lookups.items() if answers_question}
+
+def tool_result(tool_name: str, query: str, scheduler: RerankScheduler, ranked: dict, categories: List[str] = None,
+                lookup: str = None) -> ToolResult:
+    """A tool's formatted output (after its lookup table rows, if any) together with its final documents and their scores"""
+    docs = final_docs(tool_name, query, scheduler, ranked, categories)
+    with span("format", tool=tool_name, docs=len(docs)):
+        text = format_docs(docs)
+    if lookup:
+        text = f"{lookup}\n\n{text}"
+    return ToolResult(f"Results from {tool_name}:\n{text}", tool_name, docs, [scheduler.score_of(query, doc) for doc in docs],
+                      lookup=lookup)
+
+def traced_collect_candidates(tool_name: str, query: str, categories: List[str] = None, k_each: int = 4, deadline: float = None) -> List:
+    """collect_candidates recorded as a tool invocation span"""
+    with span(f"tool:{tool_name}", tool=tool_name) as tool_span:
+        submissions = collect_candidates(tool_name, query, categories, k_each, deadline)
+        tool_span.set(candidates=sum(len(docs) for key, sub_query, docs, top_k in submissions))
+        return submissions
+
+def run_tool(tool_name: str, query: str, categories: List[str] = None, k_each: int = 4) -> str:
+    """Run one tool end to end with its own scheduler; returns the ToolResult run_tools would give for it"""
+    lookup_text, answers_question = exact_lookup(tool_name, query) or (None, False)
+    if answers_question:
+        return ToolResult(f"Results from {tool_name}:\n{lookup_text}", tool_name)
+    scheduler = RerankScheduler()
+    for submission in collect_candidates(tool_name, query, categories, k_each):
+        scheduler.submit(*submission)
+    ranked = scheduler.run()
+    return tool_result(tool_name, query, scheduler, ranked, categories, lookup_text)
+
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+
+def getToolExecutor() -> ThreadPoolExecutor:
+    """Process-wide thread pool for tool retrieval; FAISS and torch release the GIL while they work"""
+    global _tool_executor
+    if _tool_executor is None:
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(max_workers=tool_execution_attributes["max_workers"],
+                                                    thread_name_prefix="car-tool")
+    return _tool_executor
+
+def run_tools(query: str, selected_tools: List, categories: List[str] = None, k_each: int = 4, timeout: float = None) -> List[str]:
+    """
+    Run the selected tools for one question in parallel, re-ranking all their candidates together
+
+    Args:
+        query: User's question
+        selected_tools: List of (tool_name, tool) pairs from select_tools
+        categories: Categories searched by multi_search
+        k_each: Documents kept per category by multi_search
+        timeout: Seconds each tool may take to retrieve its candidates (defaults to Utils). The timeout is
+            soft: a timed-out tool is reported as an error at once, and its worker stops before its next
+            search or MMR step, but a search already running finishes in the background
+
+    Returns:
+        One "Results from <tool>" or "Error with <tool>" ToolResult per selected tool, in order
+    """
+    if timeout is None:
+        timeout = tool_execution_attributes["timeout_seconds"]
+    scheduler = RerankScheduler()
+    errors = {}
+    # tools answered from a lookup table skip retrieval
+    lookups = exact_lookups(query, selected_tools)
+    answered = answered_tools(lookups)
+
+    # The question is embedded once and reused by every selected tool
+    with QueryEmbeddingContext():
+        # every worker runs in a copy of this context so it sees the shared query embedding
+        executor = getToolExecutor()
+        # all tools start together, so each one gets the same deadline
+        deadline = time.monotonic() + timeout
+        futures = [(tool_name, executor.submit(contextvars.copy_context().run, traced_collect_candidates, tool_name, query, categories, k_each, deadline))
+                   for tool_name, _ in selected_tools if tool_name not in answered]
+
+        for tool_name, future in futures:
+            try:
+                for submission in future.result(timeout=max(0.0, deadline - time.monotonic())):
+                    scheduler.submit(*submission)
+            except FuturesTimeoutError:
+                # cancel only drops a tool still queued; a running one stops at its next deadline check
+                future.cancel()
+                errors[tool_name] = f"timed out after {timeout:g}s"
+            except Exception as e:
+                errors[tool_name] = e
+
+    # One batched CrossEncoder call over the de-duplicated candidates of every tool
+    ranked = scheduler.run()
+    return collect_tool_results(query, selected_tools, scheduler, ranked, errors, categories, lookups)
+
+def collect_tool_results(query: str, selected_tools: List, scheduler: RerankScheduler, ranked: dict, errors: dict,
+                         categories: List[str] = None, lookups: dict = None) -> List[str]:
+    """One ToolResult per selected tool, in order, from the lookup table rows, ranked candidates and retrieval errors"""
+    tool_results = []
+    lookups = lookups or {}
+    for tool_name, _ in selected_tools:
+        lookup_text, answers_question = lookups.get(tool_name, (None, False))
+        if answers_question:
+            tool_results.append(ToolResult(f"Results from {tool_name}:\n{lookup_text}", tool_name))
+            continue
+        if tool_name in errors:
+            tool_results.append(ToolResult(f"Error with {tool_name}: {errors[tool_name]}", tool_name, error=errors[tool_name]))
+            continue
+        try:
+            tool_results.append(tool_result(tool_name, query, scheduler, ranked, categories, lookup_text))
+        except Exception as e:
+            tool_results.append(ToolResult(f"Error with {tool_name}: {e}", tool_name, error=e))
+
+    return tool_results
+
+async def arun_tools(query: str, selected_tools: List, categories: List[str] = None, k_each: int = 4, timeout: float = None) -> List[str]:
+    """
+    Async run_tools: retrieval and re-ranking run on the shared tool thread pool, so the event loop
+    keeps serving other sessions while this question's tools work
+    """
+    if timeout is None:
+        timeout = tool_execution_attributes["timeout_seconds"]
+    loop = asyncio.get_running_loop()
+    executor = getToolExecutor()
+    scheduler = RerankScheduler()
+    errors = {}
+    lookups = await loop.run_in_executor(executor, contextvars.copy_context().run, exact_lookups, query, selected_tools)
+    answered = answered_tools(lookups)
+    searched_tools = [(tool_name, selected_tool) for tool_name, selected_tool in selected_tools if tool_name not in answered]
+
+    with QueryEmbeddingContext():
+        deadline = time.monotonic() + timeout
+        futures = [loop.run_in_executor(executor, contextvars.copy_context().run, traced_collect_candidates, tool_name, query, categories, k_each, deadline)
+                   for tool_name, _ in searched_tools]
+        done, pending = await asyncio.wait(futures, timeout=timeout) if futures else (set(), set())
+        for (tool_name, _), future in zip(searched_tools, futures):
+            if future in pending:
+                future.cancel()
+                errors[tool_name] = f"timed out after {timeout:g}s"
+            elif future.exception() is not None:
+                errors[tool_name] = future.exception()
+            else:
+                for submission in future.result():
+                    scheduler.submit(*submission)
+
+    ranked = await loop.run_in_executor(executor, contextvars.copy_context().run, scheduler.run)
+    return collect_tool_results(query, selected_tools, scheduler, ranked, errors, categories, lookups)
+
+async def arun_tool(tool_name: str, query: str, categories: List[str] = None, k_each: int = 4) -> str:
+    """Async run_tool: one tool end to end on the shared tool thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(getToolExecutor(), contextvars.copy_context().run, run_tool, tool_name, query, categories, k_each)
+
 @tool("knowledge_tool", description="Retrieve Carnatic music theory & literature about ragas, scales, and prayogas.")
 def knowledge_tool(query: str) -> str:
-    # Retrieve more documents initially for better re-ranking
-    docs = vector_store_db.similarity_search(query, k=12, filter={"category": list(categories_mapper.keys())[0]})
-    
-    # Re-rank documents for better relevance
-    re_ranked_docs = re_rank_documents(query, docs, top_k=6)
-    
-    return format_docs(re_ranked_docs)
+    return run_tool("knowledge_tool", query)
 
 @tool("raga_index_tool", description="Lookup raga canonical info (aliases, melakarta mapping).")
 def raga_index_tool(query: str) -> str:
-    # Retrieve more documents initially for better re-ranking
-    docs = vector_store_db.similarity_search(query, k=12, filter={"category": list(categories_mapper.keys())[1]})
-    
-    # Re-rank documents for better relevance
-    re_ranked_docs = re_rank_documents(query, docs, top_k=6)
-    
-    return format_docs(re_ranked_docs)
+    return run_tool("raga_index_tool", query)
 
 @tool("krithi_tool", description="Search compositions: lyrics, composer, tala, and explanations.")
 def krithi_tool(query: str) -> str:
-    # Retrieve more documents initially for better re-ranking
-    docs = vector_store_db.similarity_search(query, k=12, filter={"category": list(categories_mapper.keys())[2]})
-    
-    # Re-rank documents for better relevance
-    re_ranked_docs = re_rank_documents(query, docs, top_k=6)
-    
-    return format_docs(re_ranked_docs)
+    return run_tool("krithi_tool", query)
 
 # convenience for multi-category queries
 @tool("multi_search", description="Search across multiple categories for comprehensive results.")
 def multi_search(query: str, categories: List[str], k_each: int = 4):
-    all_results = []
-    
-    for cat in categories:
-        # Retrieve more documents per category for better re-ranking
-        docs = vector_store_db.similarity_search(query, k=k_each * 2, filter={"category": cat})
-        
-        # Re-rank documents within each category
-        re_ranked_docs = re_rank_documents(query, docs, top_k=k_each)
-        all_results.extend(re_ranked_docs)
-    
-    # Final re-ranking across all categories for the best overall results
-    final_re_ranked = re_rank_documents(query, all_results, top_k=min(len(all_results), 8))
-    
-    return format_docs(final_re_ranked)
\ No newline at end of file
+    # Per-category and merged re-ranking share one scheduler, so each chunk is scored once
+    return run_tool("multi_search", query, categories, k_each)
+
+TOOLS_BY_NAME = {
+    "knowledge_tool": knowledge_tool,
+    "raga_index_tool": raga_index_tool,
+    "krithi_tool": krithi_tool,
+    "multi_search": multi_search,
+}
@@ -0,0 +1,199 @@
+"""
+Lightweight per-answer tracing.
+get_answer opens a trace; every stage inside it (tool selection, tool calls, embedding, FAISS
+search, re-ranking, prompt assembly, LLM calls, memory save) records a span with its duration
+and attributes such as token counts and prompt sizes. Spans follow the request into tool worker
+threads through contextvars. Outside a trace, span() is a no-op.
+
+Traces can be exported as JSON lines or as OpenTelemetry-compatible (OTLP JSON) records.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import utils as car_utils
+
+_active_trace = contextvars.ContextVar("active_trace", default=None)
+_active_span = contextvars.ContextVar("active_span", default=None)
+
+class Span:
+    """One timed stage of an answer"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns = None
+        self.status = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.end_time_ns is None:
+            self.end_time_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        end_time_ns = self.end_time_ns or time.time_ns()
+        return (end_time_ns - self.start_time_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time_ns": self.start_time_ns,
+            "end_time_ns": self.end_time_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+    def to_otel(self) -> dict:
+        """Span in the OTLP JSON encoding"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or self.start_time_ns),
+            "attributes": [{"key": key, "value": _otel_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": 1 if self.status == "ok" else 2},
+        }
+
+class _NoopSpan:
+    """Returned by span() when no trace is active"""
+
+    def set(self, **attributes):
+        pass
+
+_noop_span = _NoopSpan()
+
+def _otel_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otel_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+class Trace:
+    """All spans recorded while answering one question"""
+
+    def __init__(self, name: str, attributes: dict = None):
+        self.trace_id = uuid.uuid4().hex
+        self.spans = []
+        self._lock = threading.Lock()
+        self.root = self._add(Span(name, self.trace_id, attributes=attributes))
+
+    def _add(self, span: Span) -> Span:
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def to_dicts(self) -> list:
+        with self._lock:
+            return [span.to_dict() for span in self.spans]
+
+    def to_jsonl(self) -> str:
+        return "\n".join(json.dumps(span_dict, ensure_ascii=False) for span_dict in self.to_dicts())
+
+    def to_otel(self, service_name: str = "carnatic-music-assistant") -> dict:
+        with self._lock:
+            otel_spans = [span.to_otel() for span in self.spans]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                "scopeSpans": [{"scope": {"name": "carnatic.tracing"}, "spans": otel_spans}],
+            }]
+        }
+
+    def export(self, path: str, format: str = "jsonl"):
+        """Append the trace to a file, one span per line (jsonl) or one OTLP record per line (otel)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as trace_file:
+            if format == "otel":
+                trace_file.write(json.dumps(self.to_otel(), ensure_ascii=False) + "\n")
+            else:
+                trace_file.write(self.to_jsonl() + "\n")
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """Open a trace for one answer; spans created inside (in any thread given the context) belong to it"""
+    answer_trace = Trace(name, attributes)
+    trace_token = _active_trace.set(answer_trace)
+    span_token = _active_span.set(answer_trace.root)
+    try:
+        yield answer_trace
+    except Exception:
+        answer_trace.root.status = "error"
+        raise
+    finally:
+        answer_trace.root.end()
+        _active_span.reset(span_token)
+        _active_trace.reset(trace_token)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a stage as a child of the current span; yields an object whose set() adds attributes"""
+    answer_trace = _active_trace.get()
+    if answer_trace is None:
+        yield _noop_span
+        return
+    parent = _active_span.get()
+    current = answer_trace._add(Span(name, answer_trace.trace_id, parent.span_id if parent else None, attributes))
+    token = _active_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.status = "error"
+        current.set(error=str(e))
+        raise
+    finally:
+        current.end()
+        _active_span.reset(token)
+
+def current_trace():
+    return _active_trace.get()
+
+def record_llm_usage(llm_span, response, prompt: str = None):
+    """Attach prompt size and token counts from a LangChain chat response to a span"""
+    if prompt is not None:
+        llm_span.set(prompt_chars=len(prompt))
+    usage = getattr(response, "usage_metadata", None) or {}
+    if not usage:
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        usage = {"input_tokens": token_usage.get("prompt_tokens"),
+                 "output_tokens": token_usage.get("completion_tokens"),
+                 "total_tokens": token_usage.get("total_tokens")}
+    llm_span.set(**{key: value for key, value in usage.items() if key in ("input_tokens", "output_tokens", "total_tokens") and value is not None})
+    content = getattr(response, "content", None)
+    if content is not None:
+        llm_span.set(response_chars=len(content))
+
+def export_trace(answer_trace):
+    """Append a finished trace to the export file configured in Utils, if any"""
+    export_attributes = car_utils.getTraceExportAttributes()
+    if not export_attributes["path"]:
+        return
+    try:
+        answer_trace.export(export_attributes["path"], export_attributes["format"])
+    except Exception as e:
+        print(f"Warning: Could not export trace: {e}")
@@ -13,7 +13,117 @@ class Utils:
         self.llm_model_name = "llama3-8b-8192" # Add the model name here
         self.embeddings_model_name = "sentence-transformers/all-MiniLM-L6-v2" # Add the sentence transformer model name here
         self.re_ranking_model_name = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+        # inference backend of the embedder and re-ranker: "torch", or "onnx" / "openvino" to run the int8-quantized
+        # export named in backend_model_files on ONNX Runtime / OpenVINO (sentence-transformers[onnx] or [openvino] >= 4.1,
+        # see requirements.txt). The vector store is built with the embedder, so check parity with src/backend_report.py first
+        self.embeddings_backend = "torch"
+        self.re_ranking_backend = "torch"
+        self.backend_model_files = {"onnx":"onnx/model_quint8_avx2.onnx",
+        "openvino":"openvino/openvino_model_qint8_quantized.xml"}
         
+        # LLM client: one pooled HTTP connection set shared by every sync request and one per event loop for async
+        # requests, with at most llm_max_concurrency async LLM calls in flight per event loop
+        self.llm_max_connections = 20
+        self.llm_max_keepalive_connections = 10
+        self.llm_timeout_seconds = 60
+        self.llm_max_concurrency = 8
+
+        # re-ranking score cache; set rerank_cache_file (e.g. "rerank_score_cache.json") to persist it under src/data
+        self.rerank_cache_size = 50000
+        self.rerank_cache_file = None
+
+        # semantic answer cache; questions at or above the cosine similarity threshold reuse a stored answer
+        self.answer_cache_threshold = 0.95
+        self.answer_cache_ttl_seconds = 3600
+        self.answer_cache_size = 500
+        # "session" keeps answers to the session that produced them, "shared" lets every session reuse them;
+        # follow-up questions (non-empty conversation context) never use the cache
+        self.answer_cache_scope = "session"
+
+        # selected tools retrieve in parallel; a tool slower than the timeout is reported as an error
+        self.tool_max_workers = 4
+        self.tool_timeout_seconds = 30
+
+        # ingestion parses and chunks files (or page ranges of large PDFs) in parallel worker processes
+        self.ingest_workers = os.cpu_count() or 1
+        self.ingest_pages_per_task = 50
+
+        # index builds embed chunks in batches and save a resumable checkpoint every few batches
+        self.embed_batch_size = 256
+        self.checkpoint_every_batches = 20
+
+        # chunks whose MinHash-estimated Jaccard similarity (word 3-shingles) to an indexed chunk reaches
+        # dedup_threshold are dropped before embedding; dedup_num_perm hashes are split into dedup_bands LSH bands
+        self.dedup_chunks = True
+        self.dedup_threshold = 0.85
+        self.dedup_num_perm = 64
+        self.dedup_bands = 16
+
+        # hybrid retrieval: BM25 hits are fused with the dense hits by reciprocal rank fusion before re-ranking,
+        # which lets the single-category tools send hybrid_candidates instead of 12 candidates to the CrossEncoder
+        self.hybrid_search = True
+        self.rrf_k = 60
+        self.hybrid_candidates = 8
+
+        # raga lookup table parsed from the Raga PDFs at ingest (raga_table_file under src/data, None to disable);
+        # raga_index_tool answers from it when known ragas are the whole subject of the question, adds the matched rows
+        # to the vector search results when the question asks about more, and only searches otherwise.
+        # Names that are not an exact (transliteration-normalized) match need raga_lookup_cutoff similarity
+        self.raga_table_file = "raga_table.json"
+        self.raga_lookup_cutoff = 0.9
+        self.raga_lookup_max_matches = 3
+
+        # optional MMR diversity selection before re-ranking: per tool, MMR keeps factor x top_k of twice as many
+        # retrieved candidates (by their stored vectors) so the CrossEncoder still makes the final cut, and lambda
+        # weighs relevance against diversity (1.0 = relevance only); multi_search applies its setting to each category
+        self.mmr_search = False
+        self.mmr_settings = {"knowledge_tool":{"lambda":0.7,"factor":2},
+        "raga_index_tool":{"lambda":0.8,"factor":2},
+        "krithi_tool":{"lambda":0.7,"factor":2},
+        "multi_search":{"lambda":0.5,"factor":2}}
+
+        # vector index type built for serving (flat, hnsw, ivf, ivfpq or sq8, see ann_index.py) and its query-time settings
+        self.index_spec = {"type":"flat","nlist":1024,"pq_m":16,"hnsw_m":32,"train_sample_size":50000}
+        self.index_search_params = {"nprobe":16,"efSearch":64}
+
+        # tool routing: tools whose prototype similarity reaches the threshold and is within the margin of the best are used,
+        # multi_search replaces more than router_max_tools of them (raga_index_tool stays, for its raga table lookup);
+        # below the threshold the keyword rules decide
+        self.router_threshold = 0.35
+        self.router_margin = 0.08
+        self.router_max_tools = 1
+
+        # retrieved chunks sent to the LLM are de-duplicated, ranked by re-ranking score and cut to this many tokens.
+        # Tokens are counted with context_tokenizer (a Hugging Face tokenizer matching the LLM, e.g. a Llama 3 one;
+        # the meta-llama repos are gated and need HF_TOKEN) or, without one, estimated as four characters per token
+        # plus context_token_margin so the estimate errs on the safe side
+        self.context_token_budget = 3000
+        self.context_chunk_chars = 800
+        self.context_tokenizer = None
+        self.context_token_margin = 0.25
+
+        # conversation memory: "bounded" keeps the last memory_max_turns turns (and at most memory_max_bytes of text)
+        # verbatim, rolls older turns into a running summary in the background and logs React Agent details to
+        # react_log_file under src/data (rotated at react_log_max_bytes, emptied at startup); "buffer" keeps everything
+        # in session memory
+        self.memory_mode = "bounded"
+        self.memory_max_turns = 6
+        self.memory_max_bytes = 16000
+        self.memory_summary_max_chars = 1500
+        self.chat_history_max_messages = 100
+        self.react_log_file = "react_details.jsonl"
+        self.react_log_max_bytes = 5000000
+
+        # React Agent mode: "critique_refine" skips refinement when the critique SCORE reaches the threshold,
+        # "self_check" reviews and, if needed, corrects the answer in a single LLM call
+        self.react_mode = "critique_refine"
+        self.react_skip_threshold = 8
+
+        # per-answer traces; set trace_export_file (e.g. "traces.jsonl") to append them under src/data, format "jsonl" or "otel"
+        self.trace_export_file = None
+        self.trace_export_format = "jsonl"
+
         self.meta_data_mapper = {"Literature":"Carnatic Music Theory",
         "Krithis":"Carnatic Krithis",
         "Raga":"Carnatic Raga"}
@@ -63,8 +173,78 @@ class Utils:
     def getReRankingModelName(self):
         return self.re_ranking_model_name
 
+    def getInferenceBackendAttributes(self):
+        return {"embeddings":{"backend":self.embeddings_backend,"file_name":self.backend_model_files.get(self.embeddings_backend)},
+                "re_ranking":{"backend":self.re_ranking_backend,"file_name":self.backend_model_files.get(self.re_ranking_backend)},
+                "model_files":self.backend_model_files}
+
+    def getCategoryStoreName(self, category):
+        return f"car_research_db_{category}"
+
+    def getLLMConnectionAttributes(self):
+        return {"max_connections":self.llm_max_connections,"max_keepalive_connections":self.llm_max_keepalive_connections,
+                "timeout_seconds":self.llm_timeout_seconds,"max_concurrency":self.llm_max_concurrency}
+
+    def getRerankCacheAttributes(self):
+        persist_path = os.path.join(self.file_path, self.rerank_cache_file) if self.rerank_cache_file else None
+        return {"max_entries":self.rerank_cache_size,"persist_path":persist_path}
+
+    def getAnswerCacheAttributes(self):
+        return {"threshold":self.answer_cache_threshold,"ttl_seconds":self.answer_cache_ttl_seconds,
+                "max_entries":self.answer_cache_size,"scope":self.answer_cache_scope}
+
+    def getToolExecutionAttributes(self):
+        return {"max_workers":self.tool_max_workers,"timeout_seconds":self.tool_timeout_seconds}
+
+    def getIngestAttributes(self):
+        return {"max_workers":self.ingest_workers,"pages_per_task":self.ingest_pages_per_task}
+
+    def getIndexBuildAttributes(self):
+        return {"batch_size":self.embed_batch_size,"checkpoint_every_batches":self.checkpoint_every_batches}
+
+    def getDedupAttributes(self):
+        return {"enabled":self.dedup_chunks,"threshold":self.dedup_threshold,"num_perm":self.dedup_num_perm,
+                "bands":self.dedup_bands}
+
+    def getHybridSearchAttributes(self):
+        return {"enabled":self.hybrid_search,"rrf_k":self.rrf_k,"candidates":self.hybrid_candidates}
+
+    def getRagaTableAttributes(self):
+        table_path = os.path.join(self.file_path, self.raga_table_file) if self.raga_table_file else None
+        return {"path":table_path,"fuzzy_cutoff":self.raga_lookup_cutoff,"max_matches":self.raga_lookup_max_matches}
+
+    def getMMRAttributes(self):
+        return {"enabled":self.mmr_search,"tools":self.mmr_settings}
+
+    def getIndexSpec(self):
+        return self.index_spec
+
+    def getIndexSearchParams(self):
+        return self.index_search_params
+
+    def getToolRouterAttributes(self):
+        return {"threshold":self.router_threshold,"margin":self.router_margin,"max_tools":self.router_max_tools}
+
+    def getContextPackerAttributes(self):
+        return {"token_budget":self.context_token_budget,"max_chunk_chars":self.context_chunk_chars,
+                "tokenizer":self.context_tokenizer,"token_margin":self.context_token_margin}
+
+    def getConversationMemoryAttributes(self):
+        react_log_path = os.path.join(self.file_path, self.react_log_file) if self.react_log_file else None
+        return {"mode":self.memory_mode,"max_turns":self.memory_max_turns,"max_bytes":self.memory_max_bytes,
+                "summary_max_chars":self.memory_summary_max_chars,"max_messages":self.chat_history_max_messages,
+                "react_log_path":react_log_path,"react_log_max_bytes":self.react_log_max_bytes}
+
+    def getReactAgentAttributes(self):
+        return {"mode":self.react_mode,"skip_threshold":self.react_skip_threshold}
+
+    def getTraceExportAttributes(self):
+        export_path = os.path.join(self.file_path, self.trace_export_file) if self.trace_export_file else None
+        return {"path":export_path,"format":self.trace_export_format}
+
     def getVectoreStoreAttributes(self):
-        return {"dir_name":self.file_path,"file_name":"car_research_db","meta_data":self.meta_data_mapper}
+        return {"dir_name":self.file_path,"file_name":"car_research_db","meta_data":self.meta_data_mapper,
+                "category_file_names":{category:self.getCategoryStoreName(category) for category in self.meta_data_mapper}}
 
 def loadDocuments(files_path=None):
     util_obj = Utils()
@@ -90,6 +270,82 @@ def getReRankingModelName():
     util_obj = Utils()
     return util_obj.getReRankingModelName()
 
+def getInferenceBackendAttributes():
+    util_obj = Utils()
+    return util_obj.getInferenceBackendAttributes()
+
+def getCategoryStoreName(category):
+    util_obj = Utils()
+    return util_obj.getCategoryStoreName(category)
+
+def getLLMConnectionAttributes():
+    util_obj = Utils()
+    return util_obj.getLLMConnectionAttributes()
+
+def getRerankCacheAttributes():
+    util_obj = Utils()
+    return util_obj.getRerankCacheAttributes()
+
+def getAnswerCacheAttributes():
+    util_obj = Utils()
+    return util_obj.getAnswerCacheAttributes()
+
+def getToolExecutionAttributes():
+    util_obj = Utils()
+    return util_obj.getToolExecutionAttributes()
+
+def getIngestAttributes():
+    util_obj = Utils()
+    return util_obj.getIngestAttributes()
+
+def getIndexBuildAttributes():
+    util_obj = Utils()
+    return util_obj.getIndexBuildAttributes()
+
+def getDedupAttributes():
+    util_obj = Utils()
+    return util_obj.getDedupAttributes()
+
+def getHybridSearchAttributes():
+    util_obj = Utils()
+    return util_obj.getHybridSearchAttributes()
+
+def getRagaTableAttributes():
+    util_obj = Utils()
+    return util_obj.getRagaTableAttributes()
+
+def getMMRAttributes():
+    util_obj = Utils()
+    return util_obj.getMMRAttributes()
+
+def getIndexSpec():
+    util_obj = Utils()
+    return util_obj.getIndexSpec()
+
+def getIndexSearchParams():
+    util_obj = Utils()
+    return util_obj.getIndexSearchParams()
+
+def getToolRouterAttributes():
+    util_obj = Utils()
+    return util_obj.getToolRouterAttributes()
+
+def getContextPackerAttributes():
+    util_obj = Utils()
+    return util_obj.getContextPackerAttributes()
+
+def getConversationMemoryAttributes():
+    util_obj = Utils()
+    return util_obj.getConversationMemoryAttributes()
+
+def getReactAgentAttributes():
+    util_obj = Utils()
+    return util_obj.getReactAgentAttributes()
+
+def getTraceExportAttributes():
+    util_obj = Utils()
+    return util_obj.getTraceExportAttributes()
+
 def getVectoreStoreAttributes():
     util_obj = Utils()
     return util_obj.getVectoreStoreAttributes()
\ No newline at end of file
@@ -2,12 +2,30 @@
 This is the layer that processes input files, creates document chunks, generates embeddings and creates vector store.
 Inputs: Content location
 Output: vector store
+
+Builds are incremental by default: a manifest of file hashes and chunk hashes is kept next to the
+store so only new or changed chunks are embedded, vectors of deleted files are removed and the
+result is merged into the existing indexes. Run with --full to rebuild everything from scratch.
+New chunks that nearly duplicate a chunk already kept in the same category (repeated headers, footers,
+boilerplate pages) are dropped before embedding; --full also re-checks chunks kept by earlier builds.
 """
 
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 import models
 import utils as car_utils
+from ingestion import iter_parsed_files, extract_page_texts
+from chunk_store import has_chunk_store, write_chunk_store
+from sparse_index import has_sparse_index, write_sparse_index
+from ann_index import write_serving_index
+from raga_table import build_raga_table, raga_table_files
+from dedup import NearDuplicateIndex
+import argparse
+import faiss
+import hashlib
+import json
 import os
+import shutil
 import warnings
 # from pypdf.errors import PdfReadWarning
 # warnings.filterwarnings("ignore", category=PdfReadWarning)
@@ -23,47 +41,415 @@ vector_store_attributes = car_utils.getVectoreStoreAttributes()
 vector_store_persist_directory =  vector_store_attributes["dir_name"]
 vector_store_persist_db =  vector_store_attributes["file_name"]
 vector_store_persist_path = os.path.join(vector_store_persist_directory,vector_store_persist_db)
-#print(vector_store_persist_path)
-vector_store_embeddings_model = models.getEmbeddingsModel()
-
-# instantiate text splitter object
-text_splitter_obj = car_utils.getTextSplitter()
+manifest_path = f"{vector_store_persist_path}_manifest.json"
+journal_path = f"{vector_store_persist_path}_journal.jsonl"
 
 # meta_data_mapper = {"Literature":"Carnatic Music Theory",
 #  "Krithis":"Carnatic Krithis",
 #  "Raga":"Carnatic Raga"}
 
 meta_data_mapper = vector_store_attributes["meta_data"]
+category_file_names = vector_store_attributes["category_file_names"]
+
+def file_hash(file_path):
+    """sha1 of the file contents, read in blocks"""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-meta_data_id = list(meta_data_mapper.keys())
-docs_to_load = []
+def chunk_hashes(category, relative_path, chunks):
+    """Content-based ids for a file's chunks; repeated text within the file gets an occurrence suffix"""
+    seen = {}
+    ids = []
+    for chunk in chunks:
+        chunk_hash = hashlib.sha1(f"{category}\n{relative_path}\n{chunk.page_content}".encode("utf-8")).hexdigest()
+        occurrence = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = occurrence + 1
+        ids.append(chunk_hash if occurrence == 0 else f"{chunk_hash}-{occurrence}")
+    return ids
 
-for id, id_name in enumerate(meta_data_id):
+def list_source_files():
+    """(category, relative path, absolute path) for every file under src/data/<category>"""
+    source_files = []
+    for id_name in meta_data_mapper:
+        full_path = os.path.join(base_path, "src", "data", id_name)
+        if not os.path.isdir(full_path):
+            continue
+        for file_name in sorted(os.listdir(full_path)):
+            source_files.append((id_name, os.path.join(id_name, file_name), os.path.join(full_path, file_name)))
+    return source_files
+
+def tag_chunks(id_name, split_doc_to_load):
+    """Tag every chunk of one file with its position and category metadata"""
     topic_name = meta_data_mapper[id_name]
-    full_path = os.path.join(base_path, "src", "data", id_name)
-    #print(full_path)
-    for file_name in os.listdir(full_path):
-        print(f"loading file {file_name}")
-        file_path = os.path.join(full_path, file_name)
-        #print(full_path)
-        
-        try:
-            doc_to_load = car_utils.loadDocuments(file_path)
-            #print(doc_to_load)
-
-            # split docs
-            split_doc_to_load = text_splitter_obj.split_documents(doc_to_load)
-            for page_num, page_content in enumerate(split_doc_to_load):
-
-                page_content.metadata.update({"page_num":page_num,
-                        "category":id_name,
-                        "topic":topic_name}
-                        )
-                docs_to_load.append(page_content)
-        except Exception as e:
-            print("Error", e)
-
-vector_store_db = FAISS.from_documents(docs_to_load, vector_store_embeddings_model)
-vector_store_db.save_local(vector_store_persist_path)
-
-########## Vector store generation complete ####################
\ No newline at end of file
+    for page_num, page_content in enumerate(split_doc_to_load):
+
+        page_content.metadata.update({"page_num":page_num,
+                "category":id_name,
+                "topic":topic_name}
+                )
+    return split_doc_to_load
+
+def load_manifest():
+    if not os.path.exists(manifest_path):
+        return {"files": {}}
+    with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+def save_manifest(manifest):
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def load_store(persist_path, embeddings_model):
+    if not os.path.isdir(persist_path):
+        return None
+    return FAISS.load_local(persist_path, embeddings_model, allow_dangerous_deserialization=True)
+
+def docstore_digest(store):
+    """sha1 of the store's chunk ids in row order, identifying the docstore a journal applies to"""
+    digest = hashlib.sha1()
+    for row in range(len(store.index_to_docstore_id)):
+        digest.update(store.index_to_docstore_id[row].encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+def append_journal(operations, base_digest):
+    """Append docstore changes to the journal, starting it with the digest of the saved docstore it applies to"""
+    with open(journal_path, "a", encoding="utf-8") as journal_file:
+        if journal_file.tell() == 0:
+            journal_file.write(json.dumps({"op": "base", "digest": base_digest}) + "\n")
+        for operation in operations:
+            journal_file.write(json.dumps(operation, ensure_ascii=False) + "\n")
+
+def clear_journal():
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+def replay_journal(store):
+    """
+    Apply the docstore changes checkpointed since the pickled docstore was saved; the FAISS index
+    already has them. Returns False when the store does not match its index, e.g. after a torn checkpoint.
+    """
+    if os.path.exists(journal_path):
+        with open(journal_path, "r", encoding="utf-8") as journal_file:
+            operations = [json.loads(line) for line in journal_file if line.strip()]
+        if operations and operations[0]["digest"] == docstore_digest(store):
+            for operation in operations[1:]:
+                if operation["op"] == "add":
+                    for chunk_id, text, metadata in operation["chunks"]:
+                        store.docstore.add({chunk_id: Document(page_content=text, metadata=metadata)})
+                        store.index_to_docstore_id[len(store.index_to_docstore_id)] = chunk_id
+                elif operation["op"] == "delete":
+                    # same row compaction as FAISS.delete
+                    deleted_ids = set(operation["ids"])
+                    store.docstore.delete(operation["ids"])
+                    remaining_ids = [chunk_id for row, chunk_id in sorted(store.index_to_docstore_id.items()) if chunk_id not in deleted_ids]
+                    store.index_to_docstore_id = dict(enumerate(remaining_ids))
+                elif operation["op"] == "metadata":
+                    store.docstore.search(operation["id"]).metadata.update(operation["metadata"])
+        else:
+            # left behind by a build whose final save completed
+            clear_journal()
+    return len(store.index_to_docstore_id) == store.index.ntotal
+
+def write_index(store, persist_path):
+    """Replace the FAISS index file of a saved store"""
+    tmp_path = os.path.join(persist_path, "index.faiss.tmp")
+    faiss.write_index(store.index, tmp_path)
+    os.replace(tmp_path, os.path.join(persist_path, "index.faiss"))
+
+def save_store(store, persist_path):
+    """Save the exact FAISS index and pickled docstore used by incremental builds, plus what the tools read"""
+    store.save_local(persist_path)
+    write_chunk_store(persist_path, store)
+    # BM25 keyword index over the same rows for hybrid retrieval
+    write_sparse_index(persist_path, store)
+    # approximate serving index (HNSW / IVF / PQ / SQ8) trained from the exact vectors when configured
+    write_serving_index(persist_path, store.index, car_utils.getIndexSpec())
+
+def serving_files_exist(persist_path):
+    """Whether the chunk store and BM25 index the tools read have been written for a store"""
+    return has_chunk_store(persist_path) and has_sparse_index(persist_path)
+
+def rebuild_category_store(shared_store, id_name, embeddings_model):
+    """Category index built from the vectors already in the shared store"""
+    category_rows = [chunk_id for chunk_id, doc in shared_store.docstore._dict.items() if doc.metadata.get("category") == id_name]
+    if not category_rows:
+        return None
+    row_of_id = {chunk_id: row for row, chunk_id in shared_store.index_to_docstore_id.items()}
+    rebuilt = [(shared_store.docstore.search(chunk_id), shared_store.index.reconstruct(row_of_id[chunk_id])) for chunk_id in category_rows]
+    return FAISS.from_embeddings([(doc.page_content, vector) for doc, vector in rebuilt],
+                                 embeddings_model,
+                                 metadatas=[doc.metadata for doc, vector in rebuilt],
+                                 ids=category_rows)
+
+class StreamingIndexBuilder:
+    """
+    Embeds chunks in fixed-size batches and adds every batch to the shared store as it goes, so only one
+    batch of chunks waits for embedding; the store itself still holds every vector and document.
+    Checkpoints write the FAISS index and append the docstore changes made since the previous checkpoint
+    to a journal. The pickled docstore, chunk store, BM25 index, serving index and the per-category
+    stores (built one at a time from the shared vectors) are only written by finalize.
+    Chunks whose ids are already in the store are skipped, which is what lets an interrupted
+    build resume from its last checkpoint.
+    """
+
+    def __init__(self, embeddings_model, shared_store, batch_size=256):
+        self.embeddings_model = embeddings_model
+        self.shared_store = shared_store
+        self.batch_size = batch_size
+        self.buffer = []
+        # docstore changes since the last checkpoint, in journal form
+        self.operations = []
+        # a loaded store matches its saved docstore plus the journal; a new store is saved in full first
+        self.base_digest = None
+        if shared_store is not None and not os.path.exists(journal_path):
+            self.base_digest = docstore_digest(shared_store)
+        self.base_saved = shared_store is not None
+        self.batches_done = 0
+        self.batches_since_checkpoint = 0
+        self.chunks_added = 0
+        self.chunks_skipped = 0
+        self.chunks_removed = 0
+
+    def _contains(self, chunk_id):
+        return self.shared_store is not None and chunk_id in self.shared_store.docstore._dict
+
+    def delete(self, id_name, chunk_ids):
+        """Remove vectors from the shared store, ignoring ids already gone"""
+        present_ids = [chunk_id for chunk_id in chunk_ids if self._contains(chunk_id)]
+        if not present_ids:
+            return
+        self.shared_store.delete(present_ids)
+        self.operations.append({"op": "delete", "ids": present_ids})
+        self.chunks_removed += len(present_ids)
+
+    def update_metadata(self, id_name, chunk_id, metadata):
+        """Refresh metadata of a retained chunk; page_num can shift when earlier chunks of the file change"""
+        if self._contains(chunk_id):
+            self.shared_store.docstore.search(chunk_id).metadata.update(metadata)
+            self.operations.append({"op": "metadata", "id": chunk_id, "metadata": metadata})
+
+    def add(self, id_name, chunk, chunk_id):
+        """Queue a chunk for embedding, flushing a batch when the buffer is full"""
+        if self._contains(chunk_id):
+            self.chunks_skipped += 1
+            return
+        self.buffer.append((id_name, chunk, chunk_id))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Embed the buffered chunks in one call and add them to the shared store"""
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        embeddings = self.embeddings_model.embed_documents([chunk.page_content for id_name, chunk, chunk_id in batch])
+
+        text_embeddings = [(chunk.page_content, embedding) for (id_name, chunk, chunk_id), embedding in zip(batch, embeddings)]
+        metadatas = [chunk.metadata for id_name, chunk, chunk_id in batch]
+        ids = [chunk_id for id_name, chunk, chunk_id in batch]
+        if self.shared_store is None:
+            self.shared_store = FAISS.from_embeddings(text_embeddings, self.embeddings_model, metadatas=metadatas, ids=ids)
+        else:
+            self.shared_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        self.operations.append({"op": "add", "chunks": [[chunk_id, chunk.page_content, chunk.metadata] for id_name, chunk, chunk_id in batch]})
+
+        self.batches_done += 1
+        self.batches_since_checkpoint += 1
+        self.chunks_added += len(batch)
+        print(f"Embedded batch {self.batches_done} ({self.chunks_added} chunks added so far)")
+
+    def checkpoint(self):
+        """Flush pending chunks and save what a resumed build needs: the FAISS index and the docstore journal"""
+        self.flush()
+        if self.shared_store is None:
+            return
+        if not self.base_saved:
+            # first checkpoint of a new store: the pickled docstore is the base later journals apply to
+            clear_journal()
+            self.shared_store.save_local(vector_store_persist_path)
+            self.base_digest = docstore_digest(self.shared_store)
+            self.base_saved = True
+        else:
+            append_journal(self.operations, self.base_digest)
+            write_index(self.shared_store, vector_store_persist_path)
+        self.operations = []
+        self.batches_since_checkpoint = 0
+
+    def finalize(self):
+        """Flush pending chunks and write every store with the files the tools read"""
+        self.flush()
+        if self.shared_store is None:
+            return
+        save_store(self.shared_store, vector_store_persist_path)
+        clear_journal()
+        self.operations = []
+        self.batches_since_checkpoint = 0
+        # one physical index per category so the tools can search without post-filtering;
+        # each is built from the shared vectors, saved and released before the next one
+        for id_name in meta_data_mapper:
+            category_path = os.path.join(vector_store_persist_directory, category_file_names[id_name])
+            category_store = rebuild_category_store(self.shared_store, id_name, self.embeddings_model)
+            if category_store is not None:
+                save_store(category_store, category_path)
+            elif os.path.isdir(category_path):
+                # every chunk of the category was removed; its old index and chunk store would keep serving them
+                print(f"removing category store {category_path}")
+                shutil.rmtree(category_path)
+            del category_store
+
+def build_vector_store(full_rebuild=False):
+    """Build or incrementally update the shared and per-category vector stores"""
+    vector_store_embeddings_model = models.getEmbeddingsModel()
+    build_attributes = car_utils.getIndexBuildAttributes()
+
+    manifest = {"files": {}} if full_rebuild else load_manifest()
+    shared_store = None if full_rebuild else load_store(vector_store_persist_path, vector_store_embeddings_model)
+    if shared_store is not None and not replay_journal(shared_store):
+        print("Vector store does not match its checkpoint journal, rebuilding from scratch")
+        shared_store = None
+        manifest = {"files": {}}
+    if shared_store is None and manifest["files"]:
+        # the manifest describes a store that no longer exists
+        print("Existing vector store not found, rebuilding from scratch")
+        manifest = {"files": {}}
+    elif shared_store is not None and not manifest["files"]:
+        # a store built before manifests existed has no chunk ids to merge against
+        print("No build manifest found, rebuilding from scratch")
+        shared_store = None
+    old_files = manifest["files"]
+
+    builder = StreamingIndexBuilder(vector_store_embeddings_model, shared_store,
+                                    batch_size=build_attributes["batch_size"])
+
+    # unchanged files keep their vectors; the rest is streamed through the builder
+    current_files = {}
+    changed_files = []
+    for id_name, relative_path, file_path in list_source_files():
+        current_hash = file_hash(file_path)
+        old_entry = old_files.get(relative_path)
+        if old_entry is not None and old_entry["file_hash"] == current_hash:
+            current_files[relative_path] = old_entry
+            continue
+        print(f"loading file {os.path.basename(file_path)}")
+        changed_files.append((id_name, relative_path, current_hash, file_path))
+        if old_entry is not None:
+            # until the file is re-processed its old vectors stay in the store and in checkpoints
+            current_files[relative_path] = old_entry
+
+    # files that disappeared since the last build
+    for relative_path, old_entry in old_files.items():
+        if relative_path not in current_files:
+            print(f"removing file {relative_path}")
+            builder.delete(old_entry["category"], old_entry["chunk_ids"])
+
+    if not changed_files and builder.chunks_removed == 0 and shared_store is not None:
+        print("Vector store is up to date")
+        # an interrupted build's final save, or stores saved before the chunk store or BM25 index existed, still need writing
+        categories = {entry["category"] for entry in current_files.values()}
+        if os.path.exists(journal_path) or not serving_files_exist(vector_store_persist_path) or any(
+                not serving_files_exist(os.path.join(vector_store_persist_directory, category_file_names[id_name]))
+                for id_name in categories):
+            builder.finalize()
+        return shared_store
+
+    # one index per category, so a chunk dropped as a duplicate is still found in its own category's store
+    duplicate_indexes = {}
+    chunks_deduplicated = 0
+    dedup_attributes = car_utils.getDedupAttributes()
+
+    def category_duplicate_index(category):
+        if not dedup_attributes["enabled"]:
+            return None
+        if category not in duplicate_indexes:
+            duplicate_indexes[category] = NearDuplicateIndex(dedup_attributes["threshold"], dedup_attributes["num_perm"],
+                                                             dedup_attributes["bands"])
+        return duplicate_indexes[category]
+
+    if dedup_attributes["enabled"]:
+        # chunks of unchanged files stay in the store, so new chunks are compared against them too
+        changed_paths = {relative_path for id_name, relative_path, current_hash, file_path in changed_files}
+        for relative_path, entry in current_files.items():
+            if relative_path in changed_paths:
+                continue
+            for chunk_id in entry["chunk_ids"]:
+                if builder._contains(chunk_id):
+                    category_duplicate_index(entry["category"]).add(chunk_id, builder.shared_store.docstore.search(chunk_id).page_content)
+
+    # parse and split the changed files in worker processes; results come back in file order
+    for (id_name, relative_path, current_hash, file_path), chunks, error in iter_parsed_files(changed_files):
+        old_entry = old_files.get(relative_path)
+        if error is not None:
+            # keep the previous vectors of a file that can no longer be read
+            print("Error", error)
+            continue
+
+        chunks = tag_chunks(id_name, chunks)
+        ids = chunk_hashes(id_name, relative_path, chunks)
+        old_ids = set(old_entry["chunk_ids"]) if old_entry is not None else set()
+        builder.delete(id_name, sorted(old_ids - set(ids)))
+        kept_ids = []
+        duplicate_index = category_duplicate_index(id_name)
+        for chunk, chunk_id in zip(chunks, ids):
+            if chunk_id in old_ids:
+                builder.update_metadata(id_name, chunk_id, chunk.metadata)
+                if duplicate_index is not None:
+                    duplicate_index.add(chunk_id, chunk.page_content)
+            elif (duplicate_index is not None and not builder._contains(chunk_id)
+                  and duplicate_index.check_and_add(chunk_id, chunk.page_content) is not None):
+                # chunks already embedded by an interrupted build are kept, they are in the store
+                chunks_deduplicated += 1
+                continue
+            else:
+                builder.add(id_name, chunk, chunk_id)
+            kept_ids.append(chunk_id)
+        # dropped duplicates are left out of the manifest, so they are checked again when the file changes
+        current_files[relative_path] = {"category": id_name, "file_hash": current_hash, "chunk_ids": kept_ids}
+
+        # checkpoints are taken at file boundaries so the manifest always matches the saved stores
+        if builder.batches_since_checkpoint >= build_attributes["checkpoint_every_batches"]:
+            builder.checkpoint()
+            manifest["files"] = current_files
+            save_manifest(manifest)
+            print(f"Checkpoint saved after {relative_path}")
+
+    builder.finalize()
+    if builder.shared_store is None:
+        print("No documents found, nothing to save")
+        return None
+    manifest["files"] = current_files
+    save_manifest(manifest)
+    print(f"Added {builder.chunks_added} chunks, skipped {builder.chunks_skipped} already indexed, removed {builder.chunks_removed}, "
+          f"dropped {chunks_deduplicated} near-duplicates")
+    return builder.shared_store
+
+def build_lookup_tables():
+    """Rebuild the raga lookup table when the Raga PDFs changed since it was built (or it does not exist)"""
+    table_path = car_utils.getRagaTableAttributes()["path"]
+    if not table_path:
+        return
+    raga_files = [(relative_path, file_path) for id_name, relative_path, file_path in list_source_files()
+                  if id_name == "Raga" and file_path.lower().endswith(".pdf")]
+    current_files = {relative_path: file_hash(file_path) for relative_path, file_path in raga_files}
+    if not current_files or current_files == raga_table_files(table_path):
+        return
+    print("Building raga lookup table")
+    raga_count = build_raga_table(((relative_path, extract_page_texts(file_path)) for relative_path, file_path in raga_files),
+                                  table_path, current_files)
+    print(f"Raga lookup table saved with {raga_count} ragas")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Carnatic music vector store")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and rebuild every index from scratch")
+    args = parser.parse_args()
+    build_vector_store(full_rebuild=args.full)
+    build_lookup_tables()
+
+if __name__ == "__main__":
+    main()
+
+########## Vector store generation complete ####################
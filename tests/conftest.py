@@ -0,0 +1,11 @@
+"""
+The app modules live flat in src/ and are imported by name; Utils lists src/data relative to the
+working directory, so tests run from the repo root like the app does.
+"""
+
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+os.chdir(REPO_ROOT)
@@ -0,0 +1,51 @@
+import faiss
+import numpy as np
+import pytest
+
+from ann_index import SERVING_INDEX_FILE, apply_search_params, build_index, factory_string, write_serving_index
+
+def random_vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+def test_factory_string():
+    assert factory_string({"type": "flat"}, 10) == "Flat"
+    assert factory_string({"type": "hnsw", "hnsw_m": 16}, 10) == "HNSW16,Flat"
+    assert factory_string({"type": "sq8"}, 10) == "SQ8"
+    # nlist is capped at 39 training points per list
+    assert factory_string({"type": "ivf", "nlist": 1024}, 3900) == "IVF100,Flat"
+    assert factory_string({"type": "ivf"}, 10) == "IVF1,Flat"
+    assert factory_string({"type": "ivfpq", "nlist": 4, "pq_m": 8}, 64) == "IVF1,PQ8x6"
+    with pytest.raises(ValueError):
+        factory_string({"type": "lsh"}, 10)
+
+@pytest.mark.parametrize("spec", [{"type": "flat"}, {"type": "hnsw", "hnsw_m": 8}, {"type": "ivf", "nlist": 4}, {"type": "sq8"}])
+def test_build_index_keeps_row_order(spec):
+    vectors = random_vectors(400)
+    index = build_index(vectors, spec)
+    apply_search_params(index, {"nprobe": 4, "efSearch": 64})
+
+    assert index.ntotal == 400
+    distances, rows = index.search(vectors[[7, 123, 399]], 1)
+    assert rows[:, 0].tolist() == [7, 123, 399]
+
+def test_apply_search_params_sets_known_and_ignores_unknown_parameters():
+    ivf_index = build_index(random_vectors(400), {"type": "ivf", "nlist": 8})
+    apply_search_params(ivf_index, {"nprobe": 5, "efSearch": 32, "unused": None})
+    assert faiss.extract_index_ivf(ivf_index).nprobe == 5
+
+    hnsw_index = build_index(random_vectors(50), {"type": "hnsw", "hnsw_m": 8})
+    apply_search_params(hnsw_index, {"efSearch": 48, "nprobe": 3})
+    assert faiss.downcast_index(hnsw_index).hnsw.efSearch == 48
+
+def test_write_serving_index(tmp_path):
+    flat_index = faiss.IndexFlatL2(16)
+    flat_index.add(random_vectors(200))
+    serving_path = tmp_path / SERVING_INDEX_FILE
+
+    serving_index = write_serving_index(str(tmp_path), flat_index, {"type": "ivf", "nlist": 4})
+    assert serving_index.ntotal == 200
+    assert faiss.read_index(str(serving_path)).ntotal == 200
+
+    # switching back to flat removes the stale serving index
+    assert write_serving_index(str(tmp_path), flat_index, {"type": "flat"}) is None
+    assert not serving_path.exists()
@@ -0,0 +1,94 @@
+import pytest
+
+import answer_cache
+from answer_cache import SemanticAnswerCache, cache_namespace, is_cacheable
+from semantic_layer import ConversationManager
+
+class FakeConversation:
+    def __init__(self, context=False, session_id="abc"):
+        self.context = context
+        self.session_id = session_id
+
+    def has_context(self):
+        return self.context
+
+def add(cache, question, embedding, namespace="react"):
+    cache.add(question, embedding, f"answer to {question}", ["knowledge_tool"], namespace=namespace)
+
+def test_lookup_returns_similar_question_in_same_namespace():
+    cache = SemanticAnswerCache(threshold=0.95)
+    add(cache, "what is mohanam", [1.0, 0.0, 0.0])
+
+    entry = cache.lookup([0.99, 0.01, 0.0], namespace="react")
+    assert entry["answer"] == "answer to what is mohanam"
+    assert entry["tools_used"] == ["knowledge_tool"]
+    assert entry["similarity"] == pytest.approx(1.0, abs=1e-3)
+    assert cache.lookup([0.0, 1.0, 0.0], namespace="react") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+def test_lookup_skips_other_namespaces():
+    cache = SemanticAnswerCache()
+    add(cache, "q", [1.0, 0.0], namespace="react:session-a")
+    add(cache, "q", [1.0, 0.0], namespace="react:session-b")
+
+    assert cache.lookup([1.0, 0.0], namespace="react:session-b")["namespace"] == "react:session-b"
+    assert cache.lookup([1.0, 0.0], namespace="react:session-c") is None
+
+def test_expired_entries_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    add(cache, "q", [1.0, 0.0])
+
+    now[0] += 59
+    assert cache.lookup([1.0, 0.0], namespace="react") is not None
+    now[0] += 2
+    assert cache.lookup([1.0, 0.0], namespace="react") is None
+    assert len(cache.entries) == 0
+    assert cache.index.ntotal == 0
+
+def test_least_recently_used_entry_is_evicted_when_full():
+    cache = SemanticAnswerCache(max_entries=2)
+    add(cache, "first", [1.0, 0.0, 0.0])
+    add(cache, "second", [0.0, 1.0, 0.0])
+    # a hit makes "first" the most recently used entry
+    assert cache.lookup([1.0, 0.0, 0.0], namespace="react") is not None
+    add(cache, "third", [0.0, 0.0, 1.0])
+
+    questions = [entry["question"] for entry in cache.entries.values()]
+    assert questions == ["first", "third"]
+    assert cache.index.ntotal == 2
+    assert cache.lookup([0.0, 1.0, 0.0], namespace="react") is None
+
+def test_clear_empties_the_cache():
+    cache = SemanticAnswerCache()
+    add(cache, "q", [1.0, 0.0])
+    cache.clear()
+    assert cache.lookup([1.0, 0.0], namespace="react") is None
+    assert cache.stats()["entries"] == 0
+
+def test_cache_namespace(monkeypatch):
+    assert cache_namespace("react") == "react"
+    assert cache_namespace("react", FakeConversation(context=True)) is None
+    assert cache_namespace("react", FakeConversation(session_id="abc")) == "react:abc"
+
+    monkeypatch.setattr(answer_cache.car_utils, "getAnswerCacheAttributes", lambda: {"scope": "shared"})
+    assert cache_namespace("react", FakeConversation(session_id="abc")) == "react"
+    assert cache_namespace("react", FakeConversation(context=True)) is None
+
+def test_conversations_have_their_own_namespace(monkeypatch):
+    monkeypatch.setattr(answer_cache.car_utils, "getAnswerCacheAttributes", lambda: {"scope": "session"})
+    first, second = ConversationManager(mode="buffer"), ConversationManager(mode="buffer")
+    assert cache_namespace("react", first) != cache_namespace("react", second)
+
+    # a follow-up depends on the earlier turns, so it is neither looked up nor cached
+    first.save_to_memory("What is Mohanam?", "A pentatonic raga.")
+    assert first.has_context()
+    assert cache_namespace("react", first) is None
+
+def test_is_cacheable():
+    assert is_cacheable("Mohanam is a pentatonic raga.", ["Results from knowledge_tool:\n..."])
+    assert not is_cacheable("answer", ["Results from knowledge_tool:\n...", "Error with raga_index_tool: timeout"])
+    assert not is_cacheable("draft\n\n(Refinement failed: rate limit)", [])
+    assert not is_cacheable("answer", [], {"critique": "Critique failed: rate limit"})
+    assert is_cacheable("answer", [], {"critique": "SCORE: 9/10"})
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from backend_report import parity, spearman
+
+def test_spearman():
+    assert spearman([0.1, 0.5, 0.9], [1.0, 2.0, 3.0]) == pytest.approx(1.0)
+    assert spearman([0.9, 0.5, 0.1], [1.0, 2.0, 3.0]) == pytest.approx(-1.0)
+    # only the order matters, not the scale of the scores
+    assert spearman([-3.2, 7.5, 1.1, 0.4], [0.01, 0.99, 0.6, 0.2]) == pytest.approx(1.0)
+    assert spearman([0.3], [0.7]) == 1.0
+
+def test_parity():
+    reference_vectors = np.array([[1.0, 0.0], [0.0, 2.0]], dtype=np.float32)
+    query_vectors = np.array([[0.6, 0.8], [0.0, 1.0]], dtype=np.float32)
+    reference_scores = [np.array([3.0, 1.0, 2.0]), np.array([0.5, 1.5])]
+    scores = [np.array([2.5, 1.0, 2.0]), np.array([1.5, 0.5])]
+
+    report = parity(query_vectors, scores, reference_vectors, reference_scores)
+    assert report["embedding_cosine_min"] == pytest.approx(0.6)
+    assert report["embedding_cosine_mean"] == pytest.approx(0.8)
+    assert report["rerank_score_diff_max"] == pytest.approx(1.0)
+    assert report["rerank_score_diff_mean"] == pytest.approx(2.5 / 5)
+    assert report["rerank_spearman_mean"] == pytest.approx(0.0)
+    assert report["rerank_top1_agreement"] == pytest.approx(0.5)
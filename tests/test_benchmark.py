@@ -0,0 +1,79 @@
+import pytest
+from langchain_core.documents import Document
+
+import benchmark
+from benchmark import BENCHMARK_TOOLS, STAGES, load_golden_set, recall_at_k, reciprocal_rank, run_tool_once, summarize
+from reranker import chunk_id
+
+DOCS = [
+    Document(page_content="Thodi is the eighth melakarta"),
+    Document(page_content="Mohanam is an audava raga"),
+    Document(page_content="Kalyani uses the prati madhyamam"),
+]
+
+def test_recall_and_reciprocal_rank_by_terms():
+    item = {"relevant_terms": ["mohanam", "Kalyani"]}
+    assert recall_at_k(DOCS, item, 2) == 0.5
+    assert recall_at_k(DOCS, item, 3) == 1.0
+    assert reciprocal_rank(DOCS, item) == 0.5
+    assert reciprocal_rank(DOCS, {"relevant_terms": ["begada"]}) == 0.0
+    assert recall_at_k(DOCS, {}, 3) == 0.0
+
+def test_alternative_spellings_count_once():
+    item = {"relevant_terms": [["thodi", "todi"], ["melakarta", "mela"], "shadjam"]}
+    # "melakarta" also contains "mela", but the group is found once
+    assert recall_at_k(DOCS, item, 1) == pytest.approx(2 / 3)
+    assert reciprocal_rank(DOCS, {"relevant_terms": [["todi", "kalyani"]]}) == pytest.approx(1 / 3)
+
+def test_recall_by_chunk_ids():
+    item = {"relevant_chunk_ids": [chunk_id(DOCS[2]), "unknown"]}
+    assert recall_at_k(DOCS, item, 2) == 0.0
+    assert recall_at_k(DOCS, item, 3) == 0.5
+    assert reciprocal_rank(DOCS, item) == pytest.approx(1 / 3)
+
+def test_summarize():
+    summary = summarize([float(value) for value in range(1, 101)])
+    assert summary["count"] == 100
+    assert summary["p50"] == 50.5
+    assert summary["p99"] == pytest.approx(99.01)
+    assert summarize([]) == {}
+
+def test_golden_set_is_labelled():
+    golden_set = load_golden_set()
+    assert golden_set
+    for item in golden_set:
+        assert item["question"]
+        assert item.get("relevant_terms") or item.get("relevant_chunk_ids")
+        assert set(item.get("tools", BENCHMARK_TOOLS)) <= set(BENCHMARK_TOOLS)
+
+class NoQueryContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class FixedScorer:
+    def predict(self, pairs):
+        return [float(len(passage)) for query, passage in pairs]
+
+def test_run_tool_once_scores_lookup_rows(monkeypatch):
+    lookup = "Raga: Thodi\nMelakarta raga number 8"
+    searched = []
+    monkeypatch.setattr(benchmark.models, "getReRankingModel", FixedScorer)
+    monkeypatch.setattr(benchmark, "collect_candidates",
+                        lambda tool_name, question, categories, k_each: searched.append(tool_name) or [(tool_name, question, DOCS, 2)])
+
+    # the raga table answers the question, so nothing is searched
+    monkeypatch.setattr(benchmark, "exact_lookup", lambda tool_name, question: (lookup, True))
+    timings, docs = run_tool_once("raga_index_tool", "what is thodi", NoQueryContext(), use_score_cache=False)
+    assert set(timings) == set(STAGES) and timings["search"] == 0.0
+    assert [doc.page_content for doc in docs] == [lookup]
+    assert searched == []
+
+    # rows shown next to the retrieved documents lead them
+    monkeypatch.setattr(benchmark, "exact_lookup", lambda tool_name, question: (lookup, False))
+    timings, docs = run_tool_once("raga_index_tool", "kritis in thodi", NoQueryContext(), use_score_cache=False)
+    assert [doc.page_content for doc in docs] == [lookup, DOCS[2].page_content, DOCS[0].page_content]
+    assert searched == ["raga_index_tool"]
+    assert recall_at_k(docs, {"relevant_terms": ["melakarta raga number 8"]}, 1) == 1.0
@@ -0,0 +1,101 @@
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from ann_index import write_serving_index
+from chunk_store import INDEX_FILE, MappedVectorStore, has_chunk_store, write_chunk_store
+
+TEXTS = ["Mohanam is a pentatonic raga", "Kalyani is the 65th melakarta", "Thodi starts from ṣaḍja"]  # non-ASCII text checks the byte offsets
+CATEGORIES = ["Raga", "Raga", "Literature"]
+
+class FixedEmbeddings:
+    """Embeds a query as the stored vector of the text it equals"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_query(self, text):
+        return self.vectors[TEXTS.index(text)].tolist()
+
+@pytest.fixture
+def store_dir(tmp_path):
+    vectors = np.eye(3, 8, dtype=np.float32)
+    vector_store = FAISS(FixedEmbeddings(vectors), faiss.IndexFlatL2(8), InMemoryDocstore(), {})
+    vector_store.add_embeddings(list(zip(TEXTS, vectors.tolist())),
+                                metadatas=[{"category": category} for category in CATEGORIES],
+                                ids=["a", "b", "c"])
+    faiss.write_index(vector_store.index, str(tmp_path / INDEX_FILE))
+    write_chunk_store(str(tmp_path), vector_store)
+    return tmp_path, vectors
+
+def test_round_trip_in_row_order(store_dir):
+    path, vectors = store_dir
+    assert has_chunk_store(str(path))
+    store = MappedVectorStore(str(path), FixedEmbeddings(vectors))
+    try:
+        assert len(store) == 3
+        for row, text in enumerate(TEXTS):
+            doc = store.get_document(row)
+            assert doc.id == "abc"[row]
+            assert doc.page_content == text
+            assert doc.metadata == {"category": CATEGORIES[row]}
+    finally:
+        store.close()
+
+def test_search_with_filter(store_dir):
+    path, vectors = store_dir
+    store = MappedVectorStore(str(path), FixedEmbeddings(vectors))
+    try:
+        assert [doc.page_content for doc in store.similarity_search(TEXTS[1], k=1)] == [TEXTS[1]]
+        hits = store.similarity_search_with_score_by_vector(vectors[2], k=3, filter={"category": "Raga"})
+        assert [doc.id for doc, distance in hits] == ["a", "b"]
+        assert store.search_rows(vectors[0], k=2, filter={"category": ["Literature"]}) == [(2, pytest.approx(2.0))]
+    finally:
+        store.close()
+
+def test_get_vectors_of_returned_documents(store_dir):
+    path, vectors = store_dir
+    store = MappedVectorStore(str(path), FixedEmbeddings(vectors))
+    try:
+        docs = store.similarity_search_by_vector(vectors[1], k=2)
+        np.testing.assert_allclose(store.get_vectors(docs), vectors[[1, 0]])
+        assert store.get_vectors([Document(id="unknown", page_content="x")]) is None
+    finally:
+        store.close()
+
+def test_get_vectors_from_an_ivf_serving_index(store_dir):
+    path, vectors = store_dir
+    write_serving_index(str(path), faiss.read_index(str(path / INDEX_FILE)), {"type": "ivf", "nlist": 2})
+    store = MappedVectorStore(str(path), FixedEmbeddings(vectors), search_params={"nprobe": 2})
+    try:
+        # three vectors only train one list, but reconstructing from it still needs the direct map
+        assert faiss.extract_index_ivf(store.index).nlist == 1
+        docs = store.similarity_search_by_vector(vectors[2], k=3)
+        np.testing.assert_allclose(store.get_vectors(docs), vectors[[int(TEXTS.index(doc.page_content)) for doc in docs]], rtol=1e-6)
+    finally:
+        store.close()
+
+def test_empty_store(tmp_path):
+    vector_store = FAISS(None, faiss.IndexFlatL2(8), InMemoryDocstore(), {})
+    faiss.write_index(vector_store.index, str(tmp_path / INDEX_FILE))
+    write_chunk_store(str(tmp_path), vector_store)
+    store = MappedVectorStore(str(tmp_path))
+    try:
+        assert len(store) == 0
+        assert store.search_rows(np.zeros(8), k=4) == []
+    finally:
+        store.close()
+
+def test_serving_index_is_preferred(store_dir):
+    path, vectors = store_dir
+    flat_index = faiss.read_index(str(path / INDEX_FILE))
+    write_serving_index(str(path), flat_index, {"type": "hnsw", "hnsw_m": 4})
+    store = MappedVectorStore(str(path), FixedEmbeddings(vectors), search_params={"efSearch": 16})
+    try:
+        assert faiss.downcast_index(store.index).hnsw.efSearch == 16
+        assert [doc.page_content for doc in store.similarity_search(TEXTS[2], k=1)] == [TEXTS[2]]
+    finally:
+        store.close()
@@ -0,0 +1,95 @@
+import math
+
+import pytest
+from langchain_core.documents import Document
+
+import context_packer
+from context_packer import ContextPacker, count_tokens
+from tools import ToolResult
+
+def doc(text, source="Raga/ragas.pdf"):
+    return Document(page_content=text, metadata={"source_file": source, "category": "Raga"})
+
+@pytest.fixture(autouse=True)
+def fresh_packer_state(monkeypatch):
+    # no tokenizer configured, so token counts are the character estimate
+    monkeypatch.setattr(context_packer, "_tokenizer", None)
+    monkeypatch.setattr(context_packer, "_tokenizer_loaded", True)
+    context_packer._recent_packings.clear()
+
+def test_count_tokens_estimate_includes_margin():
+    assert count_tokens("x" * 400, token_margin=0.0) == 100
+    assert count_tokens("x" * 400, token_margin=0.25) == 125
+    assert count_tokens("x" * 10, token_margin=0.25) == math.ceil(2.5 * 1.25)
+    assert count_tokens("", token_margin=0.25) == 1
+
+def test_tokenizer_load_failure_is_not_retried(monkeypatch):
+    import tokenizers
+
+    attempts = []
+    def from_pretrained(name):
+        attempts.append(name)
+        raise OSError("offline")
+
+    monkeypatch.setattr(tokenizers.Tokenizer, "from_pretrained", from_pretrained)
+    monkeypatch.setattr(context_packer, "_tokenizer_loaded", False)
+    monkeypatch.setattr(context_packer.car_utils, "getContextPackerAttributes", lambda: {"tokenizer": "some/tokenizer"})
+    assert count_tokens("x" * 40, token_margin=0.0) == 10
+    assert count_tokens("x" * 40, token_margin=0.0) == 10
+    assert attempts == ["some/tokenizer"]
+
+def test_duplicates_are_merged_and_ordered_by_score():
+    shared = doc("Kalyani is the 65th melakarta.")
+    results = [
+        ToolResult("Results from knowledge_tool:\n...", "knowledge_tool", [doc("Mohanam is audava."), shared], [0.2, 0.5]),
+        ToolResult("Results from raga_index_tool:\n...", "raga_index_tool", [shared, doc("Thodi is the 8th melakarta.")], [0.9, None]),
+    ]
+    packed = ContextPacker(token_budget=1000, max_chunk_chars=500).pack(results)
+
+    entries = packed.split("\n\n")
+    assert len(entries) == 3
+    assert entries[0] == "[1] (Raga | Raga/ragas.pdf | knowledge_tool, raga_index_tool) Kalyani is the 65th melakarta."
+    assert entries[1].startswith("[2] ") and entries[1].endswith("Mohanam is audava.")
+    # unscored chunks follow the scored ones
+    assert entries[2].startswith("[3] ") and entries[2].endswith("Thodi is the 8th melakarta.")
+
+def test_budget_skips_chunks_that_do_not_fit():
+    results = [ToolResult("Results from knowledge_tool:\n...", "knowledge_tool",
+                          [doc("a" * 400), doc("short chunk")], [0.9, 0.1])]
+    packer = ContextPacker(token_budget=40, max_chunk_chars=1000)
+    packed = packer.pack(results)
+    assert packed == "[1] (Raga | Raga/ragas.pdf | knowledge_tool) short chunk"
+    assert packer.count_tokens(packed) <= 40
+
+def test_chunks_are_truncated_to_max_chars():
+    results = [ToolResult("Results from knowledge_tool:\n...", "knowledge_tool", [doc("b" * 300)], [0.5])]
+    packed = ContextPacker(token_budget=1000, max_chunk_chars=50).pack(results)
+    assert packed.endswith(" " + "b" * 50)
+
+def test_errors_and_lookup_rows_are_kept_as_notes():
+    lookup = "Raga: Kalyani\nMelakarta raga number 65"
+    results = [
+        ToolResult("Error with knowledge_tool: timeout", "knowledge_tool", error=TimeoutError()),
+        ToolResult(f"Results from raga_index_tool:\n{lookup}\n\n...", "raga_index_tool", [doc("Kalyani text")], [0.7],
+                   lookup=lookup),
+    ]
+    sections = ContextPacker(token_budget=1000, max_chunk_chars=500).pack(results).split("\n\n")
+    assert sections[0] == "Error with knowledge_tool: timeout"
+    assert sections[1] == f"Results from raga_index_tool:\n{lookup}"
+    assert sections[2].endswith("Kalyani text")
+
+def test_recent_packings_are_reused(monkeypatch):
+    packings = []
+    pack = ContextPacker._pack
+    monkeypatch.setattr(ContextPacker, "_pack", lambda self, tool_results: packings.append(1) or pack(self, tool_results))
+
+    results = [ToolResult("Results from knowledge_tool:\n...", "knowledge_tool", [doc("Kalyani text")], [0.7])]
+    # the answer prompt, the critique and the refinement pack the same results
+    for _ in range(3):
+        assert ContextPacker(token_budget=1000, max_chunk_chars=500).pack(results).endswith("Kalyani text")
+    assert len(packings) == 1
+    ContextPacker(token_budget=500, max_chunk_chars=500).pack(results)
+    assert len(packings) == 2
+
+def test_no_results():
+    assert ContextPacker(token_budget=100, max_chunk_chars=100).pack([]) == "No results."
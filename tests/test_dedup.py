@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from dedup import MinHasher, NearDuplicateIndex, shingles
+
+PASSAGE = ("Kalyani is the sixty fifth melakarta raga of Carnatic music. It is a sampurna raga with the prati "
+           "madhyamam, and many kritis of Tyagaraja and Muthuswami Dikshitar are set in it.")
+
+def test_shingles():
+    assert shingles("The Raga, the raga") == {"the raga the", "raga the raga"}
+    assert shingles("Kalyani raga") == {"kalyani raga"}
+    assert shingles("") == {""}
+
+def test_signature_is_deterministic():
+    assert np.array_equal(MinHasher(32).signature(PASSAGE), MinHasher(32).signature(PASSAGE))
+    assert MinHasher(32).signature(PASSAGE).shape == (32,)
+
+def test_near_duplicate_is_found():
+    duplicate_index = NearDuplicateIndex(threshold=0.8)
+    assert duplicate_index.check_and_add("page-1", PASSAGE) is None
+    # the same passage with different case, spacing and punctuation, as repeated page headers come out
+    assert duplicate_index.check_and_add("page-2", PASSAGE.upper().replace(", ", " ,  ")) == "page-1"
+    assert len(duplicate_index) == 1
+
+def test_distinct_text_is_kept():
+    duplicate_index = NearDuplicateIndex(threshold=0.8)
+    duplicate_index.add("kalyani", PASSAGE)
+    other = ("Thodi is the eighth melakarta raga. Its arohanam and avarohanam use the shuddha rishabham, "
+             "sadharana gandharam and kaisiki nishadam, and it is sung in slow phrases.")
+    assert duplicate_index.check_and_add("thodi", other) is None
+    assert len(duplicate_index) == 2
+
+def test_threshold_separates_partial_overlap():
+    half = PASSAGE[:len(PASSAGE) // 2] + " Mohanam is a pentatonic audava raga of the Harikambhoji family."
+    for threshold, expected in ((0.9, None), (0.2, "a")):
+        duplicate_index = NearDuplicateIndex(threshold=threshold, bands=32)
+        duplicate_index.add("a", PASSAGE)
+        assert duplicate_index.check_and_add("b", half) == expected
+
+def test_bands_must_divide_num_perm():
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(num_perm=64, bands=10)
@@ -0,0 +1,37 @@
+import os
+
+import utils as car_utils
+from ingestion import count_pages, iter_parsed_files, page_ranges
+
+PDF_PATH = os.path.join("src", "data", "Literature", "Carnatic_Music.pdf")
+
+def test_page_ranges():
+    assert page_ranges(10, 4) == [(0, 4), (4, 8), (8, 10)]
+    assert page_ranges(4, 4) == [(0, 4)]
+    assert page_ranges(0, 4) == [(0, 0)]
+    assert page_ranges(None, 4) == [(0, None)]
+
+def test_count_pages():
+    assert count_pages(PDF_PATH) == 30
+    assert count_pages("notes.txt") is None
+
+def test_page_range_tasks_give_the_single_process_chunks():
+    expected = car_utils.getTextSplitter().split_documents(car_utils.loadDocuments(PDF_PATH))
+    results = list(iter_parsed_files([("Literature", PDF_PATH)], max_workers=2, pages_per_task=4))
+
+    assert len(results) == 1
+    source_file, chunks, error = results[0]
+    assert source_file == ("Literature", PDF_PATH) and error is None
+    assert [chunk.page_content for chunk in chunks] == [chunk.page_content for chunk in expected]
+    assert [chunk.metadata for chunk in chunks] == [chunk.metadata for chunk in expected]
+
+def test_unreadable_file_is_reported_in_order(tmp_path):
+    broken_path = str(tmp_path / "broken.pdf")
+    with open(broken_path, "wb") as broken_file:
+        broken_file.write(b"not a pdf")
+    results = list(iter_parsed_files([("a", PDF_PATH), ("b", broken_path), ("c", PDF_PATH)], max_workers=2, pages_per_task=10))
+
+    assert [source_file[0] for source_file, chunks, error in results] == ["a", "b", "c"]
+    assert results[1][1] == [] and results[1][2] is not None
+    assert results[0][2] is None and results[2][2] is None
+    assert [chunk.page_content for chunk in results[0][1]] == [chunk.page_content for chunk in results[2][1]]
@@ -0,0 +1,81 @@
+import asyncio
+import importlib
+import sys
+import threading
+from types import SimpleNamespace
+
+import models
+from models import ResourceRegistry
+
+def test_resources_are_loaded_once_and_shared():
+    registry = ResourceRegistry()
+    loads = []
+    def load_embeddings_model():
+        loads.append("embeddings")
+        return object()
+    registry._load_embeddings_model = load_embeddings_model
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.getEmbeddingsModel())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ["embeddings"]
+    assert all(result is results[0] for result in results)
+
+    registry.clear()
+    registry.getEmbeddingsModel()
+    assert loads == ["embeddings", "embeddings"]
+
+def test_missing_category_store_is_none(tmp_path, monkeypatch):
+    monkeypatch.setattr(models.car_utils, "getVectoreStoreAttributes", lambda: {
+        "dir_name": str(tmp_path), "file_name": "car_research_db",
+        "category_file_names": {"Raga": "car_research_db_Raga"}})
+    registry = ResourceRegistry()
+    registry._load_embeddings_model = lambda: object()
+    assert registry.getVectorStore("Raga") is None
+    # the result is cached like any other resource
+    assert ("vector_store", "Raga") in registry._resources
+
+def test_importing_tools_loads_no_models():
+    models.registry.clear()
+    sys.modules.pop("tools", None)
+    importlib.import_module("tools")
+    assert models.registry._resources == {}
+
+def test_backend_kwargs():
+    assert models.backend_kwargs() == models.backend_kwargs("torch", "onnx/model.onnx") == {}
+    assert models.backend_kwargs("onnx", "onnx/model_quint8_avx2.onnx") == {
+        "backend": "onnx", "model_kwargs": {"file_name": "onnx/model_quint8_avx2.onnx"}}
+    assert models.backend_kwargs("openvino") == {"backend": "openvino"}
+
+def test_unavailable_backend_falls_back_to_torch():
+    calls = []
+    def loader(backend=None, file_name=None):
+        calls.append(backend)
+        if backend == "openvino":
+            raise ImportError("openvino is not installed")
+        return backend or "torch"
+
+    assert models._load_with_backend(loader, {"backend": "openvino", "file_name": "x.xml"}, "embeddings model") == "torch"
+    assert models._load_with_backend(loader, {"backend": "onnx", "file_name": "x.onnx"}, "embeddings model") == "onnx"
+    assert calls == ["openvino", None, "onnx"]
+
+def test_async_llm_client_belongs_to_one_event_loop():
+    registry = ResourceRegistry()
+    registry._load_llm = lambda http_async_client=None: SimpleNamespace(http_async_client=http_async_client)
+
+    async def answer():
+        llm_model = registry.getAsyncLLM()
+        # calls on the same loop share the client
+        assert registry.getAsyncLLM() is llm_model
+        await registry.closeAsyncLLM()
+        return llm_model.http_async_client
+
+    first_client = asyncio.run(answer())
+    second_client = asyncio.run(answer())
+    # each asyncio.run gets a new client, and the client of the closed loop was closed with it
+    assert second_client is not first_client
+    assert first_client.is_closed and second_client.is_closed
+    assert len(registry._async_llms) == 0
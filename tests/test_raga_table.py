@@ -0,0 +1,100 @@
+import pytest
+
+from raga_table import RagaTable, RagaTableBuilder, build_raga_table, load_raga_table, mela_swaras, normalize_name, split_scale
+
+# excerpts of the Raga Pravagam pages, as pypdf extracts them
+PAGES = [
+    "RAGAPRAVAHAM\nAn index to Carnatic ragas",
+    ("ALPHABETICAL INDEX - KARNATAKA RAGAS\nSl.\nNo.\nName of Raga Mela Raga\nNo.\n'A'\n"
+     "1. Aanaka Dhundhubi 14 31. Airavathi 45,64\n2. Aandi Vannam 15 32. Alakavali 28\n"
+     "6. Abheri 22,20 36. Alapa 37,42\n"),
+    ("3. AGNI CHAKRA - GO\n15. MAYA MALAVA GAULA\nS R G M P D N S\nra gu ma dha nu\n"
+     "Name of Raga Arohanam Avarohanam\nSource\nRef.\n"
+     "1. Aandi Vannam S R M P N S S N D P G S AB\n"
+     "2. Aasa Manjari S R G P D S S N P M R S L\n"
+     "(Asamanjari)\n"
+     "6. Ardhrambari S R G M P D N S S N P M R S AE\n"),
+    "HINDUSTHANI RAGAS\nBhairav 15",
+    ("APPENDIX TO RAGAPRVAHAM\nALPHABETICAL LIST\nA\nAeramban 11 Dheera Hindolam 35\n"
+     "Amritha Lahari 47 Durga 28\n"),
+]
+SOURCE = "Raga/raga_pravagam-english-full.pdf"
+
+@pytest.fixture
+def table():
+    builder = RagaTableBuilder()
+    builder.add_pages(PAGES, SOURCE)
+    stored = builder.to_dict()
+    return RagaTable(stored["ragas"], stored["keys"], stored["melas"], stored["sources"])
+
+def test_normalize_name_folds_transliterations():
+    assert normalize_name("Shankarabharanam") == normalize_name("Sankarabaranam")
+    assert normalize_name("Mayamalavagowla") == normalize_name("Maya Malava Gaula")
+    assert normalize_name("Thodi") == normalize_name("Todi")
+    assert normalize_name("Mohanam") == normalize_name("mohana")
+    assert normalize_name("Kalyani") != normalize_name("Kambhoji")
+
+def test_mela_swaras():
+    assert mela_swaras(1) == "S R1 G1 M1 P D1 N1 S"
+    assert mela_swaras(15) == "S R1 G3 M1 P D1 N3 S"
+    assert mela_swaras(29) == "S R2 G3 M1 P D2 N3 S"
+    assert mela_swaras(65) == "S R2 G3 M2 P D2 N3 S"
+    assert mela_swaras(72) == "S R3 G3 M2 P D3 N3 S"
+
+def test_split_scale():
+    assert split_scale("S R G M P S S P M G R S AE".split()) == ("S R G M P S", "S P M G R S")
+    assert split_scale("S R G M P D N S S N D P M G R S R".split()) == ("S R G M P D N S", "S N D P M G R S")
+    assert split_scale("S R G M".split()) is None
+
+def test_builder_parses_index_mela_and_appendix_pages(table):
+    mela = table.ragas[table.melas[15]]
+    assert mela["name"] == "Maya Malava Gaula"
+    assert mela["mela"] == 15
+    assert mela["arohanam"] == mela_swaras(15)
+    assert mela["page"] == 2
+
+    # janya rows take the scale from their melakarta section and keep the melakarta numbers of the index
+    aandi_vannam = table.ragas[table.find("Aandi Vannam")]
+    assert aandi_vannam["melakarta"] == [15]
+    assert (aandi_vannam["arohanam"], aandi_vannam["avarohanam"]) == ("S R M P N S", "S N D P G S")
+    assert table.ragas[table.find("Abheri")]["melakarta"] == [22, 20]
+    assert table.find("Asamanjari") == table.find("Aasa Manjari")
+
+    assert table.ragas[table.find("Dheera Hindolam")]["melakarta"] == [35]
+    # the Hindustani section is not part of the table
+    assert table.find("Bhairav") is None
+
+def test_lookup_question_names_the_subject(table):
+    matches, is_subject = table.lookup_question("What is the arohanam of Mayamalavagowla?")
+    assert [record["name"] for record, matched in matches] == ["Maya Malava Gaula"]
+    assert is_subject
+
+    for question in ("Tell me about mela 15", "Tell me about melakarta number 15", "Tell me about melakartha number 15"):
+        matches, is_subject = table.lookup_question(question)
+        assert [(record["mela"], matched) for record, matched in matches] == [(15, "15")]
+        assert is_subject
+
+def test_lookup_question_with_other_words_is_not_the_subject(table):
+    matches, is_subject = table.lookup_question("Which kritis by Tyagaraja are in Abheri?")
+    assert [record["name"] for record, matched in matches] == ["Abheri"]
+    assert not is_subject
+
+    assert table.lookup_question("What is a varnam?") == ([], False)
+
+def test_lookup_fuzzy_match(table):
+    assert [record["name"] for record, matched in table.lookup("arohanam of Ardhrambhari")] == ["Ardhrambari"]
+
+def test_format(table):
+    text = table.format(table.lookup("Aandi Vannam"))
+    assert "Raga: Aandi Vannam" in text
+    assert "Janya of melakarta: 15 Maya Malava Gaula" in text
+    assert "Arohanam: S R M P N S" in text
+    assert "Source: raga_pravagam-english-full.pdf, page 3" in text
+
+def test_build_and_load(tmp_path):
+    table_path = str(tmp_path / "raga_table.json")
+    count = build_raga_table([(SOURCE, PAGES)], table_path, files={SOURCE: "hash"})
+    table = load_raga_table(table_path)
+    assert len(table) == count
+    assert table.melas[15] == table.find("Mayamalavagowla")
+    assert load_raga_table(str(tmp_path / "missing.json")) is None
@@ -0,0 +1,98 @@
+from langchain_core.documents import Document
+
+from reranker import RerankScheduler, RerankScoreCache, chunk_id, normalize_query, query_hash
+
+class LengthScorer:
+    """Scores a (query, passage) pair by the passage length and records every predict call"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def predict(self, pairs):
+        self.calls.append(list(pairs))
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return [float(len(passage)) for query, passage in pairs]
+
+def doc(text, source="ragas.pdf"):
+    return Document(page_content=text, metadata={"source_file": source})
+
+def test_chunk_id_depends_on_source_and_text():
+    assert chunk_id(doc("Kalyani")) == chunk_id(doc("Kalyani"))
+    assert chunk_id(doc("Kalyani")) != chunk_id(doc("Kalyani", source="other.pdf"))
+    assert chunk_id(doc("Kalyani")) != chunk_id(doc("Thodi"))
+
+def test_all_tools_are_scored_in_one_batch():
+    model = LengthScorer()
+    scheduler = RerankScheduler(model, RerankScoreCache())
+    shared = doc("shared chunk of medium size")
+    scheduler.submit("knowledge_tool", "q", [doc("short"), shared, doc("the longest chunk of them all")], top_k=2)
+    scheduler.submit("raga_index_tool", "q", [shared, doc("tiny")], top_k=1)
+
+    ranked = scheduler.run()
+    assert [d.page_content for d in ranked["knowledge_tool"]] == ["the longest chunk of them all", "shared chunk of medium size"]
+    assert [d.page_content for d in ranked["raga_index_tool"]] == ["shared chunk of medium size"]
+    # one predict call, and the chunk both tools retrieved is scored once
+    assert len(model.calls) == 1
+    assert len(model.calls[0]) == 4
+    assert (scheduler.predict_calls, scheduler.pairs_scored) == (1, 4)
+
+def test_scores_are_reused_within_the_request():
+    model = LengthScorer()
+    scheduler = RerankScheduler(model, RerankScoreCache())
+    docs = [doc("a"), doc("bbb")]
+    scheduler.submit("knowledge_tool", "q", docs, top_k=2)
+    scheduler.run()
+    assert [d.page_content for d in scheduler.rank("q", docs, top_k=1)] == ["bbb"]
+    assert len(model.calls) == 1
+
+def test_failed_batch_keeps_the_retrieval_order():
+    scheduler = RerankScheduler(LengthScorer(fail=True), RerankScoreCache())
+    scheduler.submit("knowledge_tool", "q", [doc("a"), doc("bbb"), doc("cc")], top_k=2)
+    scheduler.submit("krithi_tool", "q", [], top_k=2)
+    scheduler.submit("raga_index_tool", "q", [doc("dddd"), doc("a")], top_k=2)
+    ranked = scheduler.run()
+    assert [d.page_content for d in ranked["knowledge_tool"]] == ["a", "bbb"]
+    assert [d.page_content for d in ranked["raga_index_tool"]] == ["dddd", "a"]
+    assert ranked["krithi_tool"] == []
+    # the failed batch is not retried per key, and later ranking in the request does not predict again
+    assert len(scheduler.re_ranking_model.calls) == 1
+    assert [d.page_content for d in scheduler.rank("q", [doc("a"), doc("bbb")], top_k=1)] == ["a"]
+    assert len(scheduler.re_ranking_model.calls) == 1
+
+def test_normalize_query():
+    assert normalize_query("  What is   Mohanam?? ") == "what is mohanam"
+    assert query_hash("What is Mohanam?") == query_hash("what is mohanam")
+    assert query_hash("What is Mohanam?") != query_hash("What is Kalyani?")
+
+def test_cached_scores_are_reused_by_later_questions():
+    model = LengthScorer()
+    score_cache = RerankScoreCache()
+    docs = [doc("a"), doc("bbb")]
+    RerankScheduler(model, score_cache).rank("What is Mohanam?", docs, top_k=2)
+    ranked = RerankScheduler(model, score_cache).rank("what is mohanam", docs + [doc("cc")], top_k=2)
+
+    assert [d.page_content for d in ranked] == ["bbb", "cc"]
+    # the second question only scores the chunk it has not seen
+    assert [len(pairs) for pairs in model.calls] == [2, 1]
+    assert score_cache.stats()["hits"] == 2
+
+def test_score_cache_is_bounded_lru():
+    score_cache = RerankScoreCache(max_entries=2)
+    score_cache.put("q", "a", 1.0)
+    score_cache.put("q", "b", 2.0)
+    assert score_cache.get("q", "a") == 1.0
+    score_cache.put("q", "c", 3.0)
+    assert score_cache.get("q", "b") is None
+    assert list(score_cache.entries) == ["q:a", "q:c"]
+
+def test_score_cache_persists(tmp_path):
+    persist_path = str(tmp_path / "rerank_score_cache.json")
+    score_cache = RerankScoreCache(max_entries=2, persist_path=persist_path, save_every=2)
+    for doc_id, score in (("a", 1.0), ("b", 2.0), ("c", 3.0)):
+        score_cache.put("q", doc_id, score)
+    score_cache.save()
+
+    reloaded = RerankScoreCache(max_entries=2, persist_path=persist_path)
+    assert list(reloaded.entries.items()) == [("q:b", 2.0), ("q:c", 3.0)]
@@ -0,0 +1,234 @@
+import asyncio
+import os
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+import semantic_layer
+from semantic_layer import ConversationManager, ReactAgent, ainvoke_llm, parse_critique_score, stream_llm, truncate_summary
+from tracing import start_trace
+
+class StreamingLLM:
+    def __init__(self, pieces, fail_after=None):
+        self.pieces = pieces
+        self.fail_after = fail_after
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return AIMessage(content=self.pieces.pop(0))
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+    def stream(self, prompt):
+        self.prompts.append(prompt)
+        for position, piece in enumerate(self.pieces):
+            if position == self.fail_after:
+                raise RuntimeError("connection reset")
+            usage = {"input_tokens": 10, "output_tokens": 3, "total_tokens": 13} if position == len(self.pieces) - 1 else None
+            yield AIMessageChunk(content=piece, usage_metadata=usage)
+
+def drain(generator):
+    """Collect what a generator yields and the value it returns"""
+    yielded = []
+    while True:
+        try:
+            yielded.append(next(generator))
+        except StopIteration as stop:
+            return yielded, stop.value
+
+def test_stream_llm_yields_chunks_and_returns_the_text():
+    with start_trace("answer") as answer_trace:
+        yielded, text = drain(stream_llm(StreamingLLM(["Kalyani ", "", "is the 65th melakarta."]), "prompt", "llm:answer"))
+    assert yielded == ["Kalyani ", "is the 65th melakarta."]
+    assert text == "Kalyani is the 65th melakarta."
+
+    llm_span = answer_trace.spans[1]
+    assert llm_span.name == "llm:answer"
+    assert "first_token_ms" in llm_span.attributes
+    assert llm_span.attributes["prompt_chars"] == len("prompt")
+    assert llm_span.attributes["output_tokens"] == 3
+    assert llm_span.attributes["response_chars"] == len(text)
+
+def test_stream_refine_falls_back_after_streamed_text():
+    agent = ReactAgent(StreamingLLM(["Refined ", "answer"], fail_after=1), mode="critique_refine")
+    yielded, refined = drain(agent.stream_refine_response("q", "initial", "critique", [], ""))
+    assert yielded[0] == "Refined "
+    # the fallback follows the text already on screen
+    assert yielded[1].startswith("\n\nRefinement failed: connection reset")
+    assert refined == "".join(yielded)
+    assert refined.endswith("Using original response: initial")
+
+def test_stream_with_react_returns_the_react_details(monkeypatch):
+    agent = ReactAgent(StreamingLLM(["Better answer"]), mode="critique_refine", skip_threshold=8)
+    monkeypatch.setattr(agent, "critique_response", lambda *args: "SCORE: 5/10")
+    yielded, details = drain(agent.stream_with_react("q", "initial", [], ""))
+    assert yielded == ["Better answer"]
+    assert details == {"original_response": "initial", "critique": "SCORE: 5/10",
+                       "refined_response": "Better answer", "improvement_applied": True,
+                       "mode": "critique_refine", "path": "refined", "score": 5.0, "skip_threshold": 8}
+    assert "SCORE: 5/10" in agent.llm_model.prompts[0]
+
+@pytest.mark.parametrize("critique, score", [
+    ("SCORE: 8/10\nThe answer is accurate.", 8.0),
+    ("**SCORE:** [7]\nMissing the arohanam.", 7.0),
+    ("Accuracy is good.\nScore - 9.5 out of 10", 9.5),
+    ("score:10", 10.0),
+])
+def test_parse_critique_score(critique, score):
+    assert parse_critique_score(critique) == score
+
+@pytest.mark.parametrize("critique", [None, "", "The answer is accurate and complete.", "SCORE: high"])
+def test_parse_critique_score_without_a_number(critique):
+    assert parse_critique_score(critique) is None
+
+def test_high_score_keeps_the_initial_response():
+    llm = StreamingLLM(["SCORE: 9/10\nAccurate."])
+    details = ReactAgent(llm, mode="critique_refine", skip_threshold=8).process_with_react("q", "initial", [], "")
+    assert (details["path"], details["score"], details["refined_response"]) == ("accepted", 9.0, "initial")
+    assert not details["improvement_applied"]
+    # only the critique was requested
+    assert len(llm.prompts) == 1
+
+def test_missing_score_is_refined():
+    llm = StreamingLLM(["The answer misses the arohanam.", "Refined answer"])
+    details = ReactAgent(llm, mode="critique_refine", skip_threshold=8).process_with_react("q", "initial", [], "")
+    assert (details["path"], details["score"], details["refined_response"]) == ("refined", None, "Refined answer")
+    assert details["improvement_applied"]
+
+@pytest.mark.parametrize("verdict, path, final", [
+    ("VERDICT: PASS", "self_check_pass", "initial"),
+    ("**VERDICT: REVISED**\nKalyani is the 65th melakarta.", "self_check_revised", "Kalyani is the 65th melakarta."),
+    ("VERDICT: REVISED", "self_check_pass", "initial"),
+])
+def test_self_check(verdict, path, final):
+    llm = StreamingLLM([verdict])
+    details = ReactAgent(llm, mode="self_check").process_with_react("q", "initial", [], "")
+    assert (details["path"], details["refined_response"], details["skip_threshold"]) == (path, final, None)
+    assert len(llm.prompts) == 1
+
+@pytest.mark.parametrize("mode, responses, path, final", [
+    ("critique_refine", ["SCORE: 9/10"], "accepted", "initial"),
+    ("critique_refine", ["SCORE: 4/10", "Refined answer"], "refined", "Refined answer"),
+    ("self_check", ["VERDICT: REVISED\nRevised answer"], "self_check_revised", "Revised answer"),
+])
+def test_async_react_takes_the_same_paths(mode, responses, path, final):
+    details = asyncio.run(ReactAgent(StreamingLLM(list(responses)), mode=mode, skip_threshold=8)
+                          .aprocess_with_react("q", "initial", [], ""))
+    sync_details = ReactAgent(StreamingLLM(list(responses)), mode=mode, skip_threshold=8).process_with_react("q", "initial", [], "")
+    assert details == sync_details
+    assert (details["path"], details["refined_response"]) == (path, final)
+
+def test_async_llm_calls_are_limited_per_event_loop(monkeypatch):
+    monkeypatch.setattr(semantic_layer.car_utils, "getLLMConnectionAttributes", lambda: {"max_concurrency": 2})
+
+    class SlowLLM:
+        in_flight = 0
+        most_in_flight = 0
+
+        async def ainvoke(self, prompt):
+            SlowLLM.in_flight += 1
+            SlowLLM.most_in_flight = max(SlowLLM.most_in_flight, SlowLLM.in_flight)
+            await asyncio.sleep(0.01)
+            SlowLLM.in_flight -= 1
+            return AIMessage(content=prompt)
+
+    async def answer_all():
+        return await asyncio.gather(*(ainvoke_llm(SlowLLM(), f"prompt {number}", "llm:direct") for number in range(6)))
+
+    for _ in range(2):
+        # each asyncio.run is a new event loop with its own semaphore
+        responses = asyncio.run(answer_all())
+        assert [response.content for response in responses] == [f"prompt {number}" for number in range(6)]
+    assert SlowLLM.most_in_flight == 2
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        ReactAgent(StreamingLLM([]), mode="reflect")
+
+@pytest.fixture
+def memory_attributes(monkeypatch, tmp_path):
+    attributes = {"mode": "bounded", "max_turns": 2, "max_bytes": 10000, "summary_max_chars": 200,
+                  "max_messages": 3, "react_log_path": str(tmp_path / "react_details.jsonl"),
+                  "react_log_max_bytes": None}
+    monkeypatch.setattr(semantic_layer.car_utils, "getConversationMemoryAttributes", lambda: attributes)
+    return attributes
+
+def wait_for_summaries():
+    semantic_layer.getSummaryExecutor().submit(lambda: None).result()
+
+def test_old_turns_are_rolled_into_the_summary(memory_attributes):
+    llm = StreamingLLM(["The user asked about Kalyani and Thodi."])
+    manager = ConversationManager(llm)
+    for turn in range(3):
+        manager.save_to_memory(f"question {turn}", f"answer {turn}")
+    wait_for_summaries()
+
+    assert [msg.content for msg in manager.memory.chat_memory.messages] == ["question 1", "answer 1", "question 2", "answer 2"]
+    assert "User: question 0\nAssistant: answer 0" in llm.prompts[0]
+    context = manager.get_conversation_context()
+    assert context.startswith("Summary of earlier conversation: The user asked about Kalyani and Thodi.")
+    assert manager.get_memory_stats()["summarized_turns"] == 1
+
+def test_byte_cap_keeps_the_latest_turn(memory_attributes):
+    # without an LLM the summary is an extract of the evicted turns
+    manager = ConversationManager(StreamingLLM([]), max_bytes=30)
+    manager.save_to_memory("q" * 20, "a" * 20)
+    manager.save_to_memory("q" * 20, "b" * 20)
+    wait_for_summaries()
+    assert [msg.content for msg in manager.memory.chat_memory.messages] == ["q" * 20, "b" * 20]
+    assert manager.summary.startswith("User asked: " + "q" * 20)
+
+def test_truncate_summary_keeps_whole_sentences():
+    summary = "The user asked about Kalyani. Then about Thodi and its gamakas."
+    assert truncate_summary(summary, 100) == summary
+    assert truncate_summary(summary, 40) == "The user asked about Kalyani."
+    # no sentence end in the second half of the limit: cut at a word
+    assert truncate_summary("Kalyani Thodi Mohanam Bhairavi", 20) == "Kalyani Thodi"
+    assert truncate_summary("Kalyani" * 5, 10) == "KalyaniKal"
+
+def test_summaries_of_a_cleared_conversation_are_dropped(memory_attributes):
+    manager = ConversationManager(StreamingLLM(["old summary"]), max_turns=1)
+    manager.save_to_memory("question 0", "answer 0")
+    manager.save_to_memory("question 1", "answer 1")
+    manager.clear_conversation()
+    wait_for_summaries()
+    assert manager.summary == ""
+    assert manager.get_conversation_context() == "No previous conversation."
+
+def test_react_details_are_logged_by_reference(memory_attributes):
+    manager = ConversationManager(StreamingLLM([]))
+    details = {"original_response": "initial", "critique": "SCORE: 5", "refined_response": "refined",
+               "improvement_applied": True, "mode": "critique_refine", "path": "refined", "score": 5.0}
+    first = manager.add_message("assistant", "refined", react_details=details)
+    assert set(first["react_details"]) == {"log_id", "mode", "path", "score", "improvement_applied"}
+    assert manager.get_react_details(first) == details
+
+    for turn in range(3):
+        manager.add_message("user", f"question {turn}")
+    # the displayed history is capped
+    assert [message["content"] for message in manager.messages] == ["question 0", "question 1", "question 2"]
+
+def test_react_details_log_rotates_at_max_bytes(tmp_path):
+    path = str(tmp_path / "react_details.jsonl")
+    with open(path, "w") as stale_log:
+        stale_log.write("{}\n")
+    react_log = semantic_layer.ReactDetailsLog(path, max_bytes=250)
+    # the log of an earlier run is dropped
+    assert not os.path.exists(path)
+
+    log_ids = [react_log.append({"critique": f"SCORE: {score}", "padding": "x" * 40}) for score in range(5)]
+    assert os.path.getsize(path) <= 250 and os.path.getsize(path + ".1") <= 250
+    # the newest records are read back from the log or its rotation, the oldest are gone
+    assert react_log.get(log_ids[-1])["critique"] == "SCORE: 4"
+    assert react_log.get(log_ids[-2])["critique"] == "SCORE: 3"
+    assert react_log.get(log_ids[0]) is None
+
+def test_buffer_mode_keeps_everything(memory_attributes):
+    manager = ConversationManager(StreamingLLM([]), mode="buffer")
+    for turn in range(4):
+        manager.save_to_memory(f"question {turn}", f"answer {turn}")
+    message = manager.add_message("assistant", "answer", react_details={"critique": "SCORE: 9"})
+    assert len(manager.memory.chat_memory.messages) == 8
+    assert manager.get_react_details(message) == {"critique": "SCORE: 9"}
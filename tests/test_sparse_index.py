@@ -0,0 +1,50 @@
+from sparse_index import BM25Index, load_sparse_index, reciprocal_rank_fusion, tokenize
+
+TEXTS = [
+    "Shankarabharanam is the 29th melakarta raga",
+    "Kalyani is the 65th melakarta raga and the prati madhyama counterpart of Shankarabharanam",
+    "Tyagaraja composed many kritis in Kalyani",
+    "The varnam is a concert opener",
+]
+
+def test_tokenize_drops_stop_words_and_ordinal_suffixes():
+    assert tokenize("What is the 15th Melakarta?") == ["15", "melakarta"]
+    assert tokenize("Raga 1st, 22nd and 3rd") == ["raga", "1", "22", "3"]
+
+def test_search_ranks_exact_term_matches():
+    index = BM25Index.build(TEXTS)
+    assert len(index) == 4
+
+    rows = [row for row, score in index.search("Which raga is melakarta 29?")]
+    assert rows[0] == 0
+    assert index.search("Tyagaraja kritis", k=1)[0][0] == 2
+    assert [row for row, score in index.search("varnam", k=5)] == [3]
+    assert index.search("hindustani") == []
+
+def test_shorter_document_scores_higher_for_same_term_frequency():
+    index = BM25Index.build(["kalyani raga", "kalyani raga with a much longer description of its phrases"])
+    (best_row, best_score), (other_row, other_score) = index.search("kalyani")
+    assert best_row == 0 and best_score > other_score
+
+def test_save_and_load(tmp_path):
+    index = BM25Index.build(TEXTS, k1=1.2, b=0.5)
+    index.save(str(tmp_path / "bm25.json"))
+
+    loaded = load_sparse_index(str(tmp_path))
+    assert (loaded.k1, loaded.b) == (1.2, 0.5)
+    assert loaded.search("Kalyani melakarta") == index.search("Kalyani melakarta")
+    assert load_sparse_index(str(tmp_path / "missing")) is None
+
+def test_reciprocal_rank_fusion():
+    dense = ["a", "b", "c"]
+    sparse = ["c", "a", "d"]
+    fused = reciprocal_rank_fusion([dense, sparse], key=str.upper, rrf_k=60)
+    # a: 1/61 + 1/62, c: 1/63 + 1/61, b: 1/62, d: 1/63
+    assert fused == ["a", "c", "b", "d"]
+
+def test_reciprocal_rank_fusion_keeps_first_item_of_each_key():
+    dense = [("x", "dense"), ("y", "dense")]
+    sparse = [("y", "sparse")]
+    fused = reciprocal_rank_fusion([dense, sparse], key=lambda item: item[0])
+    assert fused == [("y", "dense"), ("x", "dense")]
+    assert reciprocal_rank_fusion([], key=str) == []
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import tool_router
+from tool_router import TOOL_PROTOTYPES, ToolRouter, keyword_select_tools, route_tools
+
+TOOL_NAMES = list(TOOL_PROTOTYPES)
+
+class PrototypeEmbeddings:
+    """Embeds each prototype as the unit vector of its tool; the last dimension is left for question()"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        tool_of_text = {text: tool_name for tool_name, prototypes in TOOL_PROTOTYPES.items() for text in prototypes}
+        return [np.eye(len(TOOL_NAMES) + 1)[TOOL_NAMES.index(tool_of_text[text])].tolist() for text in texts]
+
+def question(**tool_scores):
+    """A question vector whose cosine similarity to each tool's prototypes is the given score"""
+    vector = np.zeros(len(TOOL_NAMES))
+    for tool_name, score in tool_scores.items():
+        vector[TOOL_NAMES.index(tool_name)] = score
+    rest = 1.0 - float(vector @ vector)
+    return np.append(vector, np.sqrt(max(rest, 0.0)))
+
+@pytest.fixture
+def router():
+    return ToolRouter(PrototypeEmbeddings(), threshold=0.4, margin=0.05, max_tools=2)
+
+def test_scores_use_the_closest_prototype(router):
+    scores = router.scores(question(raga_index_tool=0.7, knowledge_tool=0.2))
+    assert scores["raga_index_tool"] == pytest.approx(0.7)
+    assert scores["knowledge_tool"] == pytest.approx(0.2)
+    assert scores["multi_search"] == pytest.approx(0.0)
+
+def test_clear_winner_uses_one_tool(router):
+    assert router.route("Which melakarta is Kalyani?", question(raga_index_tool=0.7, knowledge_tool=0.6)) == ["raga_index_tool"]
+
+def test_tools_within_the_margin_are_kept(router):
+    assert router.route("q", question(raga_index_tool=0.6, knowledge_tool=0.57, krithi_tool=0.3)) == ["raga_index_tool", "knowledge_tool"]
+
+def test_too_many_close_tools_collapse_to_multi_search(router):
+    assert router.route("q", question(krithi_tool=0.5, knowledge_tool=0.49, raga_index_tool=0.3)) == ["krithi_tool", "knowledge_tool"]
+    assert router.route("q", question(knowledge_tool=0.5, krithi_tool=0.49, multi_search=0.48)) == ["knowledge_tool", "krithi_tool"]
+    router.max_tools = 1
+    assert router.route("q", question(krithi_tool=0.5, knowledge_tool=0.49, raga_index_tool=0.3)) == ["multi_search"]
+
+def test_raga_index_tool_is_kept_next_to_multi_search(router):
+    # multi_search does not look questions up in the raga table
+    assert router.route("q", question(raga_index_tool=0.5, knowledge_tool=0.49, krithi_tool=0.48)) == ["raga_index_tool", "multi_search"]
+    assert router.route("q", question(knowledge_tool=0.5, krithi_tool=0.49, raga_index_tool=0.47)) == ["raga_index_tool", "multi_search"]
+    # outside the margin it is dropped as before
+    router.max_tools = 1
+    assert router.route("q", question(knowledge_tool=0.5, krithi_tool=0.49, raga_index_tool=0.44)) == ["multi_search"]
+
+def test_multi_search_as_best_match(router):
+    assert router.route("q", question(multi_search=0.6, knowledge_tool=0.58)) == ["multi_search"]
+    assert router.route("q", question(multi_search=0.6, raga_index_tool=0.58)) == ["raga_index_tool", "multi_search"]
+
+def test_low_confidence_falls_back_to_keywords(router):
+    selected_tools = router.route("Who composed this krithi?", question(raga_index_tool=0.3))
+    assert selected_tools == keyword_select_tools("Who composed this krithi?") == ["krithi_tool"]
+
+def test_prototypes_are_embedded_once(router):
+    router.route("q", question(knowledge_tool=0.9))
+    router.route("q", question(krithi_tool=0.9))
+    assert router.embeddings_model.calls == 1
+
+def test_route_tools_falls_back_when_routing_fails(monkeypatch):
+    class BrokenRouter:
+        def route(self, user_question, question_embedding=None):
+            raise OSError("model not available")
+
+    monkeypatch.setattr(tool_router, "getToolRouter", BrokenRouter)
+    assert [tool_name for tool_name, tool in route_tools("What is a varnam?")] == ["knowledge_tool"]
@@ -0,0 +1,320 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+import reranker
+import tools
+from reranker import RerankScoreCache
+from tracing import start_trace
+from tools import QueryEmbeddingContext, diversify, get_query_embedding, mmr_select, mmr_sizes, search_category
+
+@pytest.fixture(autouse=True)
+def plain_retrieval(monkeypatch):
+    # a raga table built locally under src/data would answer raga_index_tool without retrieval,
+    # and MMR would read vectors from the stores there
+    monkeypatch.setattr(tools.models, "getRagaTable", lambda: None)
+    monkeypatch.setattr(tools, "mmr_attributes", {"enabled": False, "tools": {}})
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def embed_query(self, text):
+        with self._lock:
+            self.calls.append(text)
+        return [float(len(text)), 1.0]
+
+class RecordingStore:
+    def __init__(self, name):
+        self.name = name
+        self.searches = []
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        self.searches.append((embedding, k, filter))
+        return [self.name]
+
+def test_query_is_embedded_once_per_context():
+    embeddings = CountingEmbeddings()
+    with QueryEmbeddingContext(embeddings):
+        # threads only see the active context when they run in a copy of it
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(get_query_embedding, "what is mohanam"))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert get_query_embedding("what is mohanam") == [15.0, 1.0]
+        get_query_embedding("what is kalyani")
+    assert embeddings.calls == ["what is mohanam", "what is kalyani"]
+
+def test_query_is_embedded_again_outside_the_context(monkeypatch):
+    embeddings = CountingEmbeddings()
+    monkeypatch.setattr(tools.models, "getEmbeddingsModel", lambda: embeddings)
+    with QueryEmbeddingContext(embeddings):
+        get_query_embedding("q")
+    get_query_embedding("q")
+    assert embeddings.calls == ["q", "q"]
+
+def test_nested_contexts_share_the_outer_vectors():
+    embeddings = CountingEmbeddings()
+    with QueryEmbeddingContext(embeddings):
+        get_query_embedding("q")
+        with QueryEmbeddingContext(CountingEmbeddings()):
+            get_query_embedding("q")
+    assert embeddings.calls == ["q"]
+
+def test_search_category_prefers_the_category_store(monkeypatch):
+    embeddings = CountingEmbeddings()
+    shared_store, raga_store = RecordingStore("shared"), RecordingStore("raga")
+    stores = {None: shared_store, "Raga": raga_store, "Literature": None}
+    monkeypatch.setattr(tools.models, "getVectorStore", lambda category=None: stores[category])
+
+    with QueryEmbeddingContext(embeddings):
+        assert search_category("q", "Raga", k=6) == ["raga"]
+        # a category without its own index falls back to filtering the shared one
+        assert search_category("q", "Literature", k=6) == ["shared"]
+    assert raga_store.searches == [([1.0, 1.0], 6, None)]
+    assert shared_store.searches == [([1.0, 1.0], 6, {"category": "Literature"})]
+    assert embeddings.calls == ["q"]
+
+class RowStore:
+    def __init__(self, texts):
+        self.docs = [Document(page_content=text, metadata={"source_file": "ragas.pdf", "category": "Raga"}) for text in texts]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return self.docs[:k]
+
+    def get_document(self, row):
+        return self.docs[row]
+
+class FixedSparseIndex:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def search(self, query, k=10):
+        return [(row, 1.0) for row in self.rows[:k]]
+
+def test_search_category_fuses_keyword_hits(monkeypatch):
+    store = RowStore(["dense 0", "dense 1", "keyword 2", "keyword 3"])
+    monkeypatch.setattr(tools.models, "getVectorStore", lambda category=None: store)
+    monkeypatch.setattr(tools.models, "getSparseIndex", lambda category=None: FixedSparseIndex([3, 1, 2]))
+    monkeypatch.setattr(tools, "hybrid_search_attributes", {"enabled": True, "rrf_k": 60, "candidates": 3})
+    # settings were read at import, a query does not build a Utils
+    monkeypatch.setattr(tools.car_utils, "Utils", None)
+
+    with QueryEmbeddingContext(CountingEmbeddings()):
+        fused = search_category("q", "Raga", k=2, fused_k=3)
+    # dense 1 is found by both searches
+    assert [doc.page_content for doc in fused] == ["dense 1", "dense 0", "keyword 3"]
+
+    monkeypatch.setattr(tools, "hybrid_search_attributes", {"enabled": False, "rrf_k": 60, "candidates": 3})
+    with QueryEmbeddingContext(CountingEmbeddings()):
+        assert [doc.page_content for doc in search_category("q", "Raga", k=2)] == ["dense 0", "dense 1"]
+
+class LengthScorer:
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, pairs):
+        self.calls += 1
+        return [float(len(passage)) for query, passage in pairs]
+
+def fake_search(query, category, k, fused_k=None):
+    if category == tools.TOOL_SEARCH_SPECS["krithi_tool"]["category"]:
+        raise RuntimeError("index missing")
+    return [Document(page_content=f"{category} chunk {position}", metadata={"category": category}) for position in range(k)]
+
+def test_run_tools_reranks_every_tool_in_one_batch(monkeypatch):
+    scorer = LengthScorer()
+    monkeypatch.setattr(tools.models, "getEmbeddingsModel", CountingEmbeddings)
+    monkeypatch.setattr(tools.models, "getReRankingModel", lambda: scorer)
+    monkeypatch.setattr(tools, "search_category", fake_search)
+    monkeypatch.setattr(reranker, "_score_cache", RerankScoreCache())
+
+    results = tools.run_tools("what is mohanam", [("knowledge_tool", None), ("raga_index_tool", None), ("krithi_tool", None)])
+    assert results[0].startswith("Results from knowledge_tool:\n")
+    assert f"{tools.TOOL_SEARCH_SPECS['knowledge_tool']['category']} chunk" in results[0]
+    assert results[1].startswith("Results from raga_index_tool:\n")
+    assert f"{tools.TOOL_SEARCH_SPECS['raga_index_tool']['category']} chunk" in results[1]
+    assert results[2] == "Error with krithi_tool: index missing"
+    assert scorer.calls == 1
+
+def test_run_tools_retrieves_in_parallel_and_reports_timeouts(monkeypatch):
+    slow_category = tools.TOOL_SEARCH_SPECS["krithi_tool"]["category"]
+    def slow_search(query, category, k, fused_k=None):
+        time.sleep(1.0 if category == slow_category else 0.3)
+        return fake_search(query, "any", k)
+
+    monkeypatch.setattr(tools.models, "getEmbeddingsModel", CountingEmbeddings)
+    monkeypatch.setattr(tools.models, "getReRankingModel", LengthScorer)
+    monkeypatch.setattr(tools, "search_category", slow_search)
+    monkeypatch.setattr(reranker, "_score_cache", RerankScoreCache())
+    slow_tool_finished = threading.Event()
+    collect_candidates = tools.collect_candidates
+    def collect_and_signal(tool_name, *args):
+        try:
+            return collect_candidates(tool_name, *args)
+        finally:
+            if tool_name == "krithi_tool":
+                slow_tool_finished.set()
+    monkeypatch.setattr(tools, "collect_candidates", collect_and_signal)
+
+    start = time.monotonic()
+    results = tools.run_tools("q", [("knowledge_tool", None), ("raga_index_tool", None), ("krithi_tool", None)], timeout=0.6)
+    assert time.monotonic() - start < 0.9
+    assert results[0].startswith("Results from knowledge_tool:\n")
+    assert results[1].startswith("Results from raga_index_tool:\n")
+    assert results[2] == "Error with krithi_tool: timed out after 0.6s"
+    # the timed-out search keeps running on its worker; let it finish while the fakes are still in place
+    assert slow_tool_finished.wait(2)
+
+def test_collect_candidates_stops_at_the_deadline(monkeypatch):
+    searched = []
+    def slow_search(query, category, k, fused_k=None):
+        searched.append(category)
+        time.sleep(0.2)
+        return fake_search(query, category, k)
+
+    monkeypatch.setattr(tools, "search_category", slow_search)
+    with pytest.raises(TimeoutError):
+        tools.collect_candidates("multi_search", "q", ["Literature", "Raga", "Krithis"], deadline=time.monotonic() + 0.1)
+    # the search running at the deadline finishes, the remaining categories are skipped
+    assert searched == ["Literature"]
+
+def test_run_tools_records_tool_spans(monkeypatch):
+    monkeypatch.setattr(tools.models, "getEmbeddingsModel", CountingEmbeddings)
+    monkeypatch.setattr(tools.models, "getReRankingModel", LengthScorer)
+    monkeypatch.setattr(tools, "search_category", lambda query, category, k, fused_k=None: fake_search(query, "any", k))
+    monkeypatch.setattr(reranker, "_score_cache", RerankScoreCache())
+
+    with start_trace("answer") as answer_trace:
+        tools.run_tools("q", [("knowledge_tool", None), ("raga_index_tool", None)])
+    spans = {recorded.name: recorded for recorded in answer_trace.spans}
+    assert spans["tool:knowledge_tool"].attributes["candidates"] == 12
+    assert spans["tool:raga_index_tool"].parent_id == answer_trace.root.span_id
+    assert [recorded.name for recorded in answer_trace.spans].count("rerank") == 1
+    # both tools return the same chunks, which are scored once
+    assert spans["rerank"].attributes["pairs"] == 12
+
+def test_arun_tools_matches_run_tools(monkeypatch):
+    monkeypatch.setattr(tools.models, "getEmbeddingsModel", CountingEmbeddings)
+    monkeypatch.setattr(tools.models, "getReRankingModel", LengthScorer)
+    monkeypatch.setattr(tools, "search_category", fake_search)
+    monkeypatch.setattr(reranker, "_score_cache", RerankScoreCache())
+
+    selected_tools = [("knowledge_tool", None), ("raga_index_tool", None), ("krithi_tool", None)]
+    async_results = asyncio.run(tools.arun_tools("what is mohanam", selected_tools))
+    assert async_results == tools.run_tools("what is mohanam", selected_tools)
+    assert async_results[2] == "Error with krithi_tool: index missing"
+
+class FixedRagaTable:
+    def lookup_question(self, question):
+        matches = [({"name": "Kalyani"}, "kalyani")] if "kalyani" in question.lower() else []
+        return matches, question.lower().startswith("which melakarta")
+
+    def format(self, matches):
+        return "Raga: " + ", ".join(record["name"] for record, matched in matches)
+
+def test_raga_lookup_skips_retrieval_only_for_its_subject(monkeypatch):
+    searched = []
+    def recording_search(query, category, k, fused_k=None):
+        searched.append(category)
+        return fake_search(query, "any", k)
+
+    monkeypatch.setattr(tools.models, "getRagaTable", FixedRagaTable)
+    monkeypatch.setattr(tools.models, "getEmbeddingsModel", CountingEmbeddings)
+    monkeypatch.setattr(tools.models, "getReRankingModel", LengthScorer)
+    monkeypatch.setattr(tools, "search_category", recording_search)
+    monkeypatch.setattr(reranker, "_score_cache", RerankScoreCache())
+
+    results = tools.run_tools("Which melakarta is Kalyani?", [("knowledge_tool", None), ("raga_index_tool", None)])
+    assert results[1] == "Results from raga_index_tool:\nRaga: Kalyani"
+    assert searched == [tools.TOOL_SEARCH_SPECS["knowledge_tool"]["category"]]
+
+    # an incidental raga name is searched as well, with the table rows first
+    searched.clear()
+    results = tools.run_tools("Kritis of Tyagaraja in Kalyani", [("raga_index_tool", None)])
+    assert results[0].startswith("Results from raga_index_tool:\nRaga: Kalyani\n\n") and "any chunk" in results[0]
+    assert results[0].lookup == "Raga: Kalyani" and results[0].docs
+    assert searched == [tools.TOOL_SEARCH_SPECS["raga_index_tool"]["category"]]
+
+    # a question without a known raga searches as before
+    results = tools.run_tools("What is a varnam?", [("raga_index_tool", None)])
+    assert results[0].lookup is None and "any chunk" in results[0]
+
+    # a single tool run gives the same result as run_tools
+    for question in ("Which melakarta is Kalyani?", "Kritis of Tyagaraja in Kalyani"):
+        result = tools.run_tool("raga_index_tool", question)
+        [expected] = tools.run_tools(question, [("raga_index_tool", None)])
+        assert result == expected and result.lookup == expected.lookup
+
+def test_mmr_select_prefers_diverse_documents():
+    query = [1.0, 0.0, 0.0]
+    doc_vectors = [
+        [0.95, 0.31, 0.0],   # most relevant
+        [0.94, 0.34, 0.0],   # near copy of the first
+        [0.8, 0.0, 0.6],     # less relevant but different
+    ]
+    assert mmr_select(query, doc_vectors, 2, lambda_mult=0.5) == [0, 2]
+    # lambda_mult 1 ranks by relevance alone
+    assert mmr_select(query, doc_vectors, 2, lambda_mult=1.0) == [0, 1]
+
+def test_mmr_select_returns_at_most_the_documents_given():
+    doc_vectors = np.random.default_rng(0).standard_normal((3, 4))
+    selected = mmr_select(np.ones(4), doc_vectors, 10, lambda_mult=0.7)
+    assert sorted(selected) == [0, 1, 2]
+
+class VectorStore:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def get_vectors(self, docs):
+        return np.asarray([self.vectors[doc.page_content] for doc in docs], dtype=np.float32)
+
+def test_mmr_sizes(monkeypatch):
+    settings = {"knowledge_tool": {"lambda": 0.7, "factor": 2}}
+    monkeypatch.setattr(tools, "mmr_attributes", {"enabled": False, "tools": settings})
+    assert mmr_sizes("knowledge_tool", 4) is None
+
+    monkeypatch.setattr(tools, "mmr_attributes", {"enabled": True, "tools": settings})
+    # MMR keeps more candidates than the CrossEncoder's top_k
+    assert mmr_sizes("knowledge_tool", 4) == (16, 8)
+    assert mmr_sizes("raga_index_tool", 4) is None
+
+def test_diversify_keeps_the_least_redundant_candidates(monkeypatch):
+    vectors = {"page 1": [1.0, 0.3], "page 1 overlap": [1.0, 0.32], "page 2": [1.0, -0.3]}
+    docs = [Document(page_content=text) for text in vectors]
+    monkeypatch.setattr(tools.models, "getVectorStore", lambda category=None: VectorStore(vectors))
+    settings = {"knowledge_tool": {"lambda": 0.5, "factor": 2}}
+    monkeypatch.setattr(tools, "mmr_attributes", {"enabled": True, "tools": settings})
+
+    with QueryEmbeddingContext(CountingEmbeddings()):
+        # CountingEmbeddings embeds "abcdefghij" as [10.0, 1.0]
+        assert [doc.page_content for doc in diversify("abcdefghij", "Literature", docs, "knowledge_tool", 2)] == ["page 1", "page 2"]
+        assert diversify("abcdefghij", "Literature", docs, "knowledge_tool", 3) == docs
+
+    # without stored vectors the first candidates are kept
+    monkeypatch.setattr(tools.models, "getVectorStore", lambda category=None: RecordingStore("no vectors"))
+    assert diversify("abcdefghij", "Literature", docs, "knowledge_tool", 2) == docs[:2]
+
+def test_mmr_retrieves_more_candidates_than_it_keeps(monkeypatch):
+    searches = []
+    def recording_search(query, category, k, fused_k=None):
+        searches.append((k, fused_k))
+        return fake_search(query, category, fused_k or k)
+
+    monkeypatch.setattr(tools, "search_category", recording_search)
+    monkeypatch.setattr(tools.models, "getVectorStore", lambda category=None: RecordingStore("no vectors"))
+    settings = {"knowledge_tool": {"lambda": 0.7, "factor": 2}}
+    monkeypatch.setattr(tools, "mmr_attributes", {"enabled": True, "tools": settings})
+
+    [(key, query, docs, top_k)] = tools.collect_candidates("knowledge_tool", "q")
+    spec = tools.TOOL_SEARCH_SPECS["knowledge_tool"]
+    assert searches == [(max(spec["k"], 4 * spec["top_k"]), 4 * spec["top_k"])]
+    assert (len(docs), top_k) == (2 * spec["top_k"], spec["top_k"])
@@ -0,0 +1,77 @@
+import contextvars
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from tracing import current_trace, record_llm_usage, span, start_trace
+
+def test_span_outside_a_trace_is_a_noop():
+    with span("search", k=4) as search_span:
+        search_span.set(hits=3)
+    assert current_trace() is None
+
+def test_spans_nest_under_the_current_span():
+    with start_trace("answer", question="q") as answer_trace:
+        with span("tool:knowledge_tool") as tool_span:
+            with span("faiss_search", k=12) as search_span:
+                search_span.set(hits=12)
+        with span("llm_call"):
+            pass
+    assert current_trace() is None
+
+    root, tool, search, llm = answer_trace.spans
+    assert [root.name, tool.name, search.name, llm.name] == ["answer", "tool:knowledge_tool", "faiss_search", "llm_call"]
+    assert root.parent_id is None and root.attributes == {"question": "q"}
+    assert tool.parent_id == root.span_id
+    assert search.parent_id == tool_span.span_id
+    assert search.attributes == {"k": 12, "hits": 12}
+    assert llm.parent_id == root.span_id
+    assert all(recorded.end_time_ns is not None for recorded in answer_trace.spans)
+
+def test_spans_follow_the_context_into_worker_threads():
+    with start_trace("answer") as answer_trace:
+        def work():
+            with span("tool:raga_index_tool"):
+                pass
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(work,))
+        worker.start()
+        worker.join()
+    assert answer_trace.spans[1].parent_id == answer_trace.root.span_id
+
+def test_errors_are_recorded():
+    with pytest.raises(ValueError):
+        with start_trace("answer") as answer_trace:
+            with span("rerank"):
+                raise ValueError("model unavailable")
+    root, rerank = answer_trace.spans
+    assert root.status == "error"
+    assert rerank.status == "error" and rerank.attributes["error"] == "model unavailable"
+
+def test_record_llm_usage():
+    with start_trace("answer") as answer_trace:
+        with span("llm_call") as llm_span:
+            response = SimpleNamespace(content="Mohanam is audava", usage_metadata=None,
+                                       response_metadata={"token_usage": {"prompt_tokens": 120, "completion_tokens": 8, "total_tokens": 128}})
+            record_llm_usage(llm_span, response, prompt="x" * 500)
+    assert answer_trace.spans[1].attributes == {"prompt_chars": 500, "input_tokens": 120, "output_tokens": 8,
+                                                "total_tokens": 128, "response_chars": 17}
+
+def test_export_jsonl_and_otel(tmp_path):
+    with start_trace("answer") as answer_trace:
+        with span("search", k=4, categories=["Raga"]):
+            pass
+    jsonl_path, otel_path = tmp_path / "traces.jsonl", tmp_path / "traces.otel.jsonl"
+    answer_trace.export(str(jsonl_path))
+    answer_trace.export(str(otel_path), format="otel")
+
+    span_dicts = [json.loads(line) for line in jsonl_path.read_text().splitlines()]
+    assert [span_dict["name"] for span_dict in span_dicts] == ["answer", "search"]
+    assert span_dicts[1]["parent_id"] == span_dicts[0]["span_id"]
+
+    otel_spans = json.loads(otel_path.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert otel_spans[1]["attributes"] == [
+        {"key": "k", "value": {"intValue": "4"}},
+        {"key": "categories", "value": {"arrayValue": {"values": [{"stringValue": "Raga"}]}}},
+    ]
@@ -0,0 +1,9 @@
+import utils as car_utils
+
+def test_every_category_has_its_own_store_name():
+    vector_store_attributes = car_utils.getVectoreStoreAttributes()
+    category_file_names = vector_store_attributes["category_file_names"]
+    assert set(category_file_names) == set(vector_store_attributes["meta_data"])
+    assert category_file_names["Raga"] == "car_research_db_Raga"
+    # per-category stores sit next to the shared one without replacing it
+    assert vector_store_attributes["file_name"] not in category_file_names.values()
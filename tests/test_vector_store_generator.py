@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import vector_store_generator as vsg
+from chunk_store import MappedVectorStore
+from sparse_index import load_sparse_index
+
+class HashEmbeddings(Embeddings):
+    """Deterministic 8-dimensional vectors derived from the text, counting the texts embedded"""
+
+    def __init__(self, fail_on_call=None):
+        self.embedded = []
+        self.batch_sizes = []
+        self.fail_on_call = fail_on_call
+
+    def embed_documents(self, texts):
+        if len(self.batch_sizes) + 1 == self.fail_on_call:
+            raise RuntimeError("embedding service went away")
+        self.batch_sizes.append(len(texts))
+        self.embedded.extend(texts)
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        digest = hashlib.sha1(text.encode("utf-8")).digest()
+        return (np.frombuffer(digest[:8], dtype=np.uint8) / 255.0).tolist()
+
+def parse_lines(source_files):
+    """Stands in for the process pool parser: one chunk per line of a text file"""
+    for source_file in source_files:
+        with open(source_file[-1], "r", encoding="utf-8") as text_file:
+            lines = [line for line in text_file.read().splitlines() if line]
+        yield source_file, [Document(page_content=line, metadata={"source": source_file[-1]}) for line in lines], None
+
+@pytest.fixture
+def build_dir(tmp_path, monkeypatch):
+    persist_path = str(tmp_path / "car_research_db")
+    monkeypatch.setattr(vsg, "base_path", str(tmp_path))
+    monkeypatch.setattr(vsg, "vector_store_persist_directory", str(tmp_path))
+    monkeypatch.setattr(vsg, "vector_store_persist_path", persist_path)
+    monkeypatch.setattr(vsg, "manifest_path", f"{persist_path}_manifest.json")
+    monkeypatch.setattr(vsg, "journal_path", f"{persist_path}_journal.jsonl")
+    monkeypatch.setattr(vsg, "iter_parsed_files", parse_lines)
+    monkeypatch.setattr(vsg.car_utils, "getIndexBuildAttributes", lambda: {"batch_size": 2, "checkpoint_every_batches": 1})
+    embeddings = HashEmbeddings()
+    monkeypatch.setattr(vsg.models, "getEmbeddingsModel", lambda: embeddings)
+    for category in vsg.meta_data_mapper:
+        os.makedirs(tmp_path / "src" / "data" / category)
+    return tmp_path, embeddings
+
+def write_source(tmp_path, category, file_name, lines):
+    with open(tmp_path / "src" / "data" / category / file_name, "w", encoding="utf-8") as source_file:
+        source_file.write("\n".join(lines))
+
+def texts(store):
+    return sorted(doc.page_content for doc in store.docstore._dict.values())
+
+def test_chunk_hashes_number_repeated_text():
+    chunks = [Document(page_content=text) for text in ("header", "body", "header")]
+    ids = vsg.chunk_hashes("Raga", "Raga/a.txt", chunks)
+    assert ids[2] == f"{ids[0]}-1"
+    assert len(set(ids)) == 3
+    assert vsg.chunk_hashes("Raga", "Raga/b.txt", chunks)[0] != ids[0]
+
+def test_incremental_build_embeds_only_changed_chunks(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Raga", "ragas.txt", ["Mohanam is audava", "Kalyani is the 65th mela"])
+    write_source(tmp_path, "Literature", "theory.txt", ["Shruti is pitch"])
+
+    store = vsg.build_vector_store()
+    assert texts(store) == ["Kalyani is the 65th mela", "Mohanam is audava", "Shruti is pitch"]
+    assert len(embeddings.embedded) == 3
+
+    # nothing changed: nothing is embedded again
+    embeddings.embedded.clear()
+    vsg.build_vector_store()
+    assert embeddings.embedded == []
+
+    # one changed line is embedded; the deleted file's chunks leave the shared and category stores
+    write_source(tmp_path, "Raga", "ragas.txt", ["Mohanam is audava", "Kalyani is the 65th melakarta"])
+    os.remove(tmp_path / "src" / "data" / "Literature" / "theory.txt")
+    store = vsg.build_vector_store()
+    assert embeddings.embedded == ["Kalyani is the 65th melakarta"]
+    assert texts(store) == ["Kalyani is the 65th melakarta", "Mohanam is audava"]
+    assert store.index.ntotal == 2
+    raga_store = vsg.load_store(str(tmp_path / vsg.category_file_names["Raga"]), embeddings)
+    assert texts(raga_store) == ["Kalyani is the 65th melakarta", "Mohanam is audava"]
+
+    manifest = vsg.load_manifest()
+    assert list(manifest["files"]) == [os.path.join("Raga", "ragas.txt")]
+
+def test_emptied_category_store_is_removed(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Raga", "ragas.txt", ["Mohanam is audava"])
+    write_source(tmp_path, "Literature", "theory.txt", ["Shruti is pitch"])
+    vsg.build_vector_store()
+    raga_store_path = os.path.join(vsg.vector_store_persist_directory, vsg.category_file_names["Raga"])
+    assert os.path.isdir(raga_store_path)
+
+    os.remove(tmp_path / "src" / "data" / "Raga" / "ragas.txt")
+    store = vsg.build_vector_store()
+    assert texts(store) == ["Shruti is pitch"]
+    assert not os.path.exists(raga_store_path)
+    assert os.path.isdir(os.path.join(vsg.vector_store_persist_directory, vsg.category_file_names["Literature"]))
+
+def test_full_rebuild_embeds_everything(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Raga", "ragas.txt", ["Mohanam is audava"])
+    vsg.build_vector_store()
+    embeddings.embedded.clear()
+    vsg.build_vector_store(full_rebuild=True)
+    assert embeddings.embedded == ["Mohanam is audava"]
+
+def test_chunks_are_embedded_in_batches(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Raga", "ragas.txt", [f"raga line {number}" for number in range(5)])
+    store = vsg.build_vector_store()
+    assert embeddings.batch_sizes == [2, 2, 1]
+    assert store.index.ntotal == 5
+
+def test_interrupted_build_resumes_from_the_last_checkpoint(build_dir, monkeypatch):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Literature", "a.txt", ["a1", "a2", "a3"])
+    write_source(tmp_path, "Raga", "b.txt", ["b1", "b2", "b3"])
+
+    failing = HashEmbeddings(fail_on_call=3)
+    monkeypatch.setattr(vsg.models, "getEmbeddingsModel", lambda: failing)
+    with pytest.raises(RuntimeError):
+        vsg.build_vector_store()
+    # a.txt was checkpointed before b.txt's first batch failed
+    assert list(vsg.load_manifest()["files"]) == [os.path.join("Literature", "a.txt")]
+
+    monkeypatch.setattr(vsg.models, "getEmbeddingsModel", lambda: embeddings)
+    store = vsg.build_vector_store()
+    assert embeddings.embedded == ["b1", "b2", "b3"]
+    assert texts(store) == ["a1", "a2", "a3", "b1", "b2", "b3"]
+
+def assert_rows_match_texts(store, embeddings):
+    """Every FAISS row holds the vector of the document the docstore maps it to"""
+    assert len(store.index_to_docstore_id) == store.index.ntotal
+    for row, chunk_id in store.index_to_docstore_id.items():
+        text = store.docstore.search(chunk_id).page_content
+        np.testing.assert_allclose(store.index.reconstruct(row), embeddings.embed_query(text), rtol=1e-6)
+
+def test_resumed_build_replays_the_checkpoint_journal(build_dir, monkeypatch):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Literature", "a.txt", ["a1", "a2", "a3"])
+    vsg.build_vector_store()
+
+    # a2 is removed, a3 moves up a line, and two new files are added; the build fails in c.txt
+    write_source(tmp_path, "Literature", "a.txt", ["a1", "a3"])
+    write_source(tmp_path, "Raga", "b.txt", ["b1", "b2"])
+    write_source(tmp_path, "Raga", "c.txt", ["c1", "c2"])
+    failing = HashEmbeddings(fail_on_call=2)
+    monkeypatch.setattr(vsg.models, "getEmbeddingsModel", lambda: failing)
+    with pytest.raises(RuntimeError):
+        vsg.build_vector_store()
+    with open(vsg.journal_path, "r", encoding="utf-8") as journal_file:
+        operations = [json.loads(line)["op"] for line in journal_file]
+    assert operations == ["base", "delete", "metadata", "metadata", "add"]
+
+    monkeypatch.setattr(vsg.models, "getEmbeddingsModel", lambda: embeddings)
+    embeddings.embedded.clear()
+    store = vsg.build_vector_store()
+    assert embeddings.embedded == ["c1", "c2"]
+    assert texts(store) == ["a1", "a3", "b1", "b2", "c1", "c2"]
+    assert_rows_match_texts(store, embeddings)
+    assert not os.path.exists(vsg.journal_path)
+
+def test_stale_journal_is_ignored(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Literature", "a.txt", ["a1", "a2"])
+    vsg.build_vector_store()
+    vsg.append_journal([{"op": "delete", "ids": ["unknown"]}], "digest of another docstore")
+
+    embeddings.embedded.clear()
+    store = vsg.build_vector_store()
+    assert embeddings.embedded == []
+    assert texts(store) == ["a1", "a2"]
+    assert not os.path.exists(vsg.journal_path)
+
+def test_index_ahead_of_its_docstore_is_rebuilt(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Literature", "a.txt", ["a1", "a2"])
+    store = vsg.build_vector_store()
+    # a checkpoint that wrote the index but not its journal entries
+    store.index.add(np.asarray([embeddings.embed_query("lost")], dtype=np.float32))
+    vsg.write_index(store, vsg.vector_store_persist_path)
+
+    embeddings.embedded.clear()
+    store = vsg.build_vector_store()
+    assert sorted(embeddings.embedded) == ["a1", "a2"]
+    assert_rows_match_texts(store, embeddings)
+
+def test_saved_stores_include_the_chunk_store(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Raga", "ragas.txt", ["Mohanam is audava", "Kalyani is the 65th mela"])
+    store = vsg.build_vector_store()
+
+    mapped_store = MappedVectorStore(vsg.vector_store_persist_path, embeddings)
+    try:
+        for row in range(store.index.ntotal):
+            doc = mapped_store.get_document(row)
+            assert doc.id == store.index_to_docstore_id[row]
+            assert doc.page_content == store.docstore.search(doc.id).page_content
+        assert mapped_store.similarity_search("Kalyani is the 65th mela", k=1)[0].page_content == "Kalyani is the 65th mela"
+    finally:
+        mapped_store.close()
+
+def test_saved_stores_include_the_bm25_index(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Raga", "ragas.txt", ["Mohanam is audava", "Kalyani is the 65th mela"])
+    vsg.build_vector_store()
+
+    raga_store_path = os.path.join(vsg.vector_store_persist_directory, vsg.category_file_names["Raga"])
+    sparse_index = load_sparse_index(raga_store_path)
+    assert len(sparse_index) == 2
+    mapped_store = MappedVectorStore(raga_store_path, embeddings)
+    try:
+        row, score = sparse_index.search("Which mela is Kalyani?", k=1)[0]
+        assert mapped_store.get_document(row).page_content == "Kalyani is the 65th mela"
+    finally:
+        mapped_store.close()
+
+PASSAGE = ("Kalyani is the sixty fifth melakarta raga of Carnatic music. It is a sampurna raga with the prati "
+           "madhyamam, and many kritis of Tyagaraja and Muthuswami Dikshitar are set in it.")
+
+def test_near_duplicate_chunks_are_not_embedded(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Raga", "a.txt", [PASSAGE, "Mohanam is audava"])
+    vsg.build_vector_store()
+    # a later file repeating the passage as a page header, with different case and spacing
+    write_source(tmp_path, "Raga", "b.txt", [PASSAGE.upper().replace(", ", " ,  "), "Thodi is the 8th mela"])
+    embeddings.embedded.clear()
+    store = vsg.build_vector_store()
+
+    assert embeddings.embedded == ["Thodi is the 8th mela"]
+    assert texts(store) == sorted([PASSAGE, "Mohanam is audava", "Thodi is the 8th mela"])
+    manifest_files = vsg.load_manifest()["files"]
+    assert len(manifest_files[os.path.join("Raga", "b.txt")]["chunk_ids"]) == 1
+
+def test_near_duplicates_are_checked_within_each_category(build_dir):
+    tmp_path, embeddings = build_dir
+    write_source(tmp_path, "Raga", "ragas.txt", [PASSAGE])
+    write_source(tmp_path, "Krithis", "kritis.txt", [PASSAGE, "Nidhi Chala Sukhama is in Kalyani"])
+    vsg.build_vector_store()
+
+    # the passage stays searchable in the Krithis store as well as in the Raga store
+    for category, expected in (("Raga", [PASSAGE]), ("Krithis", sorted([PASSAGE, "Nidhi Chala Sukhama is in Kalyani"]))):
+        category_store = vsg.load_store(os.path.join(vsg.vector_store_persist_directory, vsg.category_file_names[category]), embeddings)
+        assert texts(category_store) == expected